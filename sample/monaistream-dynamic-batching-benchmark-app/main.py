@@ -0,0 +1,84 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from monaistream.batching import DynamicBatcher
+from monaistream.compose import StreamCompose
+from monaistream.filters import LocalInferServer, LocalModel
+from monaistream.sinks import FakeSink
+from monaistream.sources import AppSource
+
+logging.basicConfig(level=logging.ERROR)
+
+NUM_SOURCES = 3
+NUM_BUFFERS = 200
+FRAME_SHAPE = (224, 224, 3)
+
+
+def save_model(path: str) -> None:
+    # a small segmentation-like network standing in for a real model on CPU
+    model = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 16, 3, padding=1),
+        torch.nn.ReLU(),
+        torch.nn.Conv2d(16, 16, 3, padding=1),
+        torch.nn.ReLU(),
+        torch.nn.Conv2d(16, 2, 1),
+    )
+    torch.jit.script(model.eval()).save(path)
+
+
+def benchmark(model: LocalModel, max_batch_size: int, max_queue_delay_ms: float) -> None:
+    batcher = DynamicBatcher(model, max_batch_size=max_batch_size, max_queue_delay_ms=max_queue_delay_ms)
+    frames = np.random.randint(0, 255, (NUM_BUFFERS, *FRAME_SHAPE), dtype=np.uint8)
+
+    pipelines = [
+        StreamCompose([AppSource(frames, format="RGB"), LocalInferServer(batcher=batcher), FakeSink()], trace=True)
+        for _ in range(NUM_SOURCES)
+    ]
+
+    start = time.perf_counter()
+    for pipeline in pipelines:
+        pipeline.start()
+    for pipeline in pipelines:
+        pipeline.wait()
+    elapsed = time.perf_counter() - start
+    batcher.close()
+
+    latencies = [pipeline.get_latency_report().get("end-to-end", {}) for pipeline in pipelines]
+    p50 = max(latency.get("p50", 0.0) for latency in latencies)
+    p95 = max(latency.get("p95", 0.0) for latency in latencies)
+    stats = batcher.get_stats()
+    print(
+        f"batch: {max_batch_size:2d}  delay: {max_queue_delay_ms:5.1f}ms  "
+        f"fps: {NUM_SOURCES * NUM_BUFFERS / elapsed:8.1f}  mean batch: {stats['mean_batch_size']:5.2f}  "
+        f"p50: {p50:8.2f}ms  p95: {p95:8.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model_path = os.path.join(tmpdir, "model.pt")
+        save_model(model_path)
+        model = LocalModel(model_path)
+
+        for max_batch_size in (1, 2, 4, 8):
+            for max_queue_delay_ms in (0.0, 2.0, 5.0, 10.0):
+                benchmark(model, max_batch_size, max_queue_delay_ms)
@@ -0,0 +1,49 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import os
+
+from monaistream.compose import StreamCompose
+from monaistream.launcher import ShardedLauncher
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+logging.basicConfig(level=logging.ERROR)
+
+NUM_SOURCES = 16
+NUM_BUFFERS = 500
+
+
+def create_pipeline(pattern: str) -> StreamCompose:
+    return StreamCompose(
+        [
+            TestVideoSource(num_buffers=NUM_BUFFERS, pattern=pattern),
+            FakeSink(),
+        ]
+    )
+
+
+if __name__ == "__main__":
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    sources = ["smpte75"] * NUM_SOURCES
+
+    num_workers = 1
+    while num_workers <= len(cpus):
+        report = ShardedLauncher(create_pipeline, sources, num_workers=num_workers, cpus=cpus[:num_workers]).run()
+        print(
+            f"workers: {num_workers:3d}  fps: {report['fps']:10.1f}  "
+            f"p50: {report['latency'].get('p50', 0.0):8.3f}ms  p99: {report['latency'].get('p99', 0.0):8.3f}ms"
+        )
+        num_workers *= 2
@@ -0,0 +1,79 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import (
+    TransformChainComponentAsync,
+    TransformChainComponentNumpy,
+    TransformChainComponentProcess,
+)
+from monaistream.interface import StreamFilterComponent
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+logging.basicConfig(level=logging.ERROR)
+
+NUM_BUFFERS = 300
+
+
+def sort_channels(inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # CPU-bound work which releases the GIL while NumPy sorts
+    frame = inputs["ORIGINAL_IMAGE"]
+    for _ in range(4):
+        sorted_frame = np.sort(frame.astype(np.float32), axis=1)
+    return {"ORIGINAL_IMAGE": sorted_frame}
+
+
+def threshold_rows(inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # CPU-bound work in pure Python which holds the GIL, like `Lambdad` post-transforms
+    frame = inputs["ORIGINAL_IMAGE"]
+    rows = frame[::4, ::4, 0].tolist()
+    frame[::4, ::4, 0] = [[255 if value > 127 else 0 for value in row] for row in rows]
+    return inputs
+
+
+def benchmark(transform: StreamFilterComponent) -> float:
+    pipeline = StreamCompose([TestVideoSource(num_buffers=NUM_BUFFERS, pattern="smpte75"), transform, FakeSink()])
+    start = time.perf_counter()
+    pipeline()
+    return NUM_BUFFERS / (time.perf_counter() - start)
+
+
+def run(transform_chain: Callable, title: str) -> None:
+    print(title)
+    fps = benchmark(TransformChainComponentNumpy(transform_chain=transform_chain, output_label="ORIGINAL_IMAGE"))
+    print(f"{'streaming thread':>24}  fps: {fps:8.1f}")
+
+    for component, kind in ((TransformChainComponentAsync, "threads"), (TransformChainComponentProcess, "processes")):
+        for num_workers in (1, 2, 4, 8):
+            transform = component(
+                transform_chain=transform_chain,
+                output_label="ORIGINAL_IMAGE",
+                num_workers=num_workers,
+                max_in_flight=2 * num_workers,
+            )
+            fps = benchmark(transform)
+            peak_in_flight = transform.get_probe_stats()["peak_in_flight"]
+            print(f"{f'{num_workers} worker {kind}':>24}  fps: {fps:8.1f}  peak in flight: {peak_in_flight}")
+
+
+if __name__ == "__main__":
+
+    run(sort_channels, "NumPy transform releasing the GIL")
+    run(threshold_rows, "pure-Python transform holding the GIL")
@@ -0,0 +1,186 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from monaistream.errors import StreamTransformChainError
+
+logger = logging.getLogger(__name__)
+
+
+class _Request(NamedTuple):
+    sample: np.ndarray
+    future: Future
+    enqueued_at: float
+
+
+class DynamicBatcher(object):
+    """
+    Schedules the inference of single samples submitted by any number of components (e.g. one
+    :class:`monaistream.filters.LocalInferServer` per source) into batches. A batch is dispatched as soon as it holds
+    `max_batch_size` samples, or when its oldest sample has waited `max_queue_delay_ms`, so sources with mismatched
+    rates share batches without waiting for each other for longer than the delay. Results are scattered back to
+    the submitter of each sample.
+
+    Only samples of the same shape and data type are batched together.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[np.ndarray], Dict[str, np.ndarray]],
+        max_batch_size: int = 8,
+        max_queue_delay_ms: float = 5.0,
+    ) -> None:
+        """
+        :param model: a `Callable` (such as :class:`monaistream.filters.LocalModel`) which receives a batch and
+                      returns a dictionary mapping output labels to batched outputs
+        :param max_batch_size: the maximum number of samples in a batch
+        :param max_queue_delay_ms: the maximum time a sample waits for other samples to fill a batch
+        """
+        self._model = model
+        self._max_batch_size = max_batch_size
+        self._max_queue_delay = max_queue_delay_ms / 1e3
+
+        self._queue: Deque[_Request] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._queue_time = 0.0
+        self._infer_time = 0.0
+
+    def get_max_batch_size(self) -> int:
+        """
+        Get the maximum number of samples in a batch
+
+        :return: the maximum batch size
+        """
+        return self._max_batch_size
+
+    def submit(self, sample: np.ndarray) -> Future:
+        """
+        Queue a sample for inference
+
+        :param sample: a single sample, without the batch dimension
+        :return: a future resolving to a dictionary mapping output labels to the outputs of the sample
+        :raises RuntimeError: if the batcher was closed
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Unable to submit samples to a closed {self.__class__.__name__}")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dynamic-batcher", daemon=True)
+                self._thread.start()
+
+            self._queue.append(_Request(sample, future, time.perf_counter()))
+            self._cond.notify_all()
+        return future
+
+    def close(self) -> None:
+        """
+        Dispatch the samples still queued and stop the scheduler
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join()
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get statistics of the batches dispatched, e.g. to chart the throughput and latency trade-off of
+        `max_batch_size` and `max_queue_delay_ms`
+
+        :return: a dictionary with the number of `frames` and `batches`, the `mean_batch_size`, the mean time in
+                 milliseconds samples spent queued (`mean_queue_ms`) and batches spent in the model (`mean_infer_ms`),
+                 and the number of batches of each size under `batch_size_<n>` keys
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            frames = sum(size * count for size, count in self._batch_sizes.items())
+            stats = {
+                "frames": frames,
+                "batches": batches,
+                "mean_batch_size": frames / batches if batches else 0.0,
+                "mean_queue_ms": self._queue_time * 1e3 / frames if frames else 0.0,
+                "mean_infer_ms": self._infer_time * 1e3 / batches if batches else 0.0,
+            }
+            stats.update({f"batch_size_{size}": count for size, count in sorted(self._batch_sizes.items())})
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+
+                # wait for the batch to fill up until the oldest sample has waited long enough
+                deadline = self._queue[0].enqueued_at + self._max_queue_delay
+                while len(self._queue) < self._max_batch_size and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                requests = self._take_batch()
+
+            self._dispatch(requests)
+
+    def _take_batch(self) -> List[_Request]:
+        head = self._queue[0].sample
+        requests, remaining = [], deque()
+        while self._queue:
+            request = self._queue.popleft()
+            matches = request.sample.shape == head.shape and request.sample.dtype == head.dtype
+            if matches and len(requests) < self._max_batch_size:
+                requests.append(request)
+            else:
+                remaining.append(request)
+        self._queue = remaining
+        return requests
+
+    def _dispatch(self, requests: List[_Request]) -> None:
+        start = time.perf_counter()
+        try:
+            outputs = self._model(np.stack([request.sample for request in requests]))
+            for label, output in outputs.items():
+                if len(output) != len(requests):
+                    raise StreamTransformChainError(
+                        f"Output {label} has a batch size of {len(output)}, expected {len(requests)}"
+                    )
+        except Exception as e:
+            logger.exception(e)
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self._batch_sizes[len(requests)] += 1
+            self._queue_time += sum(start - request.enqueued_at for request in requests)
+            self._infer_time += elapsed
+
+        for idx, request in enumerate(requests):
+            request.future.set_result({label: output[idx] for label, output in outputs.items()})
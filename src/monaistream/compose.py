@@ -11,21 +11,43 @@
 # limitations under the License.
 ################################################################################
 
+import asyncio
 import logging
-from typing import Sequence
-
-from gi.repository import GLib, Gst
-
-from monaistream.errors import BinCreationError, StreamComposeCreationError, StreamTransformChainError
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Sequence
+
+from gi.repository import Gst
+
+from monaistream.errors import (
+    BinCreationError,
+    StreamComposeCreationError,
+    StreamComposeCreationStructureError,
+    StreamComponentSwapError,
+    StreamTransformChainError,
+)
 from monaistream.filters.convert import NVVideoConvert
 from monaistream.filters.infer import NVInferServer
+from monaistream.filters.infer_local import LocalInferServer
+from monaistream.filters.queue import QueueComponent, QueuePolicy
+from monaistream.filters.tee import TeeComponent
 from monaistream.interface import (
     AggregatedSourcesComponent,
+    BranchingComponent,
     InferenceFilterComponent,
     StreamComponent,
+    StreamFilterComponent,
+    StreamSinkComponent,
     StreamSourceComponent,
 )
+from monaistream.mainloop import MainLoopThread
+from monaistream.qos import QoSController, QoSPolicy
+from monaistream.snapshot import GraphSnapshotter, SnapshotConfig
 from monaistream.sources.ajavideosrc import AJAVideoSource
+from monaistream.trace import END_TO_END, LatencyTracer
+from monaistream.warmup import PipelineWarmup
 
 logger = logging.getLogger(__name__)
 
@@ -35,43 +57,182 @@ class StreamCompose(object):
     MONAI Stream pipeline composer is the core function that allows MONAI Stream and MONAI core elements to integrate.
     """
 
-    def __init__(self, components: Sequence[StreamComponent]):
+    def __init__(
+        self,
+        components: Sequence[StreamComponent],
+        trace: bool = False,
+        snapshots: Optional[SnapshotConfig] = None,
+        auto_queue: bool = False,
+        queue_policies: Optional[Dict[str, QueuePolicy]] = None,
+        latency_budget: Optional[float] = None,
+        qos_policy: QoSPolicy = "drop",
+        warmup_frames: int = 0,
+    ):
         """
         At initialization all components in the pipeline are initilized thought the `initialize` method, and are then
         linked by retrieving their underlying GStreamer elements through `get_gst_element`.
 
         :param components: is a sequence of `StreamComponent` from which all components in MONAI Stream SDK are inherited
+        :param trace: when `True` the time each frame spends inside every component is recorded
+                      (see :meth:`get_latency_report`)
+        :param snapshots: the configuration of pipeline graph snapshots (see
+                          :class:`monaistream.snapshot.SnapshotConfig`), snapshots are disabled when not provided
+        :param auto_queue: when `True` a queue is inserted after live sources and in front of every filter component
+                           which processes frames (e.g. transforms and inference), so that each of them runs in its own
+                           streaming thread; queues fed by live sources drop the oldest frames instead of building up
+                           latency (see :meth:`monaistream.filters.queue.QueuePolicy.live`)
+        :param queue_policies: a dictionary mapping the name of a component to the :class:`.QueuePolicy` of the queue
+                               inserted in front of it, which also inserts queues where `auto_queue` would not; for
+                               the first component of a branch the policy applies to the queue of the branch
+        :param latency_budget: the maximum age in milliseconds of a frame reaching a transform or inference component
+                               for it to be processed (see :class:`monaistream.qos.QoSController`), by default all
+                               frames are processed
+        :param qos_policy: what to do with frames older than `latency_budget` in front of transform components,
+                           `"drop"` to discard them or `"skip"` to pass them on without calling the transform;
+                           stale frames are always dropped in front of inference components
+        :param warmup_frames: the number of copies of the first frame of each source pushed through the pipeline
+                              and discarded before the sinks, while the first real frame is held back, so that
+                              transform and inference components are initialized before real frames reach them
+                              (see :meth:`get_warmup_report`)
         """
         self._pipeline = Gst.Pipeline()
         self._exception = None
+        self._components = list(components)
+        self._tracer: Optional[LatencyTracer] = None
+        self._snapshotter = GraphSnapshotter(self._pipeline, snapshots) if snapshots else None
+        self._lock = threading.Lock()
+        self._runner: Optional[MainLoopThread] = None
+        self._owns_runner = False
+        self._result: Optional[Future] = None
+        self._qos = QoSController(latency_budget, qos_policy) if latency_budget is not None else None
+        self._warmup = PipelineWarmup(warmup_frames) if warmup_frames > 0 else None
+
+        # insert the queues before anything else so they are initialized and linked like any other component
+        self._components = self._insert_queues(self._components, auto_queue, queue_policies or {})
+
+        # components nested in the branches of branching components are configured in depth-first order
+        self._all_components = self._flatten(self._components)
 
         # initialize and configure components
         # link the sources and sinks between the aggregator and multiplexer
         # configure batch size in nvinfer server
-        batch_size = 1
-        src_is_live = False
-        insert_muxer = any([isinstance(c, NVInferServer) for c in components])
-        for component in components:
+        self._batch_size = 1
+        self._src_is_live = False
+        self._insert_muxer = any([isinstance(c, NVInferServer) for c in self._all_components])
+        for component in self._all_components:
             component.initialize()
 
             for elem in component.get_gst_element():
                 self._pipeline.add(elem)
 
             if isinstance(component, StreamSourceComponent):
-                src_is_live = component.is_live()
+                self._src_is_live = component.is_live()
 
-            insert_muxer = insert_muxer and (
+            self._insert_muxer = self._insert_muxer and (
                 not isinstance(component, AggregatedSourcesComponent) and not isinstance(component, AJAVideoSource)
             )
 
             # set the batch size of nvinferserver if it exists in the pipeline
             # from the number of sources otherwise assume there's only one source
             if isinstance(component, AggregatedSourcesComponent):
-                batch_size = component.get_num_sources()
+                self._batch_size = component.get_num_sources()
             elif isinstance(component, InferenceFilterComponent):
-                component.set_batch_size(batch_size)
+                component.set_batch_size(self._batch_size)
+
+        # link the components in the chain, and recursively in the branches of any branching component
+        self._link_chain(self._components)
+        self._attach_inference_outputs()
+
+        if self._qos:
+            for component in self._all_components:
+                self._attach_qos(component)
+
+        # warm-up probes are attached before tracing so that the first traced frame is the released real frame
+        if self._warmup:
+            for component in self._all_components:
+                if isinstance(component, StreamSourceComponent):
+                    self._warmup.attach_source(component)
+            for component in self._all_components:
+                if isinstance(component, StreamSinkComponent):
+                    self._warmup.attach_sink(component)
+
+        if trace:
+            self.enable_tracing()
+
+    def _insert_queues(
+        self,
+        components: Sequence[StreamComponent],
+        auto_queue: bool,
+        policies: Dict[str, QueuePolicy],
+        is_live: Optional[bool] = None,
+    ) -> List[StreamComponent]:
+        if is_live is None:
+            is_live = any(isinstance(c, StreamSourceComponent) and c.is_live() for c in self._flatten(components))
+
+        chain: List[StreamComponent] = []
+        for idx, component in enumerate(components):
+            if idx > 0 and not isinstance(components[idx - 1], QueueComponent):
+                upstream = components[idx - 1]
+                policy = policies.get(component.get_name())
+                if policy is None and auto_queue and self._needs_queue(upstream, component):
+                    policy = QueuePolicy.live() if is_live else QueuePolicy()
+                if policy is not None and not isinstance(component, QueueComponent):
+                    chain.append(QueueComponent(policy, name=f"{component.get_name()}-input"))
+
+            # the heads of the branches are already decoupled by the queues of the branching component, so configure
+            # those and insert queues only further down the branches
+            if isinstance(component, TeeComponent):
+                for branch_name, branch in list(component.get_branches().items()):
+                    policy = policies.get(branch[0].get_name()) if branch else None
+                    if policy is None and auto_queue and is_live:
+                        policy = QueuePolicy.live()
+                    if policy is not None:
+                        component.get_branch_queue_component(branch_name).set_policy(policy)
+                    component.set_branch(branch_name, self._insert_queues(branch, auto_queue, policies, is_live))
+
+            chain.append(component)
+
+        return chain
+
+    @staticmethod
+    def _needs_queue(upstream: StreamComponent, component: StreamComponent) -> bool:
+        # a thread boundary keeps live sources from stalling, and lets frame-processing filters run concurrently
+        # with the components upstream of them; converters and branching components are cheap enough to share one
+        if isinstance(upstream, StreamSourceComponent) and upstream.is_live():
+            return True
+        return isinstance(component, StreamFilterComponent) and not isinstance(
+            component, (NVVideoConvert, QueueComponent, BranchingComponent)
+        )
+
+    def get_queue_levels(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the current depth of every queue inserted by `StreamCompose` or fed to a branch, as well as of any
+        :class:`monaistream.filters.queue.QueueComponent` provided explicitly
 
-        # link the components in the chain
+        :return: a dictionary mapping queue names to the output of
+                 :meth:`monaistream.filters.queue.QueueComponent.get_stats`
+        """
+        levels: Dict[str, Dict[str, int]] = {}
+        for component in self._all_components:
+            if isinstance(component, QueueComponent):
+                levels[component.get_name()] = component.get_stats()
+            elif isinstance(component, TeeComponent):
+                for branch_name in component.get_branches():
+                    queue = component.get_branch_queue_component(branch_name)
+                    levels[queue.get_name()] = queue.get_stats()
+        return levels
+
+    @staticmethod
+    def _flatten(components: Sequence[StreamComponent]) -> List[StreamComponent]:
+        flat: List[StreamComponent] = []
+        for component in components:
+            flat.append(component)
+            if isinstance(component, BranchingComponent):
+                for branch in component.get_branches().values():
+                    flat.extend(StreamCompose._flatten(branch))
+        return flat
+
+    def _link_chain(self, components: Sequence[StreamComponent]) -> None:
         for idx in range(len(components) - 1):
 
             curr_component = components[idx]
@@ -79,14 +240,21 @@ class StreamCompose(object):
             curr_component_elem = curr_component_elems[-1]
             next_component_elem = components[idx + 1].get_gst_element()[0]
 
+            # branches fan out of a branching component, so nothing may follow it in the same chain
+            if isinstance(curr_component, BranchingComponent):
+                raise StreamComposeCreationStructureError(
+                    f"{curr_component.get_name()} must be the last component of its chain, "
+                    f"add {components[idx + 1].get_name()} to one of its branches instead"
+                )
+
             # link subelements of element (e.g. converters and capsfilters in NVVideoConvert components)
             for subidx in range(len(curr_component_elems) - 1):
 
                 # an aggregated source is a special component that contains a muxer which
                 # is necessary to batch data from all the sources listed in the aggregator
-                if isinstance(components[idx], AggregatedSourcesComponent):
+                if isinstance(curr_component, AggregatedSourcesComponent):
                     source, muxer = curr_component_elems
-                    num_sources = components[idx].get_num_sources()
+                    num_sources = curr_component.get_num_sources()
 
                     for src_idx in range(num_sources):
 
@@ -94,18 +262,20 @@ class StreamCompose(object):
                         sinkpad = muxer.get_request_pad(f"sink_{src_idx}")
                         if not sinkpad:
                             raise StreamComposeCreationError(
-                                f"Unable to create multiplexer sink pad bin for {component.get_name()}"
+                                f"Unable to create multiplexer sink pad bin for {curr_component.get_name()}"
                             )
 
                         # get the source pad from the upstream component
                         srcpad = source.get_static_pad("src")
                         if not srcpad:
-                            raise StreamComposeCreationError(f"Unable to create bin src pad for {component.get_name()}")
+                            raise StreamComposeCreationError(
+                                f"Unable to create bin src pad for {curr_component.get_name()}"
+                            )
 
                         link_code = srcpad.link(sinkpad)
                         if link_code != Gst.PadLinkReturn.OK:
                             logger.error(
-                                f"Linking of source and multiplexer for component {component.get_name()}"
+                                f"Linking of source and multiplexer for component {curr_component.get_name()}"
                                 f" failed: {link_code.value_nick}"
                             )
                             exit(1)
@@ -116,10 +286,10 @@ class StreamCompose(object):
 
                     link_code = curr_component_elems[subidx].link(curr_component_elems[subidx + 1])
                     if not link_code:
-                        logger.error(f"Creation of {components[idx].get_name()} failed")
+                        logger.error(f"Creation of {curr_component.get_name()} failed")
                         exit(1)
 
-            if isinstance(curr_component, NVVideoConvert) and insert_muxer:
+            if isinstance(curr_component, NVVideoConvert) and self._insert_muxer:
                 # a multiplexer is necessary when `nvinferserver`` is present as it provides batch
                 # metadata to the pipeline which nvinferserver can consume
                 muxer = Gst.ElementFactory.make("nvstreammux", f"{curr_component.get_name()}-nvstreammux")
@@ -129,7 +299,8 @@ class StreamCompose(object):
                         f" with name {curr_component.get_name()}"
                     )
 
-                muxer.set_property("batch-size", batch_size)
+                self._pipeline.add(muxer)
+                muxer.set_property("batch-size", self._batch_size)
 
                 src_prop_names = [c.name for c in curr_component_elem.list_properties()]
                 if (
@@ -148,24 +319,24 @@ class StreamCompose(object):
                         "height", curr_component_elem.get_property("caps").get_structure(0).get_int("height").value
                     )
 
-                muxer.set_property("live-source", src_is_live)
+                muxer.set_property("live-source", self._src_is_live)
 
                 # get a sinkpad from the multiplexer
                 sinkpad = muxer.get_request_pad("sink_0")
                 if not sinkpad:
                     raise StreamComposeCreationError(
-                        f"Unable to create multiplexer sink pad bin for {component.get_name()}"
+                        f"Unable to create multiplexer sink pad bin for {curr_component.get_name()}"
                     )
 
                 # get the source pad from the current source
                 srcpad = curr_component_elem.get_static_pad("src")
                 if not srcpad:
-                    raise StreamComposeCreationError(f"Unable to create bin src pad for {component.get_name()}")
+                    raise StreamComposeCreationError(f"Unable to create bin src pad for {curr_component.get_name()}")
 
                 link_code = srcpad.link(sinkpad)
                 if link_code != Gst.PadLinkReturn.OK:
                     logger.error(
-                        f"Linking of source and multiplexer for component {component.get_name()}"
+                        f"Linking of source and multiplexer for component {curr_component.get_name()}"
                         f" failed: {link_code.value_nick}"
                     )
                     exit(1)
@@ -174,7 +345,7 @@ class StreamCompose(object):
 
                 if not link_code:
                     logger.error(
-                        f"Linking of {components[idx].get_name()}-multiplexer and "
+                        f"Linking of {curr_component.get_name()}-multiplexer and "
                         f"{components[idx + 1].get_name()} failed"
                     )
                     exit(1)
@@ -185,14 +356,435 @@ class StreamCompose(object):
 
                 if not link_code:
                     logger.error(
-                        f"Linking of {components[idx].get_name()} and " f"{components[idx + 1].get_name()} failed"
+                        f"Linking of {curr_component.get_name()} and " f"{components[idx + 1].get_name()} failed"
                     )
                     exit(1)
 
-    def bus_call(self, bus, message, loop):
+        if components and isinstance(components[-1], BranchingComponent):
+            self._link_branches(components[-1])
+
+    def _link_branches(self, component: BranchingComponent) -> None:
+        # each branch is fed by its own request pad of the splitting element through a dedicated queue, so that
+        # every branch runs in its own streaming thread
+        splitter = component.get_gst_element()[0]
+        for branch_name, branch in component.get_branches().items():
+            if not branch:
+                raise StreamComposeCreationStructureError(
+                    f"Branch {branch_name} of {component.get_name()} has no components"
+                )
+
+            queue = component.get_branch_queue(branch_name)
+            srcpad = splitter.get_request_pad("src_%u")
+            if not srcpad:
+                raise StreamComposeCreationError(
+                    f"Unable to create source pad for branch {branch_name} of {component.get_name()}"
+                )
+
+            link_code = srcpad.link(queue.get_static_pad("sink"))
+            if link_code != Gst.PadLinkReturn.OK:
+                raise StreamComposeCreationError(
+                    f"Linking of branch {branch_name} of {component.get_name()} failed: {link_code.value_nick}"
+                )
+
+            if not queue.link(branch[0].get_gst_element()[0]):
+                raise StreamComposeCreationError(
+                    f"Linking of branch {branch_name} of {component.get_name()} and {branch[0].get_name()} failed"
+                )
+
+            self._link_chain(branch)
+
+    def get_name(self) -> str:
+        """
+        Get the name of the underlying GStreamer pipeline
+
+        :return: the name of the pipeline as `str`
+        """
+        return self._pipeline.get_name()
+
+    def enable_tracing(self) -> None:
+        """
+        Attach buffer probes to the boundaries of every component to record the time each frame spends inside it.
+        Tracing must be enabled before the pipeline is started; calling this method more than once has no effect.
+        """
+        if self._tracer:
+            return
+
+        self._tracer = LatencyTracer()
+        for component in self._all_components:
+            self._tracer.attach(
+                component,
+                is_source=isinstance(component, StreamSourceComponent),
+                is_sink=isinstance(component, StreamSinkComponent),
+            )
+
+    def get_latency_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the per-component and end-to-end latency of the frames that went through the pipeline. Per-component
+        latency is the time between a frame (matched by its PTS) entering and leaving a component, and end-to-end
+        latency is the time between a frame leaving the source and reaching the sink. The latency of a branching
+        component is reported for each of its branches, as `<component>/<branch>`.
+
+        :return: a dictionary mapping the name of each component and `"end-to-end"` to the `count` of traced frames
+                 and the `mean`, `p50`, `p95` and `p99` latency in milliseconds, or an empty dictionary
+                 when tracing is not enabled
+        """
+        if not self._tracer:
+            return {}
+        return self._tracer.get_report()
+
+    def get_latency_samples(self, name: str = END_TO_END) -> List[float]:
+        """
+        Get the most recent latency samples recorded by the tracer, e.g. to aggregate percentiles across pipelines
+
+        :param name: the name of a component, or `"end-to-end"` for the latency across the whole pipeline
+        :return: a list of latencies in milliseconds, empty when tracing is not enabled
+        """
+        if not self._tracer:
+            return []
+        return self._tracer.get_samples(name)
+
+    def get_warmup_report(self) -> Dict[str, float]:
+        """
+        Get the outcome of the warm-up phase configured with `warmup_frames`
+
+        :return: a dictionary with the number of warm-up `frames`, the number of warm-up frames `lost` before
+                 reaching a sink, the `warmup_ms` during which the first real frame was held back, and the
+                 `first_frame_ms` latency of that frame from its release to a sink, or an empty dictionary when
+                 warm-up is disabled
+        """
+        if not self._warmup:
+            return {}
+        return self._warmup.get_report()
+
+    def get_qos_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the number of frames each transform and inference component processed, skipped and dropped because
+        they exceeded the latency budget
+
+        :return: a dictionary mapping component names to their `processed`, `skipped` and `dropped` frame counts,
+                 or an empty dictionary when no latency budget is set
+        """
+        if not self._qos:
+            return {}
+        return self._qos.get_stats()
+
+    def _attach_inference_outputs(
+        self, components: Optional[Sequence[StreamComponent]] = None, inference: Optional[LocalInferServer] = None
+    ) -> None:
+        # transforms receive the outputs of the closest in-process inference component upstream of them; each branch
+        # inherits the inference component of the chain it forks from, never one of a sibling branch
+        for component in self._components if components is None else components:
+            if isinstance(component, LocalInferServer):
+                inference = component
+            elif hasattr(component, "set_inference_outputs"):
+                component.set_inference_outputs(inference)
+
+            if isinstance(component, BranchingComponent):
+                for branch in component.get_branches().values():
+                    self._attach_inference_outputs(branch, inference)
+
+    def _attach_qos(self, component: StreamComponent) -> None:
+        # transforms check the budget themselves so that stale frames can skip the callback and still flow downstream
+        if hasattr(component, "set_qos_controller"):
+            component.set_qos_controller(self._qos)
+        elif isinstance(component, InferenceFilterComponent):
+            self._qos.attach(component)
+
+    def replace_transform_chain(
+        self, component: StreamComponent, transform_chain: Callable, output_label: Optional[str] = None
+    ) -> Dict[str, float]:
+        """
+        Replace the `transform_chain` of a transform component (e.g.
+        :class:`monaistream.filters.TransformChainComponent`) without interrupting the pipeline. The swap takes effect
+        between two frames so no frame is lost or processed by a mix of both callables.
+
+        :param component: the transform component, which must be part of this pipeline
+        :param transform_chain: the new `Callable`
+        :param output_label: the label key to select the output of the new `transform_chain`, unchanged by default
+        :return: a dictionary with the `latency_ms` of the swap (the time spent waiting for the frame being processed)
+                 and the number of `frames_affected`, which is always 0
+        :raises StreamComponentSwapError: if the component is not part of the pipeline or is not a transform
+        """
+        if component not in self._all_components:
+            raise StreamComponentSwapError(f"{component.get_name()} is not part of pipeline {self.get_name()}")
+        if not hasattr(component, "set_transform_chain"):
+            raise StreamComponentSwapError(f"{component.get_name()} does not support replacing its transform chain")
+
+        start = time.perf_counter()
+        component.set_transform_chain(transform_chain, output_label)
+        latency_ms = (time.perf_counter() - start) * 1e3
+
+        logger.info(f"Transform chain of {component.get_name()} replaced in {latency_ms:.3f}ms")
+        return {"latency_ms": latency_ms, "frames_affected": 0}
+
+    def replace_component(
+        self, old: StreamComponent, new: StreamComponent, timeout: Optional[float] = 10.0
+    ) -> Dict[str, float]:
+        """
+        Replace a filter component (e.g. an :class:`monaistream.filters.NVInferServer` serving a different model)
+        while the pipeline is running, without tearing the pipeline down. The new component is initialized and
+        brought to the `PAUSED` state first, so that expensive work such as loading a model happens while frames
+        still flow through the old component. The pad feeding the old component is then blocked, the frames in
+        flight inside the old component are drained downstream, the new component is linked in its place, and the
+        pad is unblocked. Latency tracing and the latency budget carry over to the new component.
+
+        If the swap fails or times out, it is rolled back: the elements of the new component are stopped and removed
+        from the pipeline, and the old component stays linked and keeps processing frames. Frames which were in
+        flight inside the old component when its drain timed out are flushed and lost.
+
+        :param old: the component to replace, which must be a filter component of this pipeline
+        :param new: the replacement component, whose name must differ from the names of the components in the pipeline
+        :param timeout: the maximum time in seconds to wait for a frame to block on and for the old component to
+                        drain, or `None` to wait indefinitely
+        :return: a dictionary with the `latency_ms` during which the stream was blocked, and the number of
+                 `frames_affected` which were delayed by the swap (drained from the old component or blocked in
+                 front of it)
+        :raises StreamComponentSwapError: if the components cannot be swapped or the swap does not complete in time
+        """
+        chain = self._find_chain(self._components, old)
+        if chain is None:
+            raise StreamComponentSwapError(f"{old.get_name()} is not part of pipeline {self.get_name()}")
+        if not isinstance(old, StreamFilterComponent) or isinstance(old, (BranchingComponent, QueueComponent)):
+            raise StreamComponentSwapError(
+                f"Only transform and inference components can be replaced, not {old.get_name()}"
+            )
+        if not isinstance(new, StreamFilterComponent) or isinstance(new, BranchingComponent):
+            raise StreamComponentSwapError(f"{new.get_name()} cannot replace {old.get_name()}")
+
+        old_elems = old.get_gst_element()
+        old_sinkpad = old_elems[0].get_static_pad("sink")
+        old_srcpad = old_elems[-1].get_static_pad("src")
+        upstream_pad = old_sinkpad.get_peer() if old_sinkpad else None
+        downstream_pad = old_srcpad.get_peer() if old_srcpad else None
+        if not upstream_pad:
+            raise StreamComponentSwapError(f"{old.get_name()} is not linked to an upstream component")
+
+        new_elems = self._prepare_replacement(new)
+        new_sinkpad = new_elems[0].get_static_pad("sink")
+        new_srcpad = new_elems[-1].get_static_pad("src")
+
+        def _relink() -> None:
+            upstream_pad.unlink(old_sinkpad)
+            if downstream_pad:
+                old_srcpad.unlink(downstream_pad)
+
+            try:
+                if downstream_pad and new_srcpad.link(downstream_pad) != Gst.PadLinkReturn.OK:
+                    raise StreamComponentSwapError(f"Linking of {new.get_name()} to its downstream component failed")
+                if upstream_pad.link(new_sinkpad) != Gst.PadLinkReturn.OK:
+                    raise StreamComponentSwapError(f"Linking of {new.get_name()} to its upstream component failed")
+            except StreamComponentSwapError:
+                # link the old component back so that it keeps working
+                if downstream_pad and new_srcpad.get_peer() == downstream_pad:
+                    new_srcpad.unlink(downstream_pad)
+                if upstream_pad.get_peer() == new_sinkpad:
+                    upstream_pad.unlink(new_sinkpad)
+                upstream_pad.link(old_sinkpad)
+                if downstream_pad:
+                    old_srcpad.link(downstream_pad)
+                raise
+
+            for elem in new_elems:
+                elem.sync_state_with_parent()
+
+        try:
+            if self._runner is None:
+                # nothing flows through the pipeline yet so the components are relinked right away
+                start = time.perf_counter()
+                _relink()
+                report = {"latency_ms": (time.perf_counter() - start) * 1e3, "frames_affected": 0}
+            else:
+                report = self._swap_running(old_sinkpad, old_srcpad, upstream_pad, _relink, timeout)
+        except Exception:
+            self._discard_elements(new_elems)
+            raise
+
+        for elem in old_elems:
+            elem.set_state(Gst.State.NULL)
+            self._pipeline.remove(elem)
+
+        chain[chain.index(old)] = new
+        self._all_components[self._all_components.index(old)] = new
+        self._attach_inference_outputs()
+
+        if self._qos:
+            self._attach_qos(new)
+        if self._tracer:
+            self._tracer.attach(new)
+            # the downstream component was traced from the source pad of the old component
+            idx = chain.index(new)
+            if idx + 1 < len(chain):
+                self._tracer.attach_entry(chain[idx + 1], is_sink=isinstance(chain[idx + 1], StreamSinkComponent))
+
+        logger.info(
+            f"{old.get_name()} replaced by {new.get_name()} in {report['latency_ms']:.3f}ms, "
+            f"{report['frames_affected']} frames affected"
+        )
+        return report
+
+    def _prepare_replacement(self, component: StreamComponent) -> Sequence[Gst.Element]:
+        component.initialize()
+        if isinstance(component, InferenceFilterComponent):
+            component.set_batch_size(self._batch_size)
+
+        elems = component.get_gst_element()
+        for elem in elems:
+            if self._pipeline.get_by_name(elem.get_name()):
+                raise StreamComponentSwapError(
+                    f"Pipeline {self.get_name()} already has an element named {elem.get_name()}, "
+                    f"give {component.get_name()} a different name"
+                )
+
+        for elem in elems:
+            self._pipeline.add(elem)
+
+        try:
+            for upstream, downstream in zip(elems, elems[1:]):
+                if not upstream.link(downstream):
+                    raise StreamComponentSwapError(f"Creation of {component.get_name()} failed")
+
+            # reaching PAUSED starts the elements (e.g. loads the model of an inference server) before any pad is
+            # blocked
+            for elem in elems:
+                if elem.set_state(Gst.State.PAUSED) == Gst.StateChangeReturn.FAILURE:
+                    raise StreamComponentSwapError(f"Unable to start {component.get_name()}")
+        except Exception:
+            self._discard_elements(elems)
+            raise
+
+        return elems
+
+    def _discard_elements(self, elems: Sequence[Gst.Element]) -> None:
+        # stop and remove the elements of a replacement which did not make it into the pipeline
+        for elem in elems:
+            elem.set_state(Gst.State.NULL)
+            if elem.get_parent() == self._pipeline:
+                self._pipeline.remove(elem)
+
+    def _swap_running(
+        self,
+        old_sinkpad: Gst.Pad,
+        old_srcpad: Gst.Pad,
+        upstream_pad: Gst.Pad,
+        relink: Callable[[], None],
+        timeout: Optional[float],
+    ) -> Dict[str, float]:
+        state = {"blocked_at": None, "frames": 0, "error": None, "cancelled": False, "drain_id": None}
+        state_lock = threading.Lock()
+        swapped = threading.Event()
+
+        def _on_drained(pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: object):
+            # buffers leaving the old component after the block are frames that were in flight inside it
+            if info.type & Gst.PadProbeType.BUFFER:
+                state["frames"] += 1
+                return Gst.PadProbeReturn.OK
+
+            event_type = info.get_event().type
+            if event_type in (Gst.EventType.FLUSH_START, Gst.EventType.FLUSH_STOP):
+                # flushes reset the old component after a failed swap and must not reach the rest of the pipeline
+                return Gst.PadProbeReturn.DROP
+            if event_type != Gst.EventType.EOS:
+                return Gst.PadProbeReturn.OK
+
+            # the old component is empty: link the new component while the upstream pad is still blocked, and drop
+            # the end-of-stream event so that it never reaches the rest of the pipeline; once the swap was given up,
+            # a late end-of-stream event is dropped without relinking
+            with state_lock:
+                if not state["cancelled"] and not swapped.is_set():
+                    try:
+                        relink()
+                    except Exception as e:
+                        state["error"] = e
+                    swapped.set()
+            return Gst.PadProbeReturn.DROP
+
+        def _on_blocked(pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: object):
+            with state_lock:
+                if state["cancelled"]:
+                    # the swap was given up and the probe is about to be removed
+                    return Gst.PadProbeReturn.PASS
+                if state["blocked_at"] is not None:
+                    return Gst.PadProbeReturn.OK
+
+                state["blocked_at"] = time.perf_counter()
+                if info.type & Gst.PadProbeType.BUFFER:
+                    state["frames"] += 1
+
+                state["drain_id"] = old_srcpad.add_probe(
+                    Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM | Gst.PadProbeType.EVENT_FLUSH,
+                    _on_drained,
+                    None,
+                )
+            old_sinkpad.send_event(Gst.Event.new_eos())
+
+            # the pad stays blocked until the probe is removed once the new component is linked
+            return Gst.PadProbeReturn.OK
+
+        block_id = upstream_pad.add_probe(Gst.PadProbeType.BLOCK_DOWNSTREAM, _on_blocked, None)
+        swapped.wait(timeout)
+        with state_lock:
+            # the swap may still complete between the end of the wait and the cancellation
+            completed = swapped.is_set()
+            state["cancelled"] = not completed
+
+        if (not completed or state["error"] is not None) and state["drain_id"] is not None:
+            # the old component received an end-of-stream event, which is cleared by flushing it while the upstream
+            # pad is still blocked; the segment it expects before the next frame is sent again
+            old_sinkpad.send_event(Gst.Event.new_flush_start())
+            old_sinkpad.send_event(Gst.Event.new_flush_stop(False))
+            segment = upstream_pad.get_sticky_event(Gst.EventType.SEGMENT, 0)
+            if segment:
+                old_sinkpad.send_event(segment)
+        if state["drain_id"] is not None:
+            old_srcpad.remove_probe(state["drain_id"])
+
+        upstream_pad.remove_probe(block_id)
+        resumed_at = time.perf_counter()
+
+        if not completed:
+            if state["blocked_at"] is None:
+                raise StreamComponentSwapError(f"No frame reached the component to replace within {timeout}s")
+            raise StreamComponentSwapError(f"The component to replace did not drain within {timeout}s")
+        if state["error"]:
+            raise state["error"]
+
+        return {"latency_ms": (resumed_at - state["blocked_at"]) * 1e3, "frames_affected": state["frames"]}
+
+    @staticmethod
+    def _find_chain(
+        components: List[StreamComponent], component: StreamComponent
+    ) -> Optional[List[StreamComponent]]:
+        # the chain (the top-level components or a branch) which contains the component
+        if component in components:
+            return components
+
+        for candidate in components:
+            if isinstance(candidate, BranchingComponent):
+                for branch in candidate.get_branches().values():
+                    chain = StreamCompose._find_chain(branch, component)
+                    if chain is not None:
+                        return chain
+
+        return None
+
+    def snapshot(self, event: str = "on-demand") -> bool:
+        """
+        Request a DOT snapshot of the pipeline graph. The snapshot is written asynchronously so this method may be
+        called from the main loop or any other thread.
+
+        :param event: the label of the snapshot, which must be one of the events configured in
+                      :class:`monaistream.snapshot.SnapshotConfig`
+        :return: `True` if the snapshot was scheduled
+        """
+        if not self._snapshotter:
+            return False
+        return self._snapshotter.request(event)
+
+    def bus_call(self, bus: Gst.Bus, message: Gst.Message, user_data: object = None) -> bool:
         if message.type == Gst.MessageType.EOS:
             logger.info("[INFO] End of stream")
-            loop.quit()
+            self.snapshot("eos")
+            self._finish()
 
         elif message.type == Gst.MessageType.INFO:
             info, debug = message.parse_info()
@@ -205,40 +797,163 @@ class StreamCompose(object):
         elif message.type == Gst.MessageType.ERROR:
             err, debug = message.parse_error()
             logger.error("[EROR] {}: {}".format(err, debug))
-            loop.quit()
-            self._exception = StreamTransformChainError(f"Pipeline failed - {err}: {debug}")
+            self.snapshot("error")
+            self._finish(StreamTransformChainError(f"Pipeline failed - {err}: {debug}"))
 
         elif message.type == Gst.MessageType.STATE_CHANGED:
             old, new, pending = message.parse_state_changed()
             logger.debug("State changed from %s to %s (pending=%s)", old.value_name, new.value_name, pending.value_name)
-            Gst.debug_bin_to_dot_file(
-                self._pipeline, Gst.DebugGraphDetails.ALL, f"{self._pipeline.name}-{old.value_name}-{new.value_name}"
-            )
+            if message.src == self._pipeline and new == Gst.State.PLAYING:
+                self.snapshot("playing")
 
         elif message.type == Gst.MessageType.STREAM_STATUS:
             type_, owner = message.parse_stream_status()
             logger.debug("Stream status changed to %s (owner=%s)", type_.value_name, owner.name)
-            Gst.debug_bin_to_dot_file(
-                self._pipeline, Gst.DebugGraphDetails.ALL, f"{self._pipeline.name}-{type_.value_name}"
-            )
 
         elif message.type == Gst.MessageType.DURATION_CHANGED:
             logger.debug("Duration changed")
 
         return True
 
-    def __call__(self) -> None:
-        loop = GLib.MainLoop()
+    def start(self) -> None:
+        """
+        Start the pipeline without blocking. Bus messages are dispatched by a main loop running in a background
+        thread managed by this object; use :meth:`wait`, :meth:`stop` or :meth:`run` to obtain the outcome.
+        """
+        runner = MainLoopThread(f"{self._pipeline.name}-mainloop")
+        runner.start()
+        self._start_on(runner, owns_runner=True)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the pipeline to reach the end of the stream or fail, and release its resources once it has
+
+        :param timeout: the maximum time in seconds to wait, or `None` to wait indefinitely
+        :return: `True` if the pipeline has finished, `False` if the timeout expired first
+        :raises StreamTransformChainError: if the pipeline failed
+        """
+        if self._result is None:
+            return True
+
+        try:
+            exception = self._result.exception(timeout)
+        except FutureTimeoutError:
+            return False
+
+        self._teardown()
+        if exception:
+            raise exception
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the pipeline gracefully by sending an end-of-stream event so all in-flight frames are processed. If the
+        end of the stream is not reached within `timeout` the pipeline is stopped regardless. Errors raised by the
+        pipeline are not raised by this method but by a subsequent call to :meth:`wait`.
+
+        :param timeout: the maximum time in seconds to wait for the end of the stream, or `None` to wait indefinitely
+        """
+        runner = self._runner
+        if not runner:
+            return
+
+        if not self._result.done():
+            self._pipeline.send_event(Gst.Event.new_eos())
+            try:
+                # the end-of-stream message cannot be dispatched while the main loop thread is blocked here
+                if runner.in_loop_thread():
+                    raise FutureTimeoutError()
+                self._result.exception(timeout)
+            except FutureTimeoutError:
+                logger.warning(f"Pipeline {self._pipeline.name} did not reach the end of stream, stopping")
+                runner.invoke(self._finish)
+
+        self._teardown()
+
+    async def run(self) -> None:
+        """
+        Start the pipeline and asynchronously wait for it to finish from an `asyncio` event loop. The GStreamer
+        main loop runs in a background thread so the event loop is never blocked. Cancelling the calling task
+        stops the pipeline gracefully.
+
+        :raises StreamTransformChainError: if the pipeline failed
+        """
+        loop = asyncio.get_running_loop()
+        self.start()
+        try:
+            # shielded so that cancelling the task does not cancel the result of the pipeline itself
+            await asyncio.shield(asyncio.wrap_future(self._result))
+        except asyncio.CancelledError:
+            await loop.run_in_executor(None, self.stop)
+            raise
+        except Exception:
+            # raised by `wait` below once the pipeline has been torn down
+            pass
+
+        await loop.run_in_executor(None, self.wait)
+
+    def _start_on(self, runner: MainLoopThread, owns_runner: bool) -> None:
+        with self._lock:
+            if self._runner:
+                raise StreamComposeCreationError(f"Pipeline {self._pipeline.name} is already running")
+            self._runner = runner
+            self._owns_runner = owns_runner
+            self._result = Future()
+            self._exception = None
+
+        runner.invoke(self._attach_bus)
+
+        if self._pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            runner.invoke(self._finish, StreamTransformChainError(f"Unable to start pipeline {self._pipeline.name}"))
+
+    def _attach_bus(self) -> None:
+        # called from the main loop thread so the watch is added to the context of that loop
         bus = self._pipeline.get_bus()
         bus.add_signal_watch()
+        self._bus_handler = bus.connect("message", self.bus_call)
 
-        bus.connect("message", self.bus_call, loop)
+    def _detach_bus(self) -> None:
+        bus = self._pipeline.get_bus()
+        bus.disconnect(self._bus_handler)
+        bus.remove_signal_watch()
+
+    def _finish(self, exception: Optional[Exception] = None) -> None:
+        # called from the main loop thread to resolve the outcome of the pipeline
+        if self._result is None or self._result.done():
+            return
+
+        self._exception = exception
+        if exception:
+            self._result.set_exception(exception)
+        else:
+            self._result.set_result(None)
+
+    def _teardown(self) -> None:
+        with self._lock:
+            runner, self._runner = self._runner, None
+        if not runner:
+            return
+
+        if self._snapshotter:
+            # let pending snapshots (e.g. on error) capture the pipeline before it is torn down
+            self._snapshotter.close()
+
+        self._pipeline.set_state(Gst.State.NULL)
+        runner.invoke(self._detach_bus)
+        if self._owns_runner:
+            runner.stop()
+
+        if self._tracer:
+            self._tracer.log_report()
 
-        self._pipeline.set_state(Gst.State.PLAYING)
+    def __call__(self) -> None:
+        """
+        Run the pipeline and block until it reaches the end of the stream
 
+        :raises StreamTransformChainError: if the pipeline failed
+        """
+        self.start()
         try:
-            loop.run()
+            self.wait()
         finally:
-            if self._exception:
-                raise self._exception
-            self._pipeline.set_state(Gst.State.NULL)
+            self.stop()
@@ -24,6 +24,10 @@ class StreamComposeCreationStructureError(StreamComposeCreationError):
     pass
 
 
+class StreamComponentSwapError(StreamComposeCreationError):
+    pass
+
+
 class StreamProbeCreationError(Exception):
     pass
 
@@ -13,5 +13,25 @@
 
 from .convert import FilterProperties, NVVideoConvert
 from .infer import *
-from .transform import TransformChainComponent
-from .transform_cupy import TransformChainComponentCupy
+from .infer_local import LocalInferServer, LocalModel
+from .queue import QueueComponent, QueuePolicy
+from .tee import TeeComponent
+from .transform_async import TransformChainComponentAsync
+from .transform_numpy import TransformChainComponentNumpy
+
+# the GPU transform components require `pyds`, `cupy` and `torch`, which are not installed on CPU-only nodes
+try:
+    from .transform import TransformChainComponent
+except ImportError:
+    pass
+
+try:
+    from .transform_cupy import TransformChainComponentCupy
+except ImportError:
+    pass
+
+# the process-pool transform component requires `multiprocessing.shared_memory` from Python 3.8
+try:
+    from .transform_process import TransformChainComponentProcess
+except ImportError:
+    pass
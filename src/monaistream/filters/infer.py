@@ -13,7 +13,8 @@
 
 import json
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, ClassVar, Dict, List, Optional
 from uuid import uuid4
 
 from gi.repository import Gst
@@ -23,6 +24,7 @@ from typing_extensions import Literal
 
 from monaistream.errors import BinCreationError
 from monaistream.interface import InferenceFilterComponent
+from monaistream.util.artifacts import DEFAULT_CACHE_DIR, ArtifactCache
 
 
 class TritonModelRepo(BaseModel):
@@ -171,9 +173,18 @@ class InferServerConfiguration(BaseModel):
 
 class NVInferServer(InferenceFilterComponent):
     """
-    Triton Inference server component
+    Triton Inference server component. The configuration files of `nvinferserver` are written to a content-addressed
+    cache, so that components sharing a configuration share a single rendering and a single file.
     """
 
+    # the compiled template and the rendered configurations are shared by all the components of the process
+    _template: ClassVar[Optional[Template]] = None
+    _rendered: ClassVar[Dict[str, str]] = {}
+    _config_caches: ClassVar[Dict[str, ArtifactCache]] = {}
+    _render_lock: ClassVar[threading.Lock] = threading.Lock()
+    _renders: ClassVar[int] = 0
+    _render_hits: ClassVar[int] = 0
+
     output_template = """infer_config {
     unique_id: {{ infer_config.unique_id }}
     {%- if infer_config.gpu_ids is defined and infer_config.gpu_ids is not none %}
@@ -411,7 +422,7 @@ async_mode: {{ async_mode|string|lower }}
         self,
         name: str = "",
         config: Optional[InferServerConfiguration] = None,
-        config_path: str = "/tmp",
+        config_path: Optional[str] = None,
     ) -> None:
         """
         Constructor for Triton Inference server component
@@ -419,17 +430,20 @@ async_mode: {{ async_mode|string|lower }}
         :param config: the configuration (:class:`.InferServerConfiguration`) for the Triton Inference Server streaming component
                        (if none is provided a default configuration is used)
         :param name: the name of the component
+        :param config_path: the directory of the cache of configuration files, by default `inferserver-configs` in
+                            the MONAI Stream cache directory (see :data:`monaistream.util.artifacts.DEFAULT_CACHE_DIR`)
         """
 
         if not name:
-            self._name = str(uuid4().hex)
+            name = str(uuid4().hex)
+        self._name = name
 
         self._config = config
         if not config:
             self._config = NVInferServer.generate_default_config()
 
-        self._tm = Template(NVInferServer.output_template)
-        self._config_path = config_path
+        self._config_path = config_path or os.path.join(DEFAULT_CACHE_DIR, "inferserver-configs")
+        self._config_file: Optional[str] = None
 
     @staticmethod
     def generate_default_config():
@@ -440,22 +454,84 @@ async_mode: {{ async_mode|string|lower }}
         """
         return InferServerConfiguration(**json.loads(NVInferServer.default_config))
 
+    @classmethod
+    def render_config(cls, config: InferServerConfiguration) -> str:
+        """
+        Render a configuration into the text format read by `nvinferserver`. The template is compiled once per
+        process and renderings are memoized, so rendering a configuration again costs a serialization.
+
+        :param config: the configuration
+        :return: the rendered configuration
+        """
+        key = json.dumps(config.dict(), sort_keys=True)
+        with cls._render_lock:
+            rendered = cls._rendered.get(key)
+            if rendered is not None:
+                NVInferServer._render_hits += 1
+                return rendered
+
+            if cls._template is None:
+                NVInferServer._template = Template(cls.output_template)
+            rendered = cls._rendered[key] = cls._template.render(**config.dict())
+            NVInferServer._renders += 1
+            return rendered
+
+    @classmethod
+    def write_config(cls, config: InferServerConfiguration, config_path: Optional[str] = None) -> str:
+        """
+        Write a configuration to the cache of configuration files, unless an identical configuration was written
+        before. Unused files are collected the first time a process uses the cache.
+
+        :param config: the configuration
+        :param config_path: the directory of the cache, see the constructor
+        :return: the path of the configuration file
+        """
+        config_path = config_path or os.path.join(DEFAULT_CACHE_DIR, "inferserver-configs")
+        rendered = cls.render_config(config)
+
+        with cls._render_lock:
+            cache = cls._config_caches.get(config_path)
+            if cache is None:
+                cache = cls._config_caches[config_path] = ArtifactCache(config_path, max_age=7 * 24 * 3600.0)
+                cache.collect()
+
+        key = ArtifactCache.make_key(rendered)
+        if not cache.lookup(key):
+            with cache.create(key) as staging:
+                with open(os.path.join(staging, "config.txt"), "w") as f:
+                    f.write(rendered)
+
+        return os.path.join(cache.get_path(key), "config.txt")
+
+    @classmethod
+    def get_config_cache_stats(cls) -> Dict[str, int]:
+        """
+        Get statistics of the configurations rendered and written by the process
+
+        :return: a dictionary with the number of `renders` of the template, of `render_hits` reusing a rendering,
+                 and of configuration files reused (`file_hits`) and written (`file_writes`)
+        """
+        with cls._render_lock:
+            stats = {"renders": cls._renders, "render_hits": cls._render_hits, "file_hits": 0, "file_writes": 0}
+            for cache in cls._config_caches.values():
+                cache_stats = cache.get_stats()
+                stats["file_hits"] += cache_stats["hits"]
+                stats["file_writes"] += cache_stats["misses"]
+        return stats
+
     def initialize(self):
         """
         Initialize the `nvinferserver` GStreamer element and configure based on the provided configuration
         """
 
-        self._config_path = os.path.join(self._config_path, f"config-{self.get_name()}.txt")
-
-        with open(self._config_path, "w") as f:
-            f.write(self._tm.render(**self._config.dict()))
+        self._config_file = NVInferServer.write_config(self._config, self._config_path)
 
         pgie = Gst.ElementFactory.make("nvinferserver", self.get_name())
         if not pgie:
             raise BinCreationError(f"Could not create {self.__class__.__name__}")
 
         self._pgie = pgie
-        self._pgie.set_property("config-file-path", self._config_path)
+        self._pgie.set_property("config-file-path", self._config_file)
 
     def get_config(self) -> Any:
         """
@@ -465,6 +541,14 @@ async_mode: {{ async_mode|string|lower }}
         """
         return self._config
 
+    def get_config_file(self) -> Optional[str]:
+        """
+        Get the path of the configuration file given to `nvinferserver`
+
+        :return: the path of the file, or `None` before the component is initialized
+        """
+        return self._config_file
+
     def get_name(self) -> Any:
         """
         Get the name of the component
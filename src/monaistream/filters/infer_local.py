@@ -0,0 +1,437 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.batching import DynamicBatcher
+from monaistream.errors import BinCreationError, StreamTransformChainError
+from monaistream.interface import InferenceFilterComponent
+from monaistream.util.buffer import VideoLayout, get_video_layout, map_buffer, video_frame_array
+
+logger = logging.getLogger(__name__)
+
+LocalModelBackend = Literal["torchscript", "onnx"]
+
+
+class LocalModel(object):
+    """
+    A TorchScript or ONNX model run in-process on the CPU, with `torch` or `onnxruntime` respectively. Outputs are
+    labelled like the output layers of Triton's PyTorch backend (`OUTPUT__0`, `OUTPUT__1`, ...) for TorchScript
+    models, and by their names for ONNX models.
+    """
+
+    def __init__(self, model_path: str, backend: Optional[LocalModelBackend] = None, num_threads: int = 0) -> None:
+        """
+        :param model_path: the path of a TorchScript (`.pt`, `.ts`) or ONNX (`.onnx`) model
+        :param backend: the runtime of the model, determined from the extension of `model_path` by default
+        :param num_threads: the number of threads used by the runtime, or `0` for the runtime default
+        :raises BinCreationError: if the backend cannot be determined or is not installed
+        """
+        if backend is None:
+            backend = "onnx" if os.path.splitext(model_path)[1].lower() == ".onnx" else "torchscript"
+        self._backend = backend
+
+        try:
+            if backend == "onnx":
+                import onnxruntime
+
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = num_threads
+                self._session = onnxruntime.InferenceSession(
+                    model_path, sess_options=options, providers=["CPUExecutionProvider"]
+                )
+                self._input_name = self._session.get_inputs()[0].name
+                self._output_names = [output.name for output in self._session.get_outputs()]
+            else:
+                import torch
+
+                if num_threads:
+                    torch.set_num_threads(num_threads)
+                self._torch = torch
+                self._module = torch.jit.load(model_path, map_location="cpu").eval()
+                self._output_names = []
+        except ImportError as e:
+            raise BinCreationError(f"The {backend} backend of {self.__class__.__name__} is not installed: {e}")
+
+    def get_backend(self) -> LocalModelBackend:
+        """
+        Get the runtime of the model
+
+        :return: `torchscript` or `onnx`
+        """
+        return self._backend
+
+    def __call__(self, batch: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Run the model on a batch
+
+        :param batch: the input batch
+        :return: a dictionary mapping the output labels to the batched outputs
+        """
+        if self._backend == "onnx":
+            outputs = self._session.run(None, {self._input_name: batch})
+            return dict(zip(self._output_names, outputs))
+
+        with self._torch.no_grad():
+            outputs = self._module(self._torch.from_numpy(batch))
+        if isinstance(outputs, self._torch.Tensor):
+            outputs = (outputs,)
+        return {f"OUTPUT__{idx}": output.numpy() for idx, output in enumerate(outputs)}
+
+
+class LocalInferServer(InferenceFilterComponent):
+    """
+    An inference component running a :class:`LocalModel` in-process on the CPU, standing in for
+    :class:`monaistream.filters.NVInferServer` where DeepStream and Triton are not available (e.g. to run or benchmark
+    pipelines on CPU-only machines). Frames are batched up to the batch size set by `StreamCompose`, or scheduled by a
+    :class:`monaistream.batching.DynamicBatcher` which may be shared with other components, and re-emitted in order
+    once inferred. Like the `batched-push-timeout` of `nvstreammux`, a partial batch is inferred once its oldest frame
+    has waited `max_queue_delay_ms`, so that slow or live sources are not held back waiting for a full batch. The
+    outputs are held by the component and keyed by the timestamp of their frame, and `StreamCompose` passes them to
+    the NumPy transform components downstream (e.g. :class:`monaistream.filters.TransformChainComponentNumpy`) along
+    with `ORIGINAL_IMAGE`.
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        name: str = "",
+        backend: Optional[LocalModelBackend] = None,
+        format: Literal["RGB", "BGR", "GRAY8"] = "RGB",
+        tensor_order: Literal["NCHW", "NHWC"] = "NCHW",
+        scale_factor: float = 0.00392156,
+        num_threads: int = 0,
+        max_pending_outputs: int = 64,
+        batcher: Optional[DynamicBatcher] = None,
+        max_queue_delay_ms: Optional[float] = 100.0,
+    ) -> None:
+        """
+        :param model_path: the path of a TorchScript (`.pt`, `.ts`) or ONNX (`.onnx`) model, unused with `batcher`
+        :param name: the name of the component
+        :param backend: the runtime of the model, determined from the extension of `model_path` by default
+        :param format: the pixel format of the frames given to the model
+        :param tensor_order: the order of the dimensions of the input batch
+        :param scale_factor: the factor applied to pixel values to produce the `float32` input of the model
+        :param num_threads: the number of threads used by the runtime, or `0` for the runtime default
+        :param max_pending_outputs: the maximum number of frames whose outputs are held for downstream components
+        :param batcher: a dynamic batcher running the model, in which case the batch size set by `StreamCompose` is
+                        ignored and frames are batched with those of other components sharing the batcher
+        :param max_queue_delay_ms: the maximum time a frame waits for other frames to fill a batch, or `None` to
+                                   always wait for a full batch (or the end of the stream); unused with `batcher`
+        :raises BinCreationError: if neither `model_path` nor `batcher` is provided
+        """
+        if not model_path and not batcher:
+            raise BinCreationError("LocalInferServer requires a model_path or a batcher")
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._model_path = model_path
+        self._backend = backend
+        self._format = format
+        self._tensor_order = tensor_order
+        self._scale_factor = scale_factor
+        self._num_threads = num_threads
+        self._max_pending_outputs = max_pending_outputs
+        self._batcher = batcher
+
+        self._model: Optional[LocalModel] = None
+        self._batch_size = 1
+        self._layout: Optional[VideoLayout] = None
+        self._pending: List[Gst.Buffer] = []
+        self._pending_lock = threading.Lock()
+        self._max_queue_delay = max_queue_delay_ms / 1e3 if max_queue_delay_ms is not None else None
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flushed_batches = 0
+        self._timeouts = 0
+        self._outputs: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._infer_time = 0.0
+
+        # frames submitted to the batcher complete out of order but are re-emitted in the order they arrived
+        self._max_in_flight = 2 * batcher.get_max_batch_size() if batcher else 0
+        self._slots = threading.BoundedSemaphore(max(self._max_in_flight, 1))
+        self._order_lock = threading.Condition()
+        self._next_seq = 0
+        self._next_emit = 0
+        self._completed: Dict[int, Tuple[Gst.Buffer, Dict[str, np.ndarray]]] = {}
+
+    def initialize(self):
+        """
+        Load the model and initialize the GStreamer elements wrapped by this component: a `bin` containing a
+        `videoconvert`, a `capsfilter` and an `appsink` receiving the frames, and an `appsrc` re-emitting them
+        """
+        if not self._batcher:
+            self._model = LocalModel(self._model_path, self._backend, self._num_threads)
+
+        elements = {}
+        for factory, suffix in (
+            ("bin", "inference"),
+            ("videoconvert", "videoconvert"),
+            ("capsfilter", "filter"),
+            ("appsink", "appsink"),
+            ("appsrc", "appsrc"),
+        ):
+            elem = Gst.ElementFactory.make(factory, f"{self._name}-{suffix}")
+            if not elem:
+                raise BinCreationError(f"Unable to create {factory} for {self.__class__.__name__} {self.get_name()}")
+            elements[factory] = elem
+
+        self._bin = elements["bin"]
+        convert, capsfilter = elements["videoconvert"], elements["capsfilter"]
+        self._appsink, self._appsrc = elements["appsink"], elements["appsrc"]
+
+        capsfilter.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format={self._format}"))
+
+        self._appsink.set_property("emit-signals", True)
+        self._appsink.set_property("sync", False)
+        self._appsink.connect("new-sample", self._on_new_sample)
+        self._appsink.connect("eos", self._on_eos)
+
+        self._appsrc.set_property("format", Gst.Format.TIME)
+        self._appsrc.set_property("block", True)
+
+        for elem in (convert, capsfilter, self._appsink, self._appsrc):
+            self._bin.add(elem)
+        if not convert.link(capsfilter) or not capsfilter.link(self._appsink):
+            raise BinCreationError(f"Unable to link the elements of {self.__class__.__name__} {self.get_name()}")
+
+        self._bin.add_pad(Gst.GhostPad.new("sink", convert.get_static_pad("sink")))
+        self._bin.add_pad(Gst.GhostPad.new("src", self._appsrc.get_static_pad("src")))
+
+    def get_config(self) -> Any:
+        """
+        Get the configuration of the component
+
+        :return: a dictionary with the `model_path`, `backend`, `format`, `tensor_order`, `scale_factor` and
+                 `batch_size` of the component, the latter being `None` when a dynamic batcher is used
+        """
+        return {
+            "model_path": self._model_path,
+            "backend": self._model.get_backend() if self._model else self._backend,
+            "format": self._format,
+            "tensor_order": self._tensor_order,
+            "scale_factor": self._scale_factor,
+            "batch_size": None if self._batcher else self._batch_size,
+        }
+
+    def get_name(self) -> Any:
+        """
+        Get the name of the component
+
+        :return: the name of the component as `str`
+        """
+        return f"{self._name}-inference"
+
+    def set_batch_size(self, batch_size: int):
+        """
+        Configure the number of frames inferred together
+
+        :param batch_size: a positive integer determining the batch size
+        """
+        self._batch_size = batch_size
+
+    def get_gst_element(self):
+        """
+        Get the GStreamer element being wrapped by this component
+
+        :return: the `bin` `Gst.Element` wrapping the elements of the component
+        """
+        return (self._bin,)
+
+    def get_outputs(self, pts: int) -> Dict[str, np.ndarray]:
+        """
+        Get the outputs of the model for a frame
+
+        :param pts: the presentation timestamp of the frame
+        :return: a dictionary mapping output labels to the outputs of the frame, without the batch dimension, or an
+                 empty dictionary if the frame was not inferred or its outputs were evicted
+        """
+        with self._lock:
+            return self._outputs.get(pts, {})
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get statistics of the inference
+
+        :return: a dictionary with the number of `frames` and `batches` inferred, the number of partial batches
+                 inferred after `max_queue_delay_ms` under `timeouts`, the `mean_batch_size` and the `mean_ms` time
+                 spent running a batch; with a dynamic batcher only `frames` is counted by the component, see
+                 :meth:`monaistream.batching.DynamicBatcher.get_stats`
+        """
+        with self._lock:
+            return {
+                "frames": self._frames,
+                "batches": self._batches,
+                "timeouts": self._timeouts,
+                "mean_batch_size": self._frames / self._batches if self._batches else 0.0,
+                "mean_ms": self._infer_time * 1e3 / self._batches if self._batches else 0.0,
+            }
+
+    def _on_new_sample(self, appsink: Gst.Element) -> Gst.FlowReturn:
+        sample = appsink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.OK
+
+        buffer = sample.get_buffer()
+        if self._layout is None:
+            caps = sample.get_caps()
+            self._layout = get_video_layout(caps, buffer)
+            self._appsrc.set_property("caps", caps)
+            frames_queued = self._max_in_flight if self._batcher else self._batch_size * 2
+            self._appsrc.set_property("max-bytes", buffer.get_size() * frames_queued)
+
+        if self._batcher:
+            return self._submit(buffer)
+
+        with self._pending_lock:
+            self._pending.append(buffer)
+            if len(self._pending) >= self._batch_size:
+                return self._infer_pending()
+            if len(self._pending) == 1 and self._max_queue_delay is not None:
+                self._flush_timer = threading.Timer(
+                    self._max_queue_delay, self._on_flush_timeout, args=(self._flushed_batches,)
+                )
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return Gst.FlowReturn.OK
+
+    def _on_flush_timeout(self, batch: int) -> None:
+        # the batch may have been filled, or flushed at the end of the stream, since the timer was started
+        with self._pending_lock:
+            if batch != self._flushed_batches or not self._pending:
+                return
+            with self._lock:
+                self._timeouts += 1
+            self._infer_pending()
+
+    def _on_eos(self, appsink: Gst.Element) -> None:
+        # the last frames may not fill a batch
+        with self._pending_lock:
+            if self._pending:
+                self._infer_pending()
+        with self._order_lock:
+            self._order_lock.wait_for(lambda: self._next_emit == self._next_seq)
+        self._appsrc.emit("end-of-stream")
+
+    def _submit(self, buffer: Gst.Buffer) -> Gst.FlowReturn:
+        # blocks the upstream streaming thread while `max_in_flight` frames are waiting for the batcher
+        self._slots.acquire()
+        with self._order_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+
+        try:
+            future = self._batcher.submit(self._preprocess([buffer])[0])
+        except Exception as e:
+            logger.exception(e)
+            self._complete(seq, buffer, {})
+            return Gst.FlowReturn.OK
+
+        future.add_done_callback(lambda f: self._complete(seq, buffer, {} if f.exception() else f.result()))
+        return Gst.FlowReturn.OK
+
+    def _complete(self, seq: int, buffer: Gst.Buffer, outputs: Dict[str, np.ndarray]) -> None:
+        # frames are pushed from whichever thread completes the next frame in arrival order
+        with self._order_lock:
+            self._completed[seq] = (buffer, outputs)
+            while self._next_emit in self._completed:
+                buffer, outputs = self._completed.pop(self._next_emit)
+                self._next_emit += 1
+                if outputs:
+                    with self._lock:
+                        self._frames += 1
+                self._store_outputs(buffer, outputs)
+                self._appsrc.emit("push-buffer", buffer)
+                self._slots.release()
+            self._order_lock.notify_all()
+
+    def _store_outputs(self, buffer: Gst.Buffer, outputs: Dict[str, np.ndarray]) -> None:
+        # frames without timestamps (e.g. warm-up frames) cannot be matched to their outputs downstream
+        if outputs and buffer.pts != Gst.CLOCK_TIME_NONE:
+            with self._lock:
+                self._outputs[buffer.pts] = outputs
+                while len(self._outputs) > self._max_pending_outputs:
+                    self._outputs.popitem(last=False)
+
+    def _infer_pending(self) -> Gst.FlowReturn:
+        # called with `_pending_lock` held, so that batches are inferred and pushed in order
+        buffers, self._pending = self._pending, []
+        self._flushed_batches += 1
+        if self._flush_timer:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        try:
+            outputs = self.infer(buffers)
+        except Exception as e:
+            logger.exception(e)
+            outputs = [{} for _ in buffers]
+
+        for buffer, frame_outputs in zip(buffers, outputs):
+            self._store_outputs(buffer, frame_outputs)
+            flow = self._appsrc.emit("push-buffer", buffer)
+            if flow != Gst.FlowReturn.OK:
+                return flow
+
+        return Gst.FlowReturn.OK
+
+    def _preprocess(self, buffers: List[Gst.Buffer]) -> np.ndarray:
+        layout = self._layout
+        batch = np.empty((len(buffers), *layout.shape), dtype=np.float32)
+        for idx, buffer in enumerate(buffers):
+            with map_buffer(buffer) as (address, size):
+                batch[idx] = video_frame_array(address, size, layout)
+
+        batch *= self._scale_factor
+        if self._tensor_order == "NCHW":
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return batch
+
+    def infer(self, buffers: List[Gst.Buffer]) -> List[Dict[str, np.ndarray]]:
+        """
+        Run the model on a batch of frames
+
+        :param buffers: the buffers of the frames, in the caps negotiated by the component
+        :return: the outputs of each frame, in the order of `buffers`
+        :raises StreamTransformChainError: if the model returns outputs which do not match the batch
+        """
+        batch = self._preprocess(buffers)
+
+        start = time.perf_counter()
+        outputs = self._model(batch)
+        elapsed = time.perf_counter() - start
+
+        for label, output in outputs.items():
+            if len(output) != len(buffers):
+                raise StreamTransformChainError(
+                    f"Output {label} of {self.get_name()} has a batch size of {len(output)}, expected {len(buffers)}"
+                )
+
+        with self._lock:
+            self._batches += 1
+            self._frames += len(buffers)
+            self._infer_time += elapsed
+
+        return [{label: output[idx] for label, output in outputs.items()} for idx in range(len(buffers))]
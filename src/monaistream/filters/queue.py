@@ -0,0 +1,156 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+from typing import Dict, Optional
+from uuid import uuid4
+
+from gi.repository import Gst
+from pydantic import BaseModel
+from pydantic.types import ConstrainedInt
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError
+from monaistream.interface import StreamFilterComponent
+
+logger = logging.getLogger(__name__)
+
+
+class QueueLimit(ConstrainedInt):
+    ge = 0
+
+
+class QueuePolicy(BaseModel):
+    """
+    Limits and leaky behavior of a `queue` element. A limit of `0` disables that limit, and a queue is full
+    as soon as one of the enabled limits is reached.
+    """
+
+    max_size_buffers: QueueLimit = 200
+    max_size_bytes: QueueLimit = 10485760
+    # in nanoseconds
+    max_size_time: QueueLimit = 1000000000
+    # "upstream" drops incoming frames and "downstream" drops the oldest queued frames when the queue is full,
+    # "no" blocks upstream until there is room in the queue
+    leaky: Literal["no", "upstream", "downstream"] = "no"
+
+    @staticmethod
+    def live(max_size_buffers: int = 2) -> "QueuePolicy":
+        """
+        Policy for queues fed by live sources, which keeps latency bounded by dropping the oldest frames
+        instead of stalling the source
+
+        :param max_size_buffers: the number of frames held before the oldest one is dropped
+        :return: a leaky-downstream :class:`.QueuePolicy` limited only by the number of buffers
+        """
+        return QueuePolicy(max_size_buffers=max_size_buffers, max_size_bytes=0, max_size_time=0, leaky="downstream")
+
+
+class QueueComponent(StreamFilterComponent):
+    """
+    A `queue` component which decouples its upstream and downstream components into separate streaming threads
+    according to a :class:`.QueuePolicy`. `StreamCompose` inserts these automatically where requested.
+    """
+
+    def __init__(self, policy: Optional[QueuePolicy] = None, name: str = "") -> None:
+        """
+        :param policy: the limits and leaky behavior of the queue, the `queue` defaults are used if not provided
+        :param name: the name to assign to this component
+        """
+        if not name:
+            name = str(uuid4().hex)
+
+        self._name = name
+        self._policy = policy
+        self._queue: Optional[Gst.Element] = None
+        self._overruns = 0
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        """
+        Initialize the `queue` GStreamer element wrapped by this component
+        """
+        queue = Gst.ElementFactory.make("queue", self.get_name())
+        if not queue:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        self._queue = queue
+        self._queue.connect("overrun", self._on_overrun)
+        self._apply_policy()
+
+    def get_name(self):
+        """
+        Get the name assigned to the component
+
+        :return: the name as a `str`
+        """
+        return f"{self._name}-queue"
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer element
+
+        :return: the raw `queue` `Gst.Element`
+        """
+        return (self._queue,)
+
+    def get_policy(self) -> Optional[QueuePolicy]:
+        """
+        Get the policy of the queue
+
+        :return: the :class:`.QueuePolicy` of the queue, or `None` if the `queue` defaults are used
+        """
+        return self._policy
+
+    def set_policy(self, policy: QueuePolicy) -> None:
+        """
+        Set the policy of the queue, which may be changed while the pipeline is running
+
+        :param policy: the new limits and leaky behavior of the queue
+        """
+        self._policy = policy
+        if self._queue:
+            self._apply_policy()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the current depth of the queue
+
+        :return: a dictionary with the number of `buffers`, `bytes` and nanoseconds of `time` currently queued, and
+                 the number of `overruns` so far (for leaky queues each overrun drops a frame)
+        """
+        with self._lock:
+            overruns = self._overruns
+
+        return {
+            "buffers": self._queue.get_property("current-level-buffers"),
+            "bytes": self._queue.get_property("current-level-bytes"),
+            "time": self._queue.get_property("current-level-time"),
+            "overruns": overruns,
+        }
+
+    def _apply_policy(self) -> None:
+        if not self._policy:
+            return
+
+        self._queue.set_property("max-size-buffers", self._policy.max_size_buffers)
+        self._queue.set_property("max-size-bytes", self._policy.max_size_bytes)
+        self._queue.set_property("max-size-time", self._policy.max_size_time)
+        Gst.util_set_object_arg(self._queue, "leaky", self._policy.leaky)
+
+    def _on_overrun(self, queue: Gst.Element) -> None:
+        # emitted from the upstream streaming thread
+        with self._lock:
+            self._overruns += 1
+        logger.debug(f"{self.get_name()} is full")
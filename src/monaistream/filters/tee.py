@@ -0,0 +1,115 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+from collections import OrderedDict
+from typing import Dict, Sequence
+from uuid import uuid4
+
+from gi.repository import Gst
+
+from monaistream.errors import BinCreationError, StreamComposeCreationStructureError
+from monaistream.filters.queue import QueueComponent
+from monaistream.interface import BranchingComponent, StreamComponent
+
+
+class TeeComponent(BranchingComponent):
+    """
+    Fan-out component which feeds the same stream to several named branches (e.g. one recording the raw video
+    and one running inference), so that upstream components such as decoders run only once. Each branch is
+    decoupled from the others by its own `queue`, and therefore runs in its own streaming thread.
+    """
+
+    def __init__(self, branches: Dict[str, Sequence[StreamComponent]], name: str = "") -> None:
+        """
+        :param branches: a dictionary mapping branch names to the sequence of components in each branch,
+                         each branch is linked in the same way as the components passed to `StreamCompose`
+        :param name: the name to assign to this component
+        """
+        if not branches:
+            raise StreamComposeCreationStructureError(f"{self.__class__.__name__} requires at least one branch")
+
+        if not name:
+            name = str(uuid4().hex)
+
+        self._name = name
+        self._branches: "OrderedDict[str, Sequence[StreamComponent]]" = OrderedDict(branches)
+        self._queues: Dict[str, QueueComponent] = OrderedDict(
+            (branch_name, QueueComponent(name=f"{self._name}-{branch_name}")) for branch_name in self._branches
+        )
+
+    def initialize(self):
+        """
+        Initialize the `tee` GStreamer element and one `queue` element per branch. The components in the branches
+        are initialized by `StreamCompose`.
+        """
+        tee = Gst.ElementFactory.make("tee", self.get_name())
+        if not tee:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        self._tee = tee
+
+        for queue in self._queues.values():
+            queue.initialize()
+
+    def get_name(self):
+        """
+        Get the name of the component
+
+        :return: the name as a `str`
+        """
+        return f"{self._name}-tee"
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer elements wrapped by this component
+
+        :return: a tuple of `Gst.Element`s of types `(tee, queue, ...)` with one `queue` per branch
+        """
+        return (self._tee, *[queue.get_gst_element()[0] for queue in self._queues.values()])
+
+    def get_branches(self) -> Dict[str, Sequence[StreamComponent]]:
+        """
+        Get the branches fed by this component
+
+        :return: a dictionary mapping the branch names to the sequence of components in each branch
+        """
+        return self._branches
+
+    def set_branch(self, branch_name: str, components: Sequence[StreamComponent]) -> None:
+        """
+        Replace the components of an existing branch before the component is initialized
+
+        :param branch_name: the name of the branch
+        :param components: the new sequence of components of the branch
+        """
+        if branch_name not in self._branches:
+            raise StreamComposeCreationStructureError(f"{self.get_name()} has no branch named {branch_name}")
+        self._branches[branch_name] = components
+
+    def get_branch_queue(self, branch_name: str) -> Gst.Element:
+        """
+        Get the `queue` element feeding a branch
+
+        :param branch_name: the name of the branch
+        :return: the `queue` `Gst.Element`
+        """
+        return self._queues[branch_name].get_gst_element()[0]
+
+    def get_branch_queue_component(self, branch_name: str) -> QueueComponent:
+        """
+        Get the :class:`monaistream.filters.queue.QueueComponent` feeding a branch, e.g. to set its policy
+
+        :param branch_name: the name of the branch
+        :return: the queue component of the branch
+        """
+        return self._queues[branch_name]
@@ -0,0 +1,288 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from uuid import uuid4
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError
+from monaistream.interface import StreamFilterComponent
+from monaistream.qos import QoSController
+from monaistream.util.buffer import VideoLayout, get_video_layout, map_buffer, video_frame_array
+
+from .infer_local import LocalInferServer
+
+logger = logging.getLogger(__name__)
+
+
+class TransformChainComponentAsync(StreamFilterComponent):
+    """
+    The `TransformChainComponentAsync` runs a `Callable` operating on NumPy arrays (see
+    :class:`monaistream.filters.TransformChainComponentNumpy`) in a pool of worker threads instead of the upstream
+    streaming thread, so that a slow frame does not stall decoding. Frames are re-emitted in the order they arrived,
+    and the number of frames in flight is bounded, which blocks upstream when the workers fall behind. The `Callable`
+    benefits from the pool when it releases the GIL (e.g. most NumPy operations on large arrays).
+    """
+
+    def __init__(
+        self,
+        transform_chain: Callable,
+        output_label: str,
+        name: str = "",
+        format: Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"] = "RGBA",
+        num_workers: int = 4,
+        max_in_flight: int = 8,
+    ) -> None:
+        """
+        :param transform_chain: a `Callable` object such as `monai.transforms.compose.Compose` which receives a
+                                dictionary with the frame under the `ORIGINAL_IMAGE` key
+        :param output_label: the label key to select the output from this component
+        :param name: the name to assign to this component
+        :param format: the pixel format of the frames passed to `transform_chain`
+        :param num_workers: the number of worker threads running `transform_chain`
+        :param max_in_flight: the maximum number of frames received but not yet re-emitted by the component
+        """
+        self._user_callback = transform_chain
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._output_label = output_label
+        self._format = format
+        self._num_workers = num_workers
+        self._max_in_flight = max_in_flight
+        self._qos: Optional[QoSController] = None
+        self._inference: Optional[LocalInferServer] = None
+        self._swap_lock = threading.Lock()
+
+        self._executor: Optional[Executor] = None
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._order_lock = threading.Condition()
+        self._layout: Optional[VideoLayout] = None
+        self._next_seq = 0
+        self._next_emit = 0
+        self._completed: Dict[int, Optional[Gst.Buffer]] = {}
+        self._frames = 0
+        self._processed = 0
+        self._dropped = 0
+        self._peak_in_flight = 0
+        self._process_time = 0.0
+
+    def initialize(self):
+        """
+        Initializes the GStreamer elements wrapped by this component: a `bin` containing a `videoconvert`, a
+        `capsfilter` and an `appsink` receiving the frames, and an `appsrc` re-emitting them
+        """
+        elements = {}
+        for factory, suffix in (
+            ("bin", "usercallbacktransform"),
+            ("videoconvert", "videoconvert"),
+            ("capsfilter", "filter"),
+            ("appsink", "appsink"),
+            ("appsrc", "appsrc"),
+        ):
+            elem = Gst.ElementFactory.make(factory, f"{self._name}-{suffix}")
+            if not elem:
+                raise BinCreationError(f"Unable to create {factory} for {self.__class__.__name__} {self.get_name()}")
+            elements[factory] = elem
+
+        self._bin = elements["bin"]
+        convert, capsfilter = elements["videoconvert"], elements["capsfilter"]
+        self._appsink, self._appsrc = elements["appsink"], elements["appsrc"]
+
+        capsfilter.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format={self._format}"))
+
+        self._appsink.set_property("emit-signals", True)
+        self._appsink.set_property("sync", False)
+        self._appsink.connect("new-sample", self._on_new_sample)
+        self._appsink.connect("eos", self._on_eos)
+
+        self._appsrc.set_property("format", Gst.Format.TIME)
+        self._appsrc.set_property("block", True)
+
+        for elem in (convert, capsfilter, self._appsink, self._appsrc):
+            self._bin.add(elem)
+        if not convert.link(capsfilter) or not capsfilter.link(self._appsink):
+            raise BinCreationError(f"Unable to link the elements of {self.__class__.__name__} {self.get_name()}")
+
+        self._bin.add_pad(Gst.GhostPad.new("sink", convert.get_static_pad("sink")))
+        self._bin.add_pad(Gst.GhostPad.new("src", self._appsrc.get_static_pad("src")))
+
+        self._executor = ThreadPoolExecutor(self._num_workers, thread_name_prefix=self.get_name())
+
+    def get_name(self):
+        """
+        Get the name assigned to the component
+
+        :return: the name as a `str`
+        """
+        return f"{self._name}-usercallbacktransform"
+
+    def set_transform_chain(self, transform_chain: Callable, output_label: Optional[str] = None) -> None:
+        """
+        Replace the `transform_chain` of the component, which may be done while the pipeline is running. Frames
+        already handed to the workers complete with the previous `transform_chain`.
+
+        :param transform_chain: the new `Callable`
+        :param output_label: the label key to select the output of the new `transform_chain`, unchanged by default
+        """
+        with self._swap_lock:
+            self._user_callback = transform_chain
+            if output_label is not None:
+                self._output_label = output_label
+
+    def set_qos_controller(self, controller: Optional[QoSController]) -> None:
+        """
+        Set the controller which decides whether frames arriving late are processed by the `transform_chain`
+
+        :param controller: the :class:`monaistream.qos.QoSController` of the pipeline, or `None` to process all frames
+        """
+        self._qos = controller
+        if controller:
+            controller.register(self.get_name())
+
+    def set_inference_outputs(self, inference: Optional[LocalInferServer]) -> None:
+        """
+        Set the inference component whose outputs for each frame are passed to the `transform_chain` along with
+        `ORIGINAL_IMAGE`, under their output labels (e.g. `OUTPUT__0`)
+
+        :param inference: an upstream :class:`monaistream.filters.LocalInferServer`, or `None` to pass the frame only
+        """
+        self._inference = inference
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer element
+
+        :return: the `bin` `Gst.Element` wrapping the elements of the component
+        """
+        return (self._bin,)
+
+    def get_probe_stats(self) -> Dict[str, float]:
+        """
+        Get statistics of the frames processed by the workers
+
+        :return: a dictionary with the number of `frames` re-emitted and `dropped` (because `transform_chain` failed),
+                 the `mean_ms` time spent by a worker per frame, and the `peak_in_flight` number of frames
+        """
+        with self._order_lock:
+            return {
+                "frames": self._frames,
+                "dropped": self._dropped,
+                "mean_ms": self._process_time * 1e3 / self._processed if self._processed else 0.0,
+                "peak_in_flight": self._peak_in_flight,
+            }
+
+    def _on_new_sample(self, appsink: Gst.Element) -> Gst.FlowReturn:
+        sample = appsink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.OK
+
+        buffer = sample.get_buffer()
+        if self._layout is None:
+            caps = sample.get_caps()
+            self._layout = get_video_layout(caps, buffer)
+            self._appsrc.set_property("caps", caps)
+            # frames waiting in the queue of the appsrc count towards the frames in flight
+            self._appsrc.set_property("max-bytes", buffer.get_size() * self._max_in_flight)
+
+        skip = False
+        if self._qos:
+            qos_return = self._qos.check(self.get_name(), appsink.get_static_pad("sink"), buffer)
+            if qos_return == Gst.PadProbeReturn.DROP:
+                return Gst.FlowReturn.OK
+            skip = qos_return is not None
+
+        # blocks the upstream streaming thread while `max_in_flight` frames are being processed or reordered
+        self._slots.acquire()
+
+        with self._order_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._next_seq - self._next_emit)
+
+        if skip:
+            self._complete(seq, buffer)
+            return Gst.FlowReturn.OK
+
+        with self._swap_lock:
+            transform_chain, output_label = self._user_callback, self._output_label
+
+        outputs = self._inference.get_outputs(buffer.pts) if self._inference else {}
+        future = self._executor.submit(self._process, buffer, self._layout, transform_chain, output_label, outputs)
+        future.add_done_callback(lambda f: self._complete(seq, None if f.exception() else f.result()))
+        return Gst.FlowReturn.OK
+
+    def _process(
+        self,
+        buffer: Gst.Buffer,
+        layout: VideoLayout,
+        transform_chain: Callable,
+        output_label: str,
+        outputs: Dict[str, np.ndarray],
+    ) -> Gst.Buffer:
+        start = time.perf_counter()
+
+        try:
+            with map_buffer(buffer) as (address, size):
+                frame = video_frame_array(address, size, layout)
+                # the received frame may be shared with other elements so the result is written to a new buffer
+                frame.flags.writeable = False
+                user_output_array = transform_chain({"ORIGINAL_IMAGE": frame, **outputs})[output_label]
+
+                outbuf = Gst.Buffer.new_allocate(None, size, None)
+                with map_buffer(outbuf, writable=True) as (out_address, out_size):
+                    np.copyto(video_frame_array(out_address, out_size, layout), user_output_array, casting="unsafe")
+
+        except Exception as e:
+            logger.exception(e)
+            raise
+
+        self._copy_timestamps(buffer, outbuf)
+
+        with self._order_lock:
+            self._processed += 1
+            self._process_time += time.perf_counter() - start
+        return outbuf
+
+    @staticmethod
+    def _copy_timestamps(buffer: Gst.Buffer, outbuf: Gst.Buffer) -> None:
+        outbuf.pts, outbuf.dts, outbuf.duration = buffer.pts, buffer.dts, buffer.duration
+        outbuf.offset, outbuf.offset_end = buffer.offset, buffer.offset_end
+
+    def _complete(self, seq: int, buffer: Optional[Gst.Buffer]) -> None:
+        # frames are pushed from whichever thread completes the next frame in arrival order
+        with self._order_lock:
+            self._completed[seq] = buffer
+            while self._next_emit in self._completed:
+                outbuf = self._completed.pop(self._next_emit)
+                self._next_emit += 1
+                if outbuf is None:
+                    self._dropped += 1
+                else:
+                    self._frames += 1
+                    self._appsrc.emit("push-buffer", outbuf)
+                self._slots.release()
+            self._order_lock.notify_all()
+
+    def _on_eos(self, appsink: Gst.Element) -> None:
+        # forward the end of the stream once every frame in flight has been re-emitted
+        with self._order_lock:
+            self._order_lock.wait_for(lambda: self._next_emit == self._next_seq)
+        self._appsrc.emit("end-of-stream")
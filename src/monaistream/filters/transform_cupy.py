@@ -11,18 +11,21 @@
 # limitations under the License.
 ################################################################################
 
-import ctypes
 import logging
-from typing import Callable, Dict
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
 
 import cupy
 from gi.repository import Gst
 
 import pyds
-from monaistream.errors import BinCreationError
+from monaistream.errors import BinCreationError, StreamTransformChainError
 from monaistream.interface import StreamFilterComponent
-from monaistream.filters.util import get_nvdstype_npsize, get_nvdstype_size
+from monaistream.filters.util import LayerBinding, get_capsule_pointer, get_layer_bindings
+from monaistream.qos import QoSController
+from monaistream.util.cache import ViewCache
 
 
 logger = logging.getLogger(__name__)
@@ -34,16 +37,30 @@ class TransformChainComponentCupy(StreamFilterComponent):
     The user-specified callable must receive a Cupy array or list of Cupy arrays, and return one single Cupy array as the result.
     """
 
-    def __init__(self, transform_chain: Callable, output_label: str, name: str = "") -> None:
+    def __init__(self, transform_chain: Callable, output_label: str, name: str = "", batched: bool = False) -> None:
         """
         :param transform_chain: a `Callable` object such as `monai.transforms.compose.Compose`
+        :param batched: when `True` the `transform_chain` is called once per batch with all frames of the batch
+                        stacked into a single `(N, H, W, C)` array and the inference output layers stacked likewise,
+                        and must return an array with the same leading batch dimension; by default it is called
+                        once per frame
         """
         self._user_callback = transform_chain
         if not name:
             name = str(uuid4().hex)
         self._name = name
         self._input_labels = ["ORIGINAL_IMAGE"]
+        self._layer_bindings: Optional[List[LayerBinding]] = None
+        self._num_output_layers = 0
         self._output_label = output_label
+        self._qos: Optional[QoSController] = None
+        self._swap_lock = threading.Lock()
+        self._batched = batched
+        self._views = ViewCache()
+        self._stream: Optional[cupy.cuda.Stream] = None
+        self._probe_calls = 0
+        self._probe_frames = 0
+        self._probe_time = 0.0
 
     def initialize(self):
         """
@@ -60,6 +77,7 @@ class TransformChainComponentCupy(StreamFilterComponent):
             exit(1)
 
         transform_sinkpad.add_probe(Gst.PadProbeType.BUFFER, self.probe_callback, 0)
+        transform_sinkpad.add_probe(Gst.PadProbeType.EVENT_DOWNSTREAM, self._reset_bindings, None)
 
     def get_name(self):
         """
@@ -69,6 +87,30 @@ class TransformChainComponentCupy(StreamFilterComponent):
         """
         return f"{self._name}-usercallbacktransform"
 
+    def set_transform_chain(self, transform_chain: Callable, output_label: Optional[str] = None) -> None:
+        """
+        Replace the `transform_chain` of the component, which may be done while the pipeline is running. The frame
+        being processed when this method is called completes with the previous `transform_chain`, and the next frame
+        is processed by the new one.
+
+        :param transform_chain: the new `Callable`
+        :param output_label: the label key to select the output of the new `transform_chain`, unchanged by default
+        """
+        with self._swap_lock:
+            self._user_callback = transform_chain
+            if output_label is not None:
+                self._output_label = output_label
+
+    def set_qos_controller(self, controller: Optional[QoSController]) -> None:
+        """
+        Set the controller which decides whether frames arriving late are processed by the `transform_chain`
+
+        :param controller: the :class:`monaistream.qos.QoSController` of the pipeline, or `None` to process all frames
+        """
+        self._qos = controller
+        if controller:
+            controller.register(self.get_name())
+
     def get_gst_element(self):
         """
         Return the GStreamer element
@@ -89,9 +131,20 @@ class TransformChainComponentCupy(StreamFilterComponent):
             logger.error("Unable to get GstBuffer ")
             return
 
+        if self._qos:
+            qos_return = self._qos.check(self.get_name(), pad, inbuf)
+            if qos_return is not None:
+                return qos_return
+
+        # the callback is captured once so that all frames of a batch are processed by the same `transform_chain`
+        with self._swap_lock:
+            transform_chain, output_label = self._user_callback, self._output_label
+
+        start = time.perf_counter()
         batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(inbuf))
         frame_list = batch_meta.frame_meta_list
 
+        frames = []
         while frame_list is not None:
 
             try:
@@ -99,18 +152,64 @@ class TransformChainComponentCupy(StreamFilterComponent):
             except StopIteration:
                 break
 
-            owner = None
-            data_type, shape, strides, data_ptr, size = pyds.get_nvds_buf_surface_gpu(hash(inbuf), frame_meta.batch_id)
+            frames.append((self._get_frame_array(inbuf, frame_meta), self._get_frame_layers(frame_meta)))
+
+            try:
+                frame_list = frame_list.next
+            except StopIteration:
+                break
+
+        # the stream is created once as buffers are always processed by the streaming thread of the queue
+        if self._stream is None:
+            self._stream = cupy.cuda.stream.Stream()
+        self._stream.use()
+
+        try:
+
+            if self._batched:
+                self._process_batch(frames, transform_chain, output_label)
+            else:
+                for input_cupy_array, user_data_cupy_layers in frames:
+                    self._process_frame(input_cupy_array, user_data_cupy_layers, transform_chain, output_label)
+
+        except Exception as e:
+            logger.exception(e)
+            return Gst.PadProbeReturn.HANDLED
+
+        self._stream.synchronize()
+
+        self._probe_calls += 1
+        self._probe_frames += len(frames)
+        self._probe_time += time.perf_counter() - start
+
+        return Gst.PadProbeReturn.OK
+
+    def get_probe_stats(self) -> Dict[str, float]:
+        """
+        Get statistics of the time spent processing buffers and of the reuse of the views wrapping their surfaces
+
+        :return: a dictionary with the number of `buffers` and `frames` processed, the `mean_ms` time spent per
+                 buffer, and the `view_hits` and `view_misses` of the surface view cache, where each miss allocates
+                 a new array wrapper
+        """
+        stats = self._views.get_stats()
+        return {
+            "buffers": self._probe_calls,
+            "frames": self._probe_frames,
+            "mean_ms": self._probe_time * 1e3 / self._probe_calls if self._probe_calls else 0.0,
+            "view_hits": stats["hits"],
+            "view_misses": stats["misses"],
+        }
+
+    def _get_frame_array(self, inbuf: Gst.Buffer, frame_meta: pyds.NvDsFrameMeta) -> cupy.ndarray:
+        data_type, shape, strides, data_ptr, size = pyds.get_nvds_buf_surface_gpu(hash(inbuf), frame_meta.batch_id)
+        address = get_capsule_pointer(data_ptr)
+
+        def _make_view() -> cupy.ndarray:
             logger.debug(f"Type: {data_type}, Shape: {shape}, Strides: {strides}, Size: {size}")
-            ctypes.pythonapi.PyCapsule_GetPointer.restype = ctypes.c_void_p
-            ctypes.pythonapi.PyCapsule_GetPointer.argtypes = [ctypes.py_object, ctypes.c_char_p]
-            unownedmem = cupy.cuda.UnownedMemory(
-                ctypes.pythonapi.PyCapsule_GetPointer(data_ptr, None),
-                size,
-                owner,
-            )
+            unownedmem = cupy.cuda.UnownedMemory(address, size, None)
             memptr = cupy.cuda.MemoryPointer(unownedmem, 0)
-            input_cupy_array = cupy.ndarray(
+            return cupy.ndarray(
                 shape=shape,
                 dtype=data_type,
                 memptr=memptr,
@@ -118,70 +217,105 @@ class TransformChainComponentCupy(StreamFilterComponent):
                 order="C",
             )
 
-            user_data_cupy_layers = []
-            user_meta_list = frame_meta.frame_user_meta_list
-            if user_meta_list is not None:
-
-                try:
-                    user_meta = pyds.NvDsUserMeta.cast(frame_meta.frame_user_meta_list.data)
-                except StopIteration:
-                    break
+        # surfaces are recycled by the buffer pool so their views are reused across frames
+        return self._views.get((address, tuple(shape), tuple(strides), str(data_type)), _make_view)
 
-                if user_meta.base_meta.meta_type != pyds.NvDsMetaType.NVDSINFER_TENSOR_OUTPUT_META:
-                    continue
+    def _get_frame_layers(self, frame_meta: pyds.NvDsFrameMeta) -> List[cupy.ndarray]:
+        user_data_cupy_layers = []
+        user_meta_list = frame_meta.frame_user_meta_list
+        if user_meta_list is None:
+            return user_data_cupy_layers
 
-                user_meta_data = pyds.NvDsInferTensorMeta.cast(user_meta.user_meta_data)
+        try:
+            user_meta = pyds.NvDsUserMeta.cast(user_meta_list.data)
+        except StopIteration:
+            return user_data_cupy_layers
 
-                logger.debug(f"# output layers: {user_meta_data.num_output_layers}")
+        if user_meta.base_meta.meta_type != pyds.NvDsMetaType.NVDSINFER_TENSOR_OUTPUT_META:
+            return user_data_cupy_layers
 
-                for layer_idx in range(user_meta_data.num_output_layers):
+        user_meta_data = pyds.NvDsInferTensorMeta.cast(user_meta.user_meta_data)
 
-                    layer = pyds.get_nvds_LayerInfo(user_meta_data, layer_idx)
+        # the binding table is built on the first frame with tensor metadata and whenever the layers change
+        if self._layer_bindings is None or user_meta_data.num_output_layers != self._num_output_layers:
+            self._bind_layers(user_meta_data)
 
-                    layer_dims = []
-                    elems = 1
-                    for dim in range(layer.dims.numDims):
-                        layer_dims.append(layer.dims.d[dim])
-                        elems *= layer.dims.d[dim]
+        for binding in self._layer_bindings:
+            layer = pyds.get_nvds_LayerInfo(user_meta_data, binding.index)
+            user_data_cupy_layers.append(self._get_layer_view(layer, binding))
 
-                    if not layer.isInput:
-                        self._input_labels.append(layer.layerName)
+        return user_data_cupy_layers
 
-                    udata_unownedmem = cupy.cuda.UnownedMemory(
-                        ctypes.pythonapi.PyCapsule_GetPointer(layer.buffer, None),
-                        get_nvdstype_size(layer.dataType) * elems,
-                        owner,
-                    )
-                    udata_memptr = cupy.cuda.MemoryPointer(udata_unownedmem, 0)
-                    udata_memptr_cupy = cupy.ndarray(
-                        shape=tuple(layer_dims),
-                        dtype=get_nvdstype_npsize(layer.dataType),
-                        memptr=udata_memptr,
-                    )
+    def _bind_layers(self, user_meta_data: pyds.NvDsInferTensorMeta) -> None:
+        self._layer_bindings = get_layer_bindings(user_meta_data)
+        self._num_output_layers = user_meta_data.num_output_layers
+        self._input_labels = ["ORIGINAL_IMAGE", *[binding.label for binding in self._layer_bindings]]
 
-                    logger.debug(
-                        f"Layer Name: {layer.layerName}, Is Input: {layer.isInput},"
-                        f" Dims: {layer_dims}, Data Type: {layer.dataType}"
-                    )
-
-                    user_data_cupy_layers.append(udata_memptr_cupy)
-
-            stream = cupy.cuda.stream.Stream()
-            stream.use()
-
-            user_input_data: Dict[str, cupy.ndarray] = {
-                label: data for label, data in zip(self._input_labels, [input_cupy_array, *user_data_cupy_layers])
-            }
+        for binding in self._layer_bindings:
+            logger.debug(
+                f"Layer Name: {binding.label}, Index: {binding.index}, Dims: {list(binding.shape)}, "
+                f"Data Type: {binding.dtype.__name__}, Size: {binding.size}"
+            )
 
-            try:
+    def _reset_bindings(self, pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: object):
+        # new caps mean new surfaces and possibly new layers, so bindings and views are rebuilt from the next frame
+        if info.get_event().type == Gst.EventType.CAPS:
+            self._layer_bindings = None
+            self._views.clear()
+        return Gst.PadProbeReturn.OK
+
+    def _get_layer_view(self, layer: pyds.NvDsInferLayerInfo, binding: LayerBinding) -> cupy.ndarray:
+        address = get_capsule_pointer(layer.buffer)
+
+        def _make_view() -> cupy.ndarray:
+            udata_unownedmem = cupy.cuda.UnownedMemory(address, binding.size, None)
+            udata_memptr = cupy.cuda.MemoryPointer(udata_unownedmem, 0)
+            udata_memptr_cupy = cupy.ndarray(
+                shape=binding.shape,
+                dtype=binding.dtype,
+                memptr=udata_memptr,
+            )
+            return udata_memptr_cupy
+
+        return self._views.get((address, binding.shape, None, binding.dtype.__name__), _make_view)
+
+    def _process_frame(
+        self,
+        input_cupy_array: cupy.ndarray,
+        user_data_cupy_layers: List[cupy.ndarray],
+        transform_chain: Callable,
+        output_label: str,
+    ) -> None:
+        user_input_data: Dict[str, cupy.ndarray] = {
+            label: data for label, data in zip(self._input_labels, [input_cupy_array, *user_data_cupy_layers])
+        }
+
+        user_output_cupy = transform_chain(user_input_data)[output_label]
+        cupy.copyto(input_cupy_array, user_output_cupy)
+
+    def _process_batch(
+        self,
+        frames: List[Tuple[cupy.ndarray, List[cupy.ndarray]]],
+        transform_chain: Callable,
+        output_label: str,
+    ) -> None:
+        if not frames:
+            return
 
-                user_output_cupy = self._user_callback(user_input_data)[self._output_label]
-                cupy.copyto(input_cupy_array, user_output_cupy)
+        # frames and layers are stacked along a new leading batch dimension in the order of the batch metadata
+        input_cupy_array = cupy.stack([frame for frame, _ in frames])
+        user_data_cupy_layers = [cupy.stack(layers) for layers in zip(*[layers for _, layers in frames])]
 
-            except Exception as e:
-                logger.exception(e)
-                return Gst.PadProbeReturn.HANDLED
+        user_input_data: Dict[str, cupy.ndarray] = {
+            label: data for label, data in zip(self._input_labels, [input_cupy_array, *user_data_cupy_layers])
+        }
 
-            stream.synchronize()
+        user_output_cupy = transform_chain(user_input_data)[output_label]
+        if len(user_output_cupy) != len(frames):
+            raise StreamTransformChainError(
+                f"{self.get_name()} expected a batch of {len(frames)} frames from the transform chain, "
+                f"got {len(user_output_cupy)}"
+            )
 
-            return Gst.PadProbeReturn.OK
+        for idx, (frame, _) in enumerate(frames):
+            cupy.copyto(frame, user_output_cupy[idx])
@@ -0,0 +1,234 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+from uuid import uuid4
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError
+from monaistream.interface import StreamFilterComponent
+from monaistream.qos import QoSController
+from monaistream.util.buffer import VideoLayout, get_video_layout, is_buffer_writable, map_buffer, video_frame_array
+from monaistream.util.cache import ViewCache
+
+from .infer_local import LocalInferServer
+
+logger = logging.getLogger(__name__)
+
+
+class TransformChainComponentNumpy(StreamFilterComponent):
+    """
+    The `TransformChainComponentNumpy` allows users to plugin a `Callable` operating on NumPy arrays into the MONAI
+    Stream pipeline without requiring GPU surfaces. Frames are converted to a packed format in system memory and
+    mapped into `(height, width, channels)` `uint8` arrays without copying; the result of the `Callable` is written
+    back into the frame.
+    """
+
+    def __init__(
+        self,
+        transform_chain: Callable,
+        output_label: str,
+        name: str = "",
+        format: Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"] = "RGBA",
+    ) -> None:
+        """
+        :param transform_chain: a `Callable` object such as `monai.transforms.compose.Compose` which receives a
+                                dictionary with the frame under the `ORIGINAL_IMAGE` key
+        :param output_label: the label key to select the output from this component
+        :param name: the name to assign to this component
+        :param format: the pixel format of the frames passed to `transform_chain`
+        """
+        self._user_callback = transform_chain
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._output_label = output_label
+        self._format = format
+        self._qos: Optional[QoSController] = None
+        self._inference: Optional[LocalInferServer] = None
+        self._swap_lock = threading.Lock()
+        self._layout: Optional[VideoLayout] = None
+        self._views = ViewCache()
+        self._probe_calls = 0
+        self._probe_time = 0.0
+        self._copies = 0
+        # set while a processed copy of a frame is pushed through the probed pad, which must not process it again
+        self._forwarding = threading.local()
+
+    def initialize(self):
+        """
+        Initializes the GStreamer elements wrapped by this component, which are a `videoconvert` converting frames to
+        the requested format, a `capsfilter` and a `queue` element
+        """
+        convert = Gst.ElementFactory.make("videoconvert", f"{self._name}-videoconvert")
+        if not convert:
+            raise BinCreationError(f"Unable to create converter for {self.__class__.__name__} {self.get_name()}")
+
+        capsfilter = Gst.ElementFactory.make("capsfilter", f"{self._name}-filter")
+        if not capsfilter:
+            raise BinCreationError(f"Unable to create caps filter for {self.__class__.__name__} {self.get_name()}")
+        capsfilter.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format={self._format}"))
+
+        ucbt = Gst.ElementFactory.make("queue", self.get_name())
+        if not ucbt:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        self._convert = convert
+        self._capsfilter = capsfilter
+        self._ucbt = ucbt
+
+        transform_sinkpad = self._ucbt.get_static_pad("sink")
+        transform_sinkpad.add_probe(Gst.PadProbeType.BUFFER, self.probe_callback, 0)
+        transform_sinkpad.add_probe(Gst.PadProbeType.EVENT_DOWNSTREAM, self._reset_layout, None)
+
+    def get_name(self):
+        """
+        Get the name assigned to the component
+
+        :return: the name as a `str`
+        """
+        return f"{self._name}-usercallbacktransform"
+
+    def set_transform_chain(self, transform_chain: Callable, output_label: Optional[str] = None) -> None:
+        """
+        Replace the `transform_chain` of the component, which may be done while the pipeline is running
+
+        :param transform_chain: the new `Callable`
+        :param output_label: the label key to select the output of the new `transform_chain`, unchanged by default
+        """
+        with self._swap_lock:
+            self._user_callback = transform_chain
+            if output_label is not None:
+                self._output_label = output_label
+
+    def set_qos_controller(self, controller: Optional[QoSController]) -> None:
+        """
+        Set the controller which decides whether frames arriving late are processed by the `transform_chain`
+
+        :param controller: the :class:`monaistream.qos.QoSController` of the pipeline, or `None` to process all frames
+        """
+        self._qos = controller
+        if controller:
+            controller.register(self.get_name())
+
+    def set_inference_outputs(self, inference: Optional[LocalInferServer]) -> None:
+        """
+        Set the inference component whose outputs for each frame are passed to the `transform_chain` along with
+        `ORIGINAL_IMAGE`, under their output labels (e.g. `OUTPUT__0`)
+
+        :param inference: an upstream :class:`monaistream.filters.LocalInferServer`, or `None` to pass the frame only
+        """
+        self._inference = inference
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer elements
+
+        :return: a tuple of `Gst.Element`s of types `(videoconvert, capsfilter, queue)`
+        """
+        return (self._convert, self._capsfilter, self._ucbt)
+
+    def get_probe_stats(self) -> Dict[str, float]:
+        """
+        Get statistics of the time spent processing frames and of the reuse of the arrays wrapping them
+
+        :return: a dictionary with the number of `frames` processed, the `mean_ms` time spent per frame, the
+                 `view_hits` and `view_misses` of the frame view cache, and the number of frames whose memory was
+                 not writable and were processed as `copies`
+        """
+        stats = self._views.get_stats()
+        return {
+            "frames": self._probe_calls,
+            "mean_ms": self._probe_time * 1e3 / self._probe_calls if self._probe_calls else 0.0,
+            "view_hits": stats["hits"],
+            "view_misses": stats["misses"],
+            "copies": self._copies,
+        }
+
+    def probe_callback(self, pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: object):
+        """
+        A wrapper function for the `transform_chain` callable set in the constructor. Maps the frame into a NumPy
+        array before the user-specified `transform_chain` is called; the result of `transform_chain` is written into
+        the frame, or into a copy of the frame pushed in its place when its memory is shared with other buffers or
+        read-only. NOTE: The output must have the same shape as the frame or be broadcastable to it.
+        """
+        if getattr(self._forwarding, "active", False):
+            return Gst.PadProbeReturn.OK
+
+        inbuf = info.get_buffer()
+        if not inbuf:
+            logger.error("Unable to get GstBuffer")
+            return Gst.PadProbeReturn.OK
+
+        if self._qos:
+            qos_return = self._qos.check(self.get_name(), pad, inbuf)
+            if qos_return is not None:
+                return qos_return
+
+        with self._swap_lock:
+            transform_chain, output_label = self._user_callback, self._output_label
+
+        start = time.perf_counter()
+
+        try:
+
+            if self._layout is None:
+                self._layout = get_video_layout(pad.get_current_caps(), inbuf)
+
+            buffer = inbuf
+            if not is_buffer_writable(inbuf):
+                # e.g. the other branches of a `tee` or a passthrough element share the memory of the frame
+                buffer = inbuf.copy_deep()
+                self._copies += 1
+
+            with map_buffer(buffer, writable=True) as (address, size):
+                layout = self._layout
+                frame = self._views.get((address, size, layout), lambda: video_frame_array(address, size, layout))
+
+                inputs = {"ORIGINAL_IMAGE": frame}
+                if self._inference:
+                    inputs.update(self._inference.get_outputs(buffer.pts))
+
+                user_output_array = transform_chain(inputs)[output_label]
+                if user_output_array is not frame:
+                    np.copyto(frame, user_output_array, casting="unsafe")
+
+        except Exception as e:
+            logger.exception(e)
+            return Gst.PadProbeReturn.HANDLED
+
+        self._probe_calls += 1
+        self._probe_time += time.perf_counter() - start
+
+        if buffer is not inbuf:
+            self._forwarding.active = True
+            try:
+                pad.chain(buffer)
+            finally:
+                self._forwarding.active = False
+            return Gst.PadProbeReturn.DROP
+
+        return Gst.PadProbeReturn.OK
+
+    def _reset_layout(self, pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: object):
+        # new caps may change the size of the frames, so the layout and views are rebuilt from the next frame
+        if info.get_event().type == Gst.EventType.CAPS:
+            self._layout = None
+            self._views.clear()
+        return Gst.PadProbeReturn.OK
@@ -0,0 +1,279 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import StreamProbeRuntimeError
+from monaistream.util.buffer import VideoLayout, map_buffer
+from monaistream.util.cache import numpy_view
+
+from .transform_async import TransformChainComponentAsync
+
+logger = logging.getLogger(__name__)
+
+# the shared memory rings attached by a worker process, by name
+_worker_rings: Dict[str, SharedMemory] = {}
+
+# the version, `transform_chain` and output label installed in a worker process
+_worker_chain: Optional[Tuple[int, Callable, str]] = None
+
+
+def _install_transform_chain(version: int, transform_chain: Callable, output_label: str) -> None:
+    # runs in a worker process when it starts, or when the transform chain of the component was replaced
+    global _worker_chain
+    _worker_chain = (version, transform_chain, output_label)
+
+
+def _run_transform_chain(
+    ring_name: str,
+    slot_size: int,
+    slot: int,
+    layout: VideoLayout,
+    version: int,
+    outputs: Dict[str, np.ndarray],
+    chain: Optional[Tuple[Callable, str]] = None,
+) -> bool:
+    # runs in a worker process: the frame is read from its slot of the ring and the result written back into it;
+    # the transform chain is only sent along when the installed one is outdated, which the worker reports by
+    # returning `False` without touching the frame
+    if chain is not None:
+        _install_transform_chain(version, *chain)
+    elif _worker_chain is None or _worker_chain[0] != version:
+        return False
+    _, transform_chain, output_label = _worker_chain
+
+    ring = _worker_rings.get(ring_name)
+    if ring is None:
+        ring = _worker_rings[ring_name] = SharedMemory(name=ring_name)
+
+    frame = np.ndarray(
+        shape=layout.shape,
+        dtype=np.uint8,
+        buffer=ring.buf,
+        offset=slot * slot_size + layout.offset,
+        strides=layout.strides,
+    )
+    user_output_array = transform_chain({"ORIGINAL_IMAGE": frame, **outputs})[output_label]
+    if user_output_array is not frame:
+        np.copyto(frame, user_output_array, casting="unsafe")
+    return True
+
+
+def _release_ring(executor: ProcessPoolExecutor, ring: Optional[SharedMemory]) -> None:
+    executor.shutdown(wait=True)
+    if ring is not None:
+        try:
+            ring.close()
+        except BufferError:
+            # views of the ring are still alive when the component is garbage collected, the mapping is released
+            # along with them
+            pass
+        ring.unlink()
+
+
+class TransformChainComponentProcess(TransformChainComponentAsync):
+    """
+    The `TransformChainComponentProcess` runs a `Callable` operating on NumPy arrays in a pool of worker processes,
+    so that transforms holding the GIL (e.g. per-pixel Python logic or `monai.transforms.Lambdad`) scale beyond one
+    core. Frames are exchanged with the workers through a ring of slots in shared memory instead of being pickled,
+    and are re-emitted in the order they arrived as in :class:`monaistream.filters.TransformChainComponentAsync`.
+
+    Workers are started with the `spawn` method, so `transform_chain` must be picklable (e.g. a function defined at
+    the top level of a module, or a `monai.transforms.compose.Compose` of picklable transforms). It is installed
+    once in each worker when the worker starts, and sent again only after it was replaced, so that only the slot of
+    each frame, its layout and the model outputs are pickled per frame.
+    """
+
+    def __init__(
+        self,
+        transform_chain: Callable,
+        output_label: str,
+        name: str = "",
+        format: Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"] = "RGBA",
+        num_workers: int = 4,
+        max_in_flight: int = 8,
+    ) -> None:
+        """
+        :param transform_chain: a picklable `Callable` object such as `monai.transforms.compose.Compose` which
+                                receives a dictionary with the frame under the `ORIGINAL_IMAGE` key
+        :param output_label: the label key to select the output from this component
+        :param name: the name to assign to this component
+        :param format: the pixel format of the frames passed to `transform_chain`
+        :param num_workers: the number of worker processes running `transform_chain`
+        :param max_in_flight: the maximum number of frames received but not yet re-emitted by the component, which
+                              is also the number of slots of the shared memory ring
+        """
+        super().__init__(
+            transform_chain,
+            output_label,
+            name=name,
+            format=format,
+            num_workers=num_workers,
+            max_in_flight=max_in_flight,
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._ring: Optional[SharedMemory] = None
+        self._ring_lock = threading.Lock()
+        # notified when the last frame using the ring completes, which `close` waits for
+        self._ring_idle = threading.Condition(self._ring_lock)
+        self._ring_users = 0
+        self._ring_slots: Optional[np.ndarray] = None
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        self._finalizer: Optional[weakref.finalize] = None
+        self._chain_version = 0
+
+    def initialize(self):
+        """
+        Initializes the GStreamer elements wrapped by this component (see
+        :meth:`monaistream.filters.TransformChainComponentAsync.initialize`) and starts the worker processes
+        """
+        super().initialize()
+        with self._ring_lock:
+            self._start_pool()
+
+    def set_transform_chain(self, transform_chain: Callable, output_label: Optional[str] = None) -> None:
+        """
+        Replace the `transform_chain` of the component, which may be done while the pipeline is running. Frames
+        already handed to the workers complete with the previous `transform_chain`; each worker receives the new one
+        along with its next frame.
+
+        :param transform_chain: the new picklable `Callable`
+        :param output_label: the label key to select the output of the new `transform_chain`, unchanged by default
+        """
+        with self._swap_lock:
+            self._user_callback = transform_chain
+            if output_label is not None:
+                self._output_label = output_label
+            self._chain_version += 1
+
+    def close(self) -> None:
+        """
+        Stop the worker processes and release the shared memory ring, once the frames being processed have
+        completed. This is done when the component is garbage collected; the workers are started again if frames
+        arrive afterwards, e.g. when the pipeline is run again.
+        """
+        with self._ring_idle:
+            self._ring_idle.wait_for(lambda: self._ring_users == 0)
+            # the ring can only be closed once no view of it is left
+            self._ring_slots = None
+            if self._finalizer:
+                self._finalizer()
+            self._finalizer = None
+            self._pool = None
+            self._ring = None
+            self._free_slots = queue.Queue()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        # called with `_ring_lock` held; the workers install the current transform chain when they start
+        if self._pool is None:
+            with self._swap_lock:
+                initargs = (self._chain_version, self._user_callback, self._output_label)
+            # forking a process running GStreamer threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                self._num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_install_transform_chain,
+                initargs=initargs,
+            )
+            self._finalizer = weakref.finalize(self, _release_ring, self._pool, None)
+        return self._pool
+
+    def _acquire_ring(self, slot_size: int) -> Tuple[ProcessPoolExecutor, str, np.ndarray, "queue.Queue[int]"]:
+        # the ring is allocated once the size of the frames is known; the slots are the threads' view of the ring.
+        # The pool and the ring are returned together so that a frame keeps using them even if `close` is called,
+        # which waits for the frame to release them
+        with self._ring_lock:
+            self._start_pool()
+            if self._ring_slots is None:
+                self._ring = SharedMemory(create=True, size=slot_size * self._max_in_flight)
+                self._ring_slots = np.ndarray((self._max_in_flight, slot_size), dtype=np.uint8, buffer=self._ring.buf)
+                for slot in range(self._max_in_flight):
+                    self._free_slots.put(slot)
+
+                self._finalizer.detach()
+                self._finalizer = weakref.finalize(self, _release_ring, self._pool, self._ring)
+            elif self._ring_slots.shape[1] != slot_size:
+                raise StreamProbeRuntimeError(
+                    f"Frame size changed from {self._ring_slots.shape[1]} to {slot_size} bytes while streaming"
+                )
+
+            self._ring_users += 1
+            return self._pool, self._ring.name, self._ring_slots, self._free_slots
+
+    def _return_ring(self) -> None:
+        with self._ring_idle:
+            self._ring_users -= 1
+            self._ring_idle.notify_all()
+
+    def _process(
+        self,
+        buffer: Gst.Buffer,
+        layout: VideoLayout,
+        transform_chain: Callable,
+        output_label: str,
+        outputs: Dict[str, np.ndarray],
+    ) -> Gst.Buffer:
+        start = time.perf_counter()
+
+        try:
+            size = buffer.get_size()
+            pool, ring_name, ring_slots, free_slots = self._acquire_ring(size)
+            try:
+                with self._swap_lock:
+                    version = self._chain_version
+                    transform_chain, output_label = self._user_callback, self._output_label
+                # a slot is always free since no more than `max_in_flight` frames are being processed
+                slot = free_slots.get()
+                try:
+                    with map_buffer(buffer) as (address, mapped_size):
+                        np.copyto(ring_slots[slot], numpy_view(address, mapped_size, (mapped_size,), np.uint8))
+
+                    # the thread waits for the worker process with the GIL released
+                    # model outputs are small compared to frames, so they are pickled
+                    args = (_run_transform_chain, ring_name, size, slot, layout, version, outputs)
+                    if not pool.submit(*args).result():
+                        # the worker holds an outdated transform chain, which is sent along with the frame once
+                        pool.submit(*args, (transform_chain, output_label)).result()
+
+                    outbuf = Gst.Buffer.new_allocate(None, size, None)
+                    with map_buffer(outbuf, writable=True) as (out_address, out_size):
+                        np.copyto(numpy_view(out_address, out_size, (out_size,), np.uint8), ring_slots[slot])
+                finally:
+                    free_slots.put(slot)
+            finally:
+                # the view of the ring must be gone before `close` may release it
+                del ring_slots
+                self._return_ring()
+
+        except Exception as e:
+            logger.exception(e)
+            raise
+
+        self._copy_timestamps(buffer, outbuf)
+
+        with self._order_lock:
+            self._processed += 1
+            self._process_time += time.perf_counter() - start
+        return outbuf
@@ -11,11 +11,27 @@
 # limitations under the License.
 ################################################################################
 
-from typing import Any
+import ctypes
+from typing import Any, List, NamedTuple, Tuple
 
 import numpy as np
 import pyds
 
+# a private prototype of `PyCapsule_GetPointer`, declared once rather than patching `ctypes.pythonapi` on every frame
+_capsule_get_pointer = ctypes.PYFUNCTYPE(ctypes.c_void_p, ctypes.py_object, ctypes.c_char_p)(
+    ("PyCapsule_GetPointer", ctypes.pythonapi)
+)
+
+
+def get_capsule_pointer(capsule: Any) -> int:
+    """
+    Get the address wrapped by an unnamed `PyCapsule`, such as the surface and layer buffers returned by `pyds`
+
+    :param capsule: the capsule
+    :return: the address as an `int`
+    """
+    return _capsule_get_pointer(capsule, None)
+
 
 def get_nvdstype_size(nvds_type: pyds.NvDsInferDataType) -> int:
 
@@ -43,3 +59,52 @@ def get_nvdstype_npsize(nvds_type: pyds.NvDsInferDataType) -> Any:
         return np.float32
 
     return np.float32
+
+
+class LayerBinding(NamedTuple):
+    """
+    Describes how an inference output layer found in the tensor metadata of a frame is passed to a transform chain
+    """
+
+    # the index of the layer in the tensor metadata
+    index: int
+    # the label (key) the layer is passed under, which is the name of the layer
+    label: str
+    # the NumPy data type of the layer
+    dtype: Any
+    # the dimensions of the layer
+    shape: Tuple[int, ...]
+    # the size of the layer in bytes
+    size: int
+
+
+def get_layer_bindings(tensor_meta: pyds.NvDsInferTensorMeta) -> List[LayerBinding]:
+    """
+    Build the binding table of the output layers in the tensor metadata attached by an inference component. Layers
+    flagged as inputs are not bound.
+
+    :param tensor_meta: the tensor metadata
+    :return: the bindings of the output layers, in the order of the metadata
+    """
+    bindings = []
+    for layer_idx in range(tensor_meta.num_output_layers):
+        layer = pyds.get_nvds_LayerInfo(tensor_meta, layer_idx)
+        if layer.isInput:
+            continue
+
+        shape = tuple(layer.dims.d[dim] for dim in range(layer.dims.numDims))
+        elems = 1
+        for dim in shape:
+            elems *= dim
+
+        bindings.append(
+            LayerBinding(
+                index=layer_idx,
+                label=layer.layerName,
+                dtype=get_nvdstype_npsize(layer.dataType),
+                shape=shape,
+                size=get_nvdstype_size(layer.dataType) * elems,
+            )
+        )
+
+    return bindings
@@ -0,0 +1,140 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+from monaistream.compose import StreamCompose
+from monaistream.errors import StreamComposeCreationError
+from monaistream.mainloop import MainLoopThread
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineHost(object):
+    """
+    Runs many :class:`monaistream.compose.StreamCompose` pipelines in one process on a single shared main loop.
+    Every pipeline keeps its own bus, so messages are routed to the pipeline which posted them, and a pipeline
+    which fails or reaches the end of its stream is torn down without affecting the others.
+    """
+
+    def __init__(self, name: str = "monaistream-host") -> None:
+        """
+        :param name: the name of the host, also used to name its main loop thread
+        """
+        self._runner = MainLoopThread(name)
+        self._pipelines: "OrderedDict[str, StreamCompose]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start the shared main loop. Pipelines may be added before or after the host is started.
+        """
+        self._runner.start()
+
+    def add(self, pipeline: StreamCompose, name: str = "") -> str:
+        """
+        Add a pipeline to the host and start it
+
+        :param pipeline: the pipeline to run
+        :param name: the name under which the pipeline is registered, the pipeline name is used if not provided
+        :return: the name of the pipeline in this host
+        """
+        name = name or pipeline.get_name()
+        with self._lock:
+            if name in self._pipelines:
+                raise StreamComposeCreationError(f"A pipeline named {name} already exists in {self.__class__.__name__}")
+            self._pipelines[name] = pipeline
+
+        self.start()
+        try:
+            pipeline._start_on(self._runner, owns_runner=False)
+        except Exception:
+            with self._lock:
+                self._pipelines.pop(name, None)
+            raise
+
+        pipeline._result.add_done_callback(lambda result: self._on_finished(name, pipeline, result))
+        logger.info(f"Pipeline {name} started")
+        return name
+
+    def remove(self, name: str, timeout: Optional[float] = None) -> StreamCompose:
+        """
+        Stop a pipeline gracefully and remove it from the host. The outcome of the pipeline can then be obtained
+        through its `wait` method.
+
+        :param name: the name of the pipeline
+        :param timeout: the maximum time in seconds to wait for the end of the stream before stopping regardless
+        :return: the removed pipeline
+        """
+        with self._lock:
+            pipeline = self._pipelines.pop(name)
+
+        pipeline.stop(timeout)
+        logger.info(f"Pipeline {name} removed")
+        return pipeline
+
+    def get_pipelines(self) -> Dict[str, StreamCompose]:
+        """
+        Get the pipelines currently registered in the host, including those that have already finished
+
+        :return: a dictionary mapping the pipeline names to the pipelines
+        """
+        with self._lock:
+            return dict(self._pipelines)
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Optional[Exception]]:
+        """
+        Wait for all registered pipelines to finish. Failures are collected rather than raised so that the
+        outcome of every pipeline is reported.
+
+        :param timeout: the maximum time in seconds to wait for each pipeline
+        :return: a dictionary mapping the names of the finished pipelines to the exception they failed with,
+                 or `None` if they reached the end of their stream
+        """
+        outcomes: Dict[str, Optional[Exception]] = {}
+        for name, pipeline in self.get_pipelines().items():
+            try:
+                if pipeline.wait(timeout):
+                    outcomes[name] = None
+            except Exception as e:
+                outcomes[name] = e
+        return outcomes
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop all pipelines gracefully, remove them from the host, and stop the shared main loop
+
+        :param timeout: the maximum time in seconds to wait for the end of stream of each pipeline
+        """
+        for name in list(self.get_pipelines()):
+            self.remove(name, timeout)
+        self._runner.stop()
+
+    def __enter__(self) -> "PipelineHost":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _on_finished(self, name: str, pipeline: StreamCompose, result: Future) -> None:
+        # release the resources of a finished pipeline right away; the other pipelines keep running
+        if result.exception():
+            logger.error(f"Pipeline {name} failed: {result.exception()}")
+        else:
+            logger.info(f"Pipeline {name} reached the end of stream")
+        pipeline._teardown()
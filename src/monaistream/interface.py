@@ -12,7 +12,7 @@
 ################################################################################
 
 from abc import ABCMeta, abstractmethod
-from typing import Any, Tuple
+from typing import Any, Dict, Sequence, Tuple
 
 from gi.repository import Gst
 
@@ -88,6 +88,32 @@ class StreamFilterComponent(StreamComponent):
     pass
 
 
+class BranchingComponent(StreamFilterComponent):
+    """
+    A special component which splits the stream into several named branches of components
+    (see :class:`monaistream.filters.TeeComponent`). A branching component must be the last component of its chain.
+    """
+
+    @abstractmethod
+    def get_branches(self) -> Dict[str, Sequence[StreamComponent]]:
+        """
+        Get the branches fed by this component
+
+        :return: a dictionary mapping the branch names to the sequence of components in each branch
+        """
+        raise NotImplementedError(f"Subclass {self.__class__.__name__} must implement `get_branches`")
+
+    @abstractmethod
+    def get_branch_queue(self, branch_name: str) -> Gst.Element:
+        """
+        Get the `queue` element which decouples a branch from the rest of the pipeline
+
+        :param branch_name: the name of the branch
+        :return: the `queue` `Gst.Element` feeding the branch
+        """
+        raise NotImplementedError(f"Subclass {self.__class__.__name__} must implement `get_branch_queue`")
+
+
 class InferenceFilterComponent(StreamFilterComponent):
     """
     An inference (filter) component abstracting basic methods for components that perform inference
@@ -0,0 +1,213 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from monaistream.compose import StreamCompose
+from monaistream.trace import END_TO_END, summarize
+
+logger = logging.getLogger(__name__)
+
+
+def _run_shard(
+    worker_id: int,
+    factory: Callable[[Any], StreamCompose],
+    shard: List[Any],
+    cpus: Optional[List[int]],
+    results: multiprocessing.Queue,
+) -> None:
+    # imported here so the GStreamer main loop is only created inside the worker process
+    from monaistream.host import PipelineHost
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    pipelines = [factory(source) for source in shard]
+    for pipeline in pipelines:
+        pipeline.enable_tracing()
+
+    start = time.perf_counter()
+    host = PipelineHost(f"worker-{worker_id}")
+    with host:
+        for pipeline in pipelines:
+            host.add(pipeline)
+        outcomes = host.wait()
+    elapsed = time.perf_counter() - start
+
+    frames = sum(p.get_latency_report().get(END_TO_END, {}).get("count", 0) for p in pipelines)
+    failures = {name: str(e) for name, e in outcomes.items() if e is not None}
+    results.put(
+        {
+            "worker": worker_id,
+            "pid": os.getpid(),
+            "cpus": cpus,
+            "sources": len(shard),
+            "frames": frames,
+            "elapsed": elapsed,
+            "fps": frames / elapsed if elapsed > 0 else 0.0,
+            "failures": failures,
+            "samples": [sample for p in pipelines for sample in p.get_latency_samples()],
+        }
+    )
+
+    if failures:
+        sys.exit(1)
+
+
+class ShardedLauncher(object):
+    """
+    Scales pipelines across CPU cores by sharding a list of sources over worker processes. Each worker builds one
+    :class:`monaistream.compose.StreamCompose` per source in its shard with the provided factory and runs them on a
+    :class:`monaistream.host.PipelineHost`. Workers which fail are restarted, and the throughput and latency
+    measured by every worker are gathered into one report.
+
+    Workers are started with the `spawn` method by default, so the factory must be picklable (e.g. a module-level
+    function) and the launching script must guard its entry point with `if __name__ == "__main__":`. Workers are not
+    daemonic, so the pipelines they run may start processes of their own (e.g.
+    :class:`monaistream.filters.TransformChainComponentProcess`); the launcher terminates any worker left running
+    when :meth:`run` is interrupted.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[Any], StreamCompose],
+        sources: Sequence[Any],
+        num_workers: Optional[int] = None,
+        cpus: Optional[Sequence[int]] = None,
+        max_restarts: int = 3,
+        start_method: str = "spawn",
+    ) -> None:
+        """
+        :param factory: a callable creating a pipeline for a single source, called inside the worker processes
+        :param sources: the sources to shard across workers, each passed as-is to `factory`
+        :param num_workers: the number of worker processes, by default one per available CPU core (at most one
+                            per source)
+        :param cpus: the CPU cores to pin the workers to (worker `i` is pinned to `cpus[i % len(cpus)]`),
+                     workers are not pinned if not provided
+        :param max_restarts: the number of times a failing worker is restarted before its shard is abandoned
+        :param start_method: the `multiprocessing` start method used to create the workers
+        """
+        if not sources:
+            raise ValueError(f"{self.__class__.__name__} requires at least one source")
+
+        if not num_workers:
+            num_workers = len(cpus) if cpus else (os.cpu_count() or 1)
+
+        self._factory = factory
+        self._num_workers = max(1, min(num_workers, len(sources)))
+        self._shards = [list(sources[idx :: self._num_workers]) for idx in range(self._num_workers)]
+        self._cpus = list(cpus) if cpus else None
+        self._max_restarts = max_restarts
+        self._context = multiprocessing.get_context(start_method)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Start the workers, supervise them until all shards have finished, and gather their statistics
+
+        :return: a report with the per-worker statistics under `workers`, the total number of `frames`, the
+                 aggregate throughput in frames per second under `fps`, the end-to-end latency percentiles across
+                 all pipelines under `latency`, the number of restarts of every worker under `restarts` and the
+                 workers whose shard was abandoned after `max_restarts` under `failed`
+        """
+        results = self._context.Queue()
+        processes: Dict[int, multiprocessing.Process] = {}
+        restarts = {worker_id: 0 for worker_id in range(self._num_workers)}
+        failed: List[int] = []
+        stats: Dict[int, Dict[str, Any]] = {}
+
+        start = time.perf_counter()
+        try:
+            for worker_id in range(self._num_workers):
+                processes[worker_id] = self._spawn(worker_id, results)
+
+            while processes:
+                try:
+                    worker_stats = results.get(timeout=0.5)
+                    stats[worker_stats["worker"]] = worker_stats
+                except queue.Empty:
+                    pass
+
+                for worker_id, process in list(processes.items()):
+                    if process.is_alive():
+                        continue
+
+                    process.join()
+                    del processes[worker_id]
+                    if process.exitcode == 0:
+                        continue
+
+                    if restarts[worker_id] < self._max_restarts:
+                        restarts[worker_id] += 1
+                        logger.warning(
+                            f"Worker {worker_id} exited with code {process.exitcode}, "
+                            f"restarting ({restarts[worker_id]}/{self._max_restarts})"
+                        )
+                        processes[worker_id] = self._spawn(worker_id, results)
+                    else:
+                        logger.error(f"Worker {worker_id} exited with code {process.exitcode}, giving up")
+                        failed.append(worker_id)
+        finally:
+            # workers are not daemonic, so they would otherwise keep the launching process alive
+            for process in processes.values():
+                self._terminate(process)
+
+        elapsed = time.perf_counter() - start
+
+        # collect the statistics posted right before the last workers exited
+        while True:
+            try:
+                worker_stats = results.get(timeout=0.1)
+                stats[worker_stats["worker"]] = worker_stats
+            except queue.Empty:
+                break
+
+        samples = [sample for worker_stats in stats.values() for sample in worker_stats.pop("samples")]
+        for worker_id, worker_stats in stats.items():
+            worker_stats["restarts"] = restarts[worker_id]
+
+        frames = sum(worker_stats["frames"] for worker_stats in stats.values())
+        return {
+            "workers": stats,
+            "frames": frames,
+            "elapsed": elapsed,
+            "fps": frames / elapsed if elapsed > 0 else 0.0,
+            "latency": summarize(samples),
+            "restarts": restarts,
+            "failed": failed,
+        }
+
+    def _spawn(self, worker_id: int, results: multiprocessing.Queue) -> multiprocessing.Process:
+        cpus = [self._cpus[worker_id % len(self._cpus)]] if self._cpus else None
+        process = self._context.Process(
+            target=_run_shard,
+            args=(worker_id, self._factory, self._shards[worker_id], cpus, results),
+            name=f"monaistream-worker-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        return process
+
+    def _terminate(self, process: multiprocessing.Process, timeout: float = 5.0) -> None:
+        if process.is_alive():
+            logger.warning(f"Terminating {process.name}")
+            process.terminate()
+            process.join(timeout)
+        if process.is_alive():
+            process.kill()
+        process.join()
@@ -0,0 +1,114 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+
+class MainLoopThread(object):
+    """
+    Runs a `GLib.MainLoop` on its own `GLib.MainContext` in a background thread. Bus watches added from within
+    :meth:`invoke` are dispatched by this thread, which allows pipelines to run without blocking the caller.
+    """
+
+    def __init__(self, name: str = "monaistream-mainloop") -> None:
+        """
+        :param name: the name of the background thread
+        """
+        self._name = name
+        self._context = GLib.MainContext.new()
+        self._loop = GLib.MainLoop.new(self._context, False)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the main loop in the background thread
+        """
+        if self._thread:
+            return
+
+        started = threading.Event()
+
+        def _run():
+            self._context.push_thread_default()
+            try:
+                # sources invoked before `run` are dispatched as soon as the loop starts iterating
+                started.set()
+                self._loop.run()
+            finally:
+                self._context.pop_thread_default()
+
+        self._thread = threading.Thread(target=_run, name=self._name, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Quit the main loop and wait for the background thread to finish
+
+        :param timeout: the maximum time in seconds to wait for the thread
+        """
+        thread, self._thread = self._thread, None
+        if not thread:
+            return
+
+        self._loop.quit()
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def is_running(self) -> bool:
+        """
+        Determine if the main loop thread is running
+
+        :return: `True` if the thread is alive
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_loop_thread(self) -> bool:
+        """
+        Determine if the caller is running in the main loop thread
+
+        :return: `True` if called from the main loop thread
+        """
+        return self._thread is threading.current_thread()
+
+    def invoke(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Call a function from the main loop thread, where the context of the loop is the thread-default context,
+        and wait for its result
+
+        :param func: the function to call
+        :param args: the arguments to pass to `func`
+        :param timeout: the maximum time in seconds to wait for the result
+        :return: the return value of `func`
+        """
+        if self.in_loop_thread():
+            return func(*args)
+
+        future: Future = Future()
+
+        def _call(*_):
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return GLib.SOURCE_REMOVE
+
+        self._context.invoke_full(GLib.PRIORITY_DEFAULT, _call)
+        return future.result(timeout)
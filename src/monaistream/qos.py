@@ -0,0 +1,141 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.interface import StreamComponent
+
+logger = logging.getLogger(__name__)
+
+QoSPolicy = Literal["drop", "skip"]
+
+
+class QoSController(object):
+    """
+    Enforces a latency budget on the frames of a pipeline. The age of a frame is the difference between the
+    current running time of the pipeline clock and the running time of the frame; frames older than the budget
+    when they reach a controlled component are either dropped or passed through without being processed.
+    """
+
+    def __init__(self, latency_budget: float, policy: QoSPolicy = "drop") -> None:
+        """
+        :param latency_budget: the maximum age of a frame in milliseconds for it to be processed
+        :param policy: `"drop"` to discard stale frames, or `"skip"` to pass stale frames downstream without calling
+                       the user callback of transform components; stale frames are always dropped in front of
+                       inference components since their outputs are expected downstream
+        """
+        self._budget = int(latency_budget * Gst.MSECOND)
+        self._policy = policy
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str) -> None:
+        """
+        Register a component so that it appears in the statistics even if none of its frames were late
+
+        :param name: the name of the component
+        """
+        with self._lock:
+            self._stats.setdefault(name, {"processed": 0, "skipped": 0, "dropped": 0})
+
+    def attach(self, component: StreamComponent) -> None:
+        """
+        Enforce the budget in front of a component by probing the sink pad of its first element. Stale frames are
+        dropped before reaching the component regardless of the policy.
+
+        :param component: the component to control
+        """
+        name = component.get_name()
+        self.register(name)
+
+        sinkpad = component.get_gst_element()[0].get_static_pad("sink")
+        if not sinkpad:
+            logger.warning(f"Unable to enforce the latency budget in front of {name}: no sink pad")
+            return
+
+        sinkpad.add_probe(Gst.PadProbeType.BUFFER, self._probe_drop, name)
+
+    def check(
+        self, name: str, pad: Gst.Pad, buffer: Gst.Buffer, policy: Optional[QoSPolicy] = None
+    ) -> Optional[Gst.PadProbeReturn]:
+        """
+        Check a frame against the latency budget, meant to be called at the start of a pad probe
+
+        :param name: the name of the component the frame is about to be processed by
+        :param pad: the pad the frame was intercepted on
+        :param buffer: the frame
+        :param policy: overrides the policy of the controller for this check
+        :return: `None` if the frame should be processed, otherwise the value the probe should return
+                 (`Gst.PadProbeReturn.DROP` to drop the frame or `Gst.PadProbeReturn.OK` to pass it through)
+        """
+        lateness = self.get_lateness(pad, buffer)
+        stale = lateness is not None and lateness > self._budget
+        policy = policy or self._policy
+
+        with self._lock:
+            stats = self._stats.setdefault(name, {"processed": 0, "skipped": 0, "dropped": 0})
+            if not stale:
+                stats["processed"] += 1
+                return None
+            stats["dropped" if policy == "drop" else "skipped"] += 1
+
+        logger.debug(f"Frame {buffer.pts} is {lateness / Gst.MSECOND:.1f}ms old at {name}, {policy}ping")
+        return Gst.PadProbeReturn.DROP if policy == "drop" else Gst.PadProbeReturn.OK
+
+    @staticmethod
+    def get_lateness(pad: Gst.Pad, buffer: Gst.Buffer) -> Optional[int]:
+        """
+        Compute the age of a frame from the clock of the pipeline
+
+        :param pad: the pad the frame was intercepted on
+        :param buffer: the frame
+        :return: the age of the frame in nanoseconds, or `None` when it cannot be determined (e.g. before the
+                 pipeline has a clock, or for frames without timestamps)
+        """
+        if buffer.pts == Gst.CLOCK_TIME_NONE:
+            return None
+
+        element = pad.get_parent_element()
+        clock = element.get_clock() if element else None
+        if not clock:
+            return None
+
+        event = pad.get_sticky_event(Gst.EventType.SEGMENT, 0)
+        if not event:
+            return None
+
+        running_time = event.parse_segment().to_running_time(Gst.Format.TIME, buffer.pts)
+        if running_time == Gst.CLOCK_TIME_NONE:
+            return None
+
+        return clock.get_time() - element.get_base_time() - running_time
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the number of frames processed, skipped and dropped by each controlled component
+
+        :return: a dictionary mapping component names to their `processed`, `skipped` and `dropped` frame counts
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def _probe_drop(self, pad: Gst.Pad, info: Gst.PadProbeInfo, name: str):
+        buffer = info.get_buffer()
+        if not buffer:
+            return Gst.PadProbeReturn.OK
+        return self.check(name, pad, buffer, policy="drop") or Gst.PadProbeReturn.OK
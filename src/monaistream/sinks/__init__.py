@@ -11,5 +11,12 @@
 # limitations under the License.
 ################################################################################
 
+from .appsink import AppSink, AppSinkFrame, AppSinkPolicy
 from .fake import FakeSink
 from .nveglglessink import NVEglGlesSink
+
+# the shared memory sink requires `multiprocessing.shared_memory` from Python 3.8
+try:
+    from .shm import SharedMemorySink
+except ImportError:
+    pass
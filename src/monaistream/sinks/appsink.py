@@ -0,0 +1,258 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+from uuid import uuid4
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError
+from monaistream.interface import StreamSinkComponent
+from monaistream.util.buffer import VIDEO_FORMAT_CHANNELS, get_video_layout, map_buffer, video_frame_array
+from monaistream.util.cache import numpy_view
+
+AppSinkPolicy = Literal["drop-oldest", "block"]
+
+
+class AppSinkFrame(object):
+    """
+    A sample received by an :class:`AppSink`. The sample, and the memory of its buffer, are held for as long as
+    the frame is referenced.
+    """
+
+    def __init__(self, sample: Gst.Sample) -> None:
+        """
+        :param sample: the sample pulled from the `appsink`
+        """
+        self._sample = sample
+        self._buffer = sample.get_buffer()
+
+    @property
+    def sample(self) -> Gst.Sample:
+        """
+        The GStreamer sample, giving access to the caps, the buffer and its metadata
+        """
+        return self._sample
+
+    @property
+    def pts(self) -> int:
+        """
+        The presentation timestamp of the frame in nanoseconds, or `Gst.CLOCK_TIME_NONE`
+        """
+        return self._buffer.pts
+
+    @property
+    def duration(self) -> int:
+        """
+        The duration of the frame in nanoseconds, or `Gst.CLOCK_TIME_NONE`
+        """
+        return self._buffer.duration
+
+    @contextmanager
+    def view(self) -> Iterator[np.ndarray]:
+        """
+        Map the frame into a read-only NumPy array without copying it. Packed video frames are mapped into
+        `(height, width, channels)` `uint8` arrays, other buffers (e.g. tensors) into flat `uint8` arrays.
+
+        :return: a context manager yielding the array, which must not be used after the context exits
+        """
+        caps = self._sample.get_caps()
+        structure = caps.get_structure(0) if caps else None
+        is_video = structure and structure.get_string("format") in VIDEO_FORMAT_CHANNELS
+
+        with map_buffer(self._buffer) as (address, size):
+            if is_video:
+                array = video_frame_array(address, size, get_video_layout(caps, self._buffer))
+            else:
+                array = numpy_view(address, size, (size,), np.uint8)
+            array.flags.writeable = False
+            yield array
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        Copy the frame into a NumPy array which remains valid after the frame is released
+
+        :return: a copy of the array yielded by :meth:`view`
+        """
+        with self.view() as array:
+            return array.copy()
+
+
+class AppSink(StreamSinkComponent):
+    """
+    Sink component handing the output of a MONAI Stream pipeline to Python code, e.g. archivers or analytics. Frames
+    are kept in a bounded ring buffer read through a blocking iterator or an async iterator, which both end with the
+    stream. When the consumer falls behind, the oldest frames are dropped so the pipeline keeps running (the
+    `drop-oldest` policy), or the pipeline is stalled until there is room for new frames (the `block` policy).
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        max_size: int = 8,
+        policy: AppSinkPolicy = "drop-oldest",
+        format: Optional[Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"]] = None,
+    ) -> None:
+        """
+        :param name: the name to assign to this component
+        :param max_size: the maximum number of frames held by the ring buffer
+        :param policy: `drop-oldest` to discard the oldest frame when the ring buffer is full, or `block` to wait
+                       for the consumer
+        :param format: the pixel format frames are converted to, or `None` to receive buffers unchanged
+        """
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._max_size = max_size
+        self._policy = policy
+        self._format = format
+
+        self._frames: Deque[AppSinkFrame] = deque()
+        self._cond = threading.Condition()
+        self._eos = False
+        self._closed = False
+        self._received = 0
+        self._dropped = 0
+
+    def initialize(self):
+        """
+        Initialize the GStreamer elements wrapped by this component: an `appsink`, preceded by a `videoconvert` and
+        a `capsfilter` when a `format` is requested
+        """
+        elements = []
+        if self._format:
+            convert = Gst.ElementFactory.make("videoconvert", f"{self._name}-videoconvert")
+            if not convert:
+                raise BinCreationError(f"Unable to create converter for {self.__class__.__name__} {self.get_name()}")
+
+            capsfilter = Gst.ElementFactory.make("capsfilter", f"{self._name}-filter")
+            if not capsfilter:
+                raise BinCreationError(f"Unable to create caps filter for {self.__class__.__name__} {self.get_name()}")
+            capsfilter.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format={self._format}"))
+            elements += [convert, capsfilter]
+
+        appsink = Gst.ElementFactory.make("appsink", self.get_name())
+        if not appsink:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        appsink.set_property("emit-signals", True)
+        appsink.set_property("sync", False)
+        appsink.connect("new-sample", self._on_new_sample)
+        appsink.connect("eos", self._on_eos)
+
+        self._appsink = appsink
+        self._elements = (*elements, appsink)
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer elements
+
+        :return: a tuple of `Gst.Element`s ending with the `appsink`
+        """
+        return self._elements
+
+    def get_name(self):
+        """
+        Get the assigned name of the component
+
+        :return: the name of the component as `str`
+        """
+        return f"{self._name}-appsink"
+
+    def get(self, timeout: Optional[float] = None) -> Optional[AppSinkFrame]:
+        """
+        Remove the oldest frame from the ring buffer, waiting for one if it is empty
+
+        :param timeout: the maximum time in seconds to wait, or `None` to wait until a frame or the end of the
+                        stream arrives
+        :return: the frame, or `None` at the end of the stream
+        :raises TimeoutError: if no frame arrived within `timeout`
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self._eos or self._closed, timeout):
+                raise TimeoutError(f"No frame received by {self.get_name()} within {timeout}s")
+            if not self._frames:
+                return None
+
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def close(self) -> None:
+        """
+        Stop receiving frames, e.g. before stopping the pipeline while a consumer using the `block` policy is no
+        longer reading. Frames arriving afterwards are dropped and the iterators end once the ring buffer is empty.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get statistics of the frames going through the ring buffer
+
+        :return: a dictionary with the number of frames `received`, `dropped` because the consumer fell behind, and
+                 currently `queued`
+        """
+        with self._cond:
+            return {"received": self._received, "dropped": self._dropped, "queued": len(self._frames)}
+
+    def __iter__(self) -> Iterator[AppSinkFrame]:
+        while True:
+            frame = self.get()
+            if frame is None:
+                return
+            yield frame
+
+    async def __aiter__(self) -> AsyncIterator[AppSinkFrame]:
+        loop = asyncio.get_running_loop()
+        while True:
+            # waiting happens in the default executor so the event loop is not blocked
+            frame = await loop.run_in_executor(None, self.get)
+            if frame is None:
+                return
+            yield frame
+
+    def _on_new_sample(self, appsink: Gst.Element) -> Gst.FlowReturn:
+        sample = appsink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.OK
+
+        frame = AppSinkFrame(sample)
+        with self._cond:
+            if self._policy == "block":
+                # stalls the streaming thread, and thus upstream elements, until the consumer catches up
+                self._cond.wait_for(lambda: len(self._frames) < self._max_size or self._closed)
+            if self._closed:
+                self._dropped += 1
+                return Gst.FlowReturn.OK
+            if len(self._frames) >= self._max_size:
+                self._frames.popleft()
+                self._dropped += 1
+
+            self._frames.append(frame)
+            self._received += 1
+            self._cond.notify_all()
+
+        return Gst.FlowReturn.OK
+
+    def _on_eos(self, appsink: Gst.Element) -> None:
+        with self._cond:
+            self._eos = True
+            self._cond.notify_all()
@@ -0,0 +1,163 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import weakref
+from typing import Dict, Optional
+from uuid import uuid4
+
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError
+from monaistream.interface import StreamSinkComponent
+from monaistream.util.buffer import get_video_layout, map_buffer, video_frame_array
+from monaistream.util.shm import SharedMemoryRingWriter
+
+logger = logging.getLogger(__name__)
+
+
+class SharedMemorySink(StreamSinkComponent):
+    """
+    Sink component publishing the frames of a MONAI Stream pipeline into a named shared memory ring, from which any
+    number of local processes (e.g. a viewer and a recorder) read them with
+    :class:`monaistream.util.shm.SharedMemoryRingReader` without serialization or socket copies. The pipeline never
+    waits for the readers: a reader lagging more than `num_slots` frames behind loses the overwritten frames.
+
+    The ring is created when the first frame arrives, since its slots are sized after the frames; readers wait for
+    it to be created.
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        ring_name: Optional[str] = None,
+        num_slots: int = 8,
+        format: Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"] = "RGBA",
+    ) -> None:
+        """
+        :param name: the name to assign to this component
+        :param ring_name: the name of the shared memory readers attach to, the name of the component by default
+        :param num_slots: the number of frames held by the ring
+        :param format: the pixel format of the published frames
+        """
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._ring_name = ring_name or self.get_name()
+        self._num_slots = num_slots
+        self._format = format
+
+        self._lock = threading.Lock()
+        self._writer: Optional[SharedMemoryRingWriter] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._frames = 0
+        self._dropped = 0
+
+    def initialize(self):
+        """
+        Initialize the GStreamer elements wrapped by this component: a `videoconvert`, a `capsfilter` and an
+        `appsink` writing the frames to the ring
+        """
+        convert = Gst.ElementFactory.make("videoconvert", f"{self._name}-videoconvert")
+        if not convert:
+            raise BinCreationError(f"Unable to create converter for {self.__class__.__name__} {self.get_name()}")
+
+        capsfilter = Gst.ElementFactory.make("capsfilter", f"{self._name}-filter")
+        if not capsfilter:
+            raise BinCreationError(f"Unable to create caps filter for {self.__class__.__name__} {self.get_name()}")
+        capsfilter.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format={self._format}"))
+
+        appsink = Gst.ElementFactory.make("appsink", self.get_name())
+        if not appsink:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        appsink.set_property("emit-signals", True)
+        appsink.set_property("sync", False)
+        appsink.connect("new-sample", self._on_new_sample)
+        appsink.connect("eos", self._on_eos)
+
+        self._convert = convert
+        self._capsfilter = capsfilter
+        self._appsink = appsink
+
+    def get_gst_element(self):
+        """
+        Return the GStreamer elements
+
+        :return: a tuple of `Gst.Element`s of types `(videoconvert, capsfilter, appsink)`
+        """
+        return (self._convert, self._capsfilter, self._appsink)
+
+    def get_name(self):
+        """
+        Get the assigned name of the component
+
+        :return: the name of the component as `str`
+        """
+        return f"{self._name}-shmsink"
+
+    def get_ring_name(self) -> str:
+        """
+        Get the name of the shared memory ring readers attach to
+
+        :return: the name as a `str`
+        """
+        return self._ring_name
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get statistics of the frames published
+
+        :return: a dictionary with the number of `frames` written to the ring and `dropped` because they did not
+                 fit its slots (e.g. after a change of resolution)
+        """
+        return {"frames": self._frames, "dropped": self._dropped}
+
+    def close(self) -> None:
+        """
+        Release the ring and remove its name. Readers already attached keep reading the frames left in the ring. This
+        is done when the component is garbage collected.
+        """
+        if self._finalizer:
+            self._finalizer()
+
+    def _on_new_sample(self, appsink: Gst.Element) -> Gst.FlowReturn:
+        sample = appsink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.OK
+
+        buffer = sample.get_buffer()
+        with self._lock:
+            layout = get_video_layout(sample.get_caps(), buffer)
+            if self._writer is None:
+                height, width, channels = layout.shape
+                self._writer = SharedMemoryRingWriter(self._ring_name, self._num_slots, height * width * channels)
+                self._finalizer = weakref.finalize(self, self._writer.close)
+                logger.info(f"{self.get_name()} publishing {width}x{height} frames to {self._ring_name}")
+
+            try:
+                with map_buffer(buffer) as (address, size):
+                    self._writer.write(video_frame_array(address, size, layout), buffer.pts, buffer.duration)
+                self._frames += 1
+            except Exception as e:
+                logger.exception(e)
+                self._dropped += 1
+
+        return Gst.FlowReturn.OK
+
+    def _on_eos(self, appsink: Gst.Element) -> None:
+        with self._lock:
+            if self._writer:
+                self._writer.mark_closed()
@@ -0,0 +1,159 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Set
+
+from gi.repository import Gst
+from pydantic import BaseModel
+from typing_extensions import Literal
+
+logger = logging.getLogger(__name__)
+
+SnapshotEvent = Literal["playing", "eos", "error", "on-demand"]
+
+# events which only make sense to capture the first time they occur
+_ONCE_EVENTS = {"playing"}
+
+
+class SnapshotConfig(BaseModel):
+    """
+    Configuration of the pipeline graph snapshots taken by :class:`.GraphSnapshotter`
+    """
+
+    # the pipeline events which trigger a snapshot: the first transition to PLAYING, end of stream,
+    # errors, and explicit requests through `StreamCompose.snapshot`
+    events: List[SnapshotEvent] = ["playing", "error", "on-demand"]
+    # the directory the DOT files are written to, defaults to `GST_DEBUG_DUMP_DOT_DIR`
+    directory: Optional[str]
+    # the minimum number of seconds between two snapshots, requests arriving in between are coalesced
+    min_interval: float = 1.0
+
+
+class GraphSnapshotter(object):
+    """
+    Serializes the graph of a pipeline to DOT files on a background thread so that snapshots never block the
+    main loop. Requests are filtered by event, rate-limited, coalesced and deduplicated: a snapshot is skipped when
+    the graph and the event are the same as those of the previous snapshot.
+    """
+
+    def __init__(self, pipeline: Gst.Pipeline, config: SnapshotConfig) -> None:
+        """
+        :param pipeline: the pipeline to take snapshots of
+        :param config: the snapshot configuration
+        """
+        self._pipeline = pipeline
+        self._config = config
+        self._directory = config.directory or os.environ.get("GST_DEBUG_DUMP_DOT_DIR")
+        self._requests: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._seen: Set[str] = set()
+        self._last_digest: Optional[str] = None
+        self._last_event: Optional[str] = None
+        self._last_time = 0.0
+        self._count = 0
+
+        if not self._directory:
+            logger.warning("Pipeline snapshots are disabled: no directory configured and GST_DEBUG_DUMP_DOT_DIR unset")
+
+    def request(self, event: str) -> bool:
+        """
+        Request a snapshot of the pipeline graph. This method only enqueues the request and returns immediately.
+
+        :param event: the event triggering the snapshot, which is also used to label the DOT file
+        :return: `True` if the request was accepted, `False` if the event is not configured or already captured
+        """
+        if not self._directory or event not in self._config.events:
+            return False
+
+        with self._lock:
+            if event in _ONCE_EVENTS:
+                if event in self._seen:
+                    return False
+                self._seen.add(event)
+
+            if not self._thread:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self._pipeline.name}-snapshots", daemon=True
+                )
+                self._thread.start()
+
+        self._requests.put(event)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Complete the pending snapshot requests and stop the background thread
+
+        :param timeout: the maximum time in seconds to wait for pending snapshots
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread:
+            self._requests.put(None)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            event = self._requests.get()
+            if event is None:
+                break
+
+            # errors are captured right away, anything else waits for the rate limit to expire
+            if event != "error":
+                delay = self._last_time + self._config.min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            # coalesce the requests which arrived in the meantime into a single snapshot, keeping errors
+            while True:
+                try:
+                    pending = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stop = True
+                elif event != "error":
+                    event = pending
+
+            self._write(event)
+
+    def _write(self, event: str) -> None:
+        self._last_time = time.monotonic()
+
+        data = Gst.debug_bin_to_dot_data(self._pipeline, Gst.DebugGraphDetails.ALL)
+        digest = hashlib.sha1(data.encode()).hexdigest()
+        if digest == self._last_digest and event == self._last_event:
+            logger.debug(f"Skipping {event} snapshot of {self._pipeline.name}: graph unchanged")
+            return
+
+        self._last_digest = digest
+        self._last_event = event
+        self._count += 1
+        filename = os.path.join(self._directory, f"{self._pipeline.name}-{self._count:03d}-{event}.dot")
+        try:
+            with open(filename, "w") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Unable to write pipeline snapshot {filename}: {e}")
+            return
+
+        logger.debug(f"Pipeline snapshot written to {filename}")
@@ -12,6 +12,7 @@
 ################################################################################
 
 from .ajavideosrc import AJAVideoSource
+from .appsrc import AppSource
 from .sourcebin import NVAggregatedSourcesBin
 from .testvideosrc import TestVideoSource
 from .uri import URISource
@@ -0,0 +1,196 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import os
+import threading
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Tuple, Union
+from uuid import uuid4
+
+import numpy as np
+from gi.repository import Gst
+from typing_extensions import Literal
+
+from monaistream.errors import BinCreationError, StreamProbeRuntimeError
+from monaistream.interface import StreamSourceComponent
+from monaistream.util.buffer import VIDEO_FORMAT_CHANNELS, VideoLayout, get_video_layout, map_buffer, video_frame_array
+
+logger = logging.getLogger(__name__)
+
+
+class AppSource(StreamSourceComponent):
+    """
+    Source component pushing frames from Python into a MONAI Stream pipeline, e.g. to replay recorded studies or to
+    benchmark a pipeline. Frames are `(height, width, channels)` `uint8` arrays provided by an iterable (such as a
+    generator, a list, or an array of frames) or read from a memory-mapped raw video file.
+
+    Frames are pushed when the `appsrc` requests data and paused when its queue is full, so an iterable is only
+    advanced as fast as the pipeline consumes frames. Each frame is copied once, straight from the array (or the
+    pages of the mapped file) into the memory of a new buffer.
+    """
+
+    def __init__(
+        self,
+        frames: Union[Iterable[np.ndarray], str, os.PathLike],
+        name: str = "",
+        shape: Optional[Tuple[int, int]] = None,
+        format: Literal["RGBA", "BGRA", "RGBx", "BGRx", "RGB", "BGR", "GRAY8"] = "RGBA",
+        framerate: int = 30,
+        is_live: bool = False,
+        max_buffers: int = 4,
+    ) -> None:
+        """
+        :param frames: an iterable of frames, or the path of a raw video file containing packed frames of `format`
+        :param name: the name to assign to this component
+        :param shape: the `(height, width)` of the frames in a raw video file, unused for iterables
+        :param format: the pixel format of the frames
+        :param framerate: the number of frames per second used to timestamp the frames
+        :param is_live: whether frames are timestamped with the pipeline clock when they are pushed (e.g. when the
+                        iterable reads a capture device) instead of from their index and `framerate`
+        :param max_buffers: the number of frames queued in the `appsrc` before pushing pauses
+        """
+        if not name:
+            name = str(uuid4().hex)
+        self._name = name
+        self._format = format
+        self._framerate = framerate
+        self._is_live = is_live
+        self._max_buffers = max_buffers
+        self._channels = VIDEO_FORMAT_CHANNELS[format]
+
+        if isinstance(frames, (str, os.PathLike)):
+            if not shape:
+                raise BinCreationError(f"The shape of the frames in {frames} is required by {self.__class__.__name__}")
+            frames = np.memmap(frames, dtype=np.uint8, mode="r").reshape(-1, *shape, self._channels)
+
+        self._frames: Iterator[np.ndarray] = iter(frames)
+        self._lock = threading.Lock()
+        self._enough_data = False
+        self._eos = False
+        self._layout: Optional[VideoLayout] = None
+        self._buffer_size = 0
+        self._num_frames = 0
+
+    def initialize(self):
+        """
+        Initialize the `appsrc` GStreamer element wrapped by this component. The caps of the `appsrc` are determined
+        from the first frame.
+        """
+        appsrc = Gst.ElementFactory.make("appsrc", self.get_name())
+        if not appsrc:
+            raise BinCreationError(f"Unable to create {self.__class__.__name__} {self.get_name()}")
+
+        try:
+            first_frame = next(self._frames)
+        except StopIteration:
+            raise BinCreationError(f"No frames provided to {self.__class__.__name__} {self.get_name()}")
+        self._frames = chain((first_frame,), self._frames)
+
+        height, width = first_frame.shape[:2]
+        caps = Gst.Caps.from_string(
+            f"video/x-raw,format={self._format},width={width},height={height},framerate={self._framerate}/1"
+        )
+        self._layout = get_video_layout(caps)
+        self._buffer_size = self._layout.offset + self._layout.strides[0] * height
+
+        self._appsrc = appsrc
+        self._appsrc.set_property("caps", caps)
+        self._appsrc.set_property("format", Gst.Format.TIME)
+        self._appsrc.set_property("is-live", self._is_live)
+        self._appsrc.set_property("do-timestamp", self._is_live)
+        self._appsrc.set_property("max-bytes", self._buffer_size * self._max_buffers)
+        self._appsrc.connect("need-data", self._on_need_data)
+        self._appsrc.connect("enough-data", self._on_enough_data)
+
+    def get_gst_element(self):
+        """
+        Return the raw GStreamer `appsrc` element
+
+        :return: `appsrc` `Gst.Element`
+        """
+        return (self._appsrc,)
+
+    def get_name(self):
+        """
+        Get the assigned name of the component
+
+        :return: the name of the component as `str`
+        """
+        return f"{self._name}-appsource"
+
+    def is_live(self) -> bool:
+        """
+        Determine if the source is live
+
+        :return: the `is_live` value provided in the constructor
+        """
+        return self._is_live
+
+    def get_num_frames(self) -> int:
+        """
+        Get the number of frames pushed into the pipeline so far
+
+        :return: the number of frames
+        """
+        return self._num_frames
+
+    def _on_need_data(self, appsrc: Gst.Element, length: int) -> None:
+        # frames are pushed until the queue of the `appsrc` is full, which emits `enough-data` from `push-buffer`
+        with self._lock:
+            self._enough_data = False
+            while not self._enough_data and not self._eos:
+                frame = next(self._frames, None)
+                if frame is None:
+                    self._eos = True
+                    appsrc.emit("end-of-stream")
+                    break
+
+                try:
+                    buffer = self._make_buffer(frame)
+                except Exception as e:
+                    logger.exception(e)
+                    self._eos = True
+                    appsrc.emit("end-of-stream")
+                    break
+
+                flow = appsrc.emit("push-buffer", buffer)
+                if flow != Gst.FlowReturn.OK:
+                    logger.warning(f"{self.get_name()} stopped pushing frames: {flow.value_nick}")
+                    self._eos = True
+                    break
+
+    def _on_enough_data(self, appsrc: Gst.Element) -> None:
+        self._enough_data = True
+
+    def _make_buffer(self, frame: np.ndarray) -> Gst.Buffer:
+        layout = self._layout
+        if frame.ndim == 2:
+            frame = frame[..., np.newaxis]
+        if frame.shape != layout.shape or frame.dtype != np.uint8:
+            raise StreamProbeRuntimeError(
+                f"Frame of shape {frame.shape} and type {frame.dtype} does not match {layout.shape} uint8 frames"
+            )
+
+        buffer = Gst.Buffer.new_allocate(None, self._buffer_size, None)
+        with map_buffer(buffer, writable=True) as (address, size):
+            # the copy honors the stride GStreamer expects, which may pad the rows of the frame
+            np.copyto(video_frame_array(address, size, layout), frame)
+
+        if not self._is_live:
+            duration = Gst.SECOND // self._framerate
+            buffer.pts = buffer.dts = self._num_frames * duration
+            buffer.duration = duration
+        buffer.offset = self._num_frames
+        self._num_frames += 1
+        return buffer
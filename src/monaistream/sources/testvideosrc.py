@@ -72,4 +72,9 @@ class TestVideoSource(StreamSourceComponent):
         return f"{self._name}-testvideosource"
 
     def is_live(self) -> bool:
-        return False
+        """
+        Determine if the test source behaves like a live source
+
+        :return: the `is_live` value provided in the constructor
+        """
+        return self._is_live
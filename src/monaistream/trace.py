@@ -0,0 +1,220 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from gi.repository import Gst
+
+from monaistream.interface import BranchingComponent, StreamComponent
+
+logger = logging.getLogger(__name__)
+
+END_TO_END = "end-to-end"
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Summarize a sequence of latency samples
+
+    :param samples: latency samples in milliseconds
+    :return: a dictionary with the `count`, `mean`, `p50`, `p95` and `p99` of the samples
+    """
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+
+    def percentile(q: float) -> float:
+        # linear interpolation between the closest ranks
+        rank = (len(ordered) - 1) * q
+        lower = int(rank)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+class _Timeline(object):
+    """
+    Pairs entry and exit timestamps of buffers (keyed by PTS) and keeps a window of the resulting latencies
+    """
+
+    def __init__(self, window: int, max_pending: int) -> None:
+        self.entries: "OrderedDict[int, float]" = OrderedDict()
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.frames = 0
+        self._max_pending = max_pending
+
+    def enter(self, pts: int, now: float) -> None:
+        self.entries[pts] = now
+        # frames dropped inside the component never exit, so forget the oldest entries
+        while len(self.entries) > self._max_pending:
+            self.entries.popitem(last=False)
+
+    def exit(self, pts: int, now: float) -> None:
+        start = self.entries.pop(pts, None)
+        if start is None:
+            return
+        self.samples.append((now - start) * 1e3)
+        self.frames += 1
+
+
+class LatencyTracer(object):
+    """
+    Records the time each buffer spends inside the components of a pipeline by attaching buffer probes to the
+    pads at the boundaries of each component. Buffers are matched on entry and exit by their PTS.
+
+    A branching component is timed separately for each of its branches, from its entry to the queue feeding the
+    branch, under the name `<component>/<branch>`.
+    """
+
+    def __init__(self, window: int = 10000, max_pending: int = 1000) -> None:
+        """
+        :param window: the number of most recent latency samples kept per component
+        :param max_pending: the number of buffers which may be in flight inside a component before the oldest
+                            unmatched entries are discarded
+        """
+        self._window = window
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._timelines: "OrderedDict[str, _Timeline]" = OrderedDict()
+        self._timelines[END_TO_END] = _Timeline(window, max_pending)
+
+    def attach(self, component: StreamComponent, is_source: bool = False, is_sink: bool = False) -> None:
+        """
+        Attach the tracing probes to the pads of a component which has already been added and linked to a pipeline
+
+        :param component: the component to trace
+        :param is_source: whether buffers leaving this component should start the end-to-end measurement
+        :param is_sink: whether buffers entering this component should stop the end-to-end measurement
+        """
+        if not is_source:
+            self.attach_entry(component, is_sink)
+
+        exits = self._get_exits(component)
+        with self._lock:
+            for name in exits:
+                self._timelines.setdefault(name, _Timeline(self._window, self._max_pending))
+
+        for name, element in exits.items():
+            exit_pad = element.get_static_pad("src")
+            if exit_pad:
+                exit_pad.add_probe(Gst.PadProbeType.BUFFER, self._probe_exit, (name, is_source))
+            elif not is_sink:
+                logger.debug(f"Unable to trace the exit of {name}: no source pad")
+
+    def attach_entry(self, component: StreamComponent, is_sink: bool = False) -> None:
+        """
+        Attach the probe recording buffers entering a component, e.g. again after its upstream peer was replaced
+
+        :param component: the component to trace
+        :param is_sink: whether buffers entering this component should stop the end-to-end measurement
+        """
+        names = tuple(self._get_exits(component))
+        with self._lock:
+            for name in names:
+                self._timelines.setdefault(name, _Timeline(self._window, self._max_pending))
+
+        # the entry timestamp is taken on the upstream peer of the first element's sink pad so that it precedes
+        # any probes the component itself installs on its sink pad (e.g. the callback in `TransformChainComponent`)
+        sinkpad = component.get_gst_element()[0].get_static_pad("sink")
+        entry_pad = sinkpad.get_peer() if sinkpad else None
+        if entry_pad:
+            entry_pad.add_probe(Gst.PadProbeType.BUFFER, self._probe_entry, (names, is_sink))
+        else:
+            logger.debug(f"Unable to trace the entry of {component.get_name()}: no linked sink pad")
+
+    @staticmethod
+    def _get_exits(component: StreamComponent) -> "OrderedDict[str, Gst.Element]":
+        # the timelines of a component and the elements whose source pad ends them
+        if isinstance(component, BranchingComponent):
+            return OrderedDict(
+                (f"{component.get_name()}/{branch_name}", component.get_branch_queue(branch_name))
+                for branch_name in component.get_branches()
+            )
+        return OrderedDict([(component.get_name(), component.get_gst_element()[-1])])
+
+    def _probe_entry(self, pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: tuple):
+        now = time.perf_counter()
+        names, is_sink = user_data
+        buffer = info.get_buffer()
+        if buffer and buffer.pts != Gst.CLOCK_TIME_NONE:
+            with self._lock:
+                for name in names:
+                    self._timelines[name].enter(buffer.pts, now)
+                if is_sink:
+                    self._timelines[END_TO_END].exit(buffer.pts, now)
+        return Gst.PadProbeReturn.OK
+
+    def _probe_exit(self, pad: Gst.Pad, info: Gst.PadProbeInfo, user_data: tuple):
+        now = time.perf_counter()
+        name, is_source = user_data
+        buffer = info.get_buffer()
+        if buffer and buffer.pts != Gst.CLOCK_TIME_NONE:
+            with self._lock:
+                self._timelines[name].exit(buffer.pts, now)
+                if is_source:
+                    self._timelines[END_TO_END].enter(buffer.pts, now)
+        return Gst.PadProbeReturn.OK
+
+    def get_samples(self, name: str = END_TO_END) -> List[float]:
+        """
+        Get the most recent latency samples recorded for a component
+
+        :param name: the name of the component, or `"end-to-end"` for the latency across the whole pipeline
+        :return: a list of latencies in milliseconds
+        """
+        with self._lock:
+            timeline = self._timelines.get(name)
+            return list(timeline.samples) if timeline else []
+
+    def get_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the latency percentiles of every traced component plus the end-to-end latency
+
+        :return: a dictionary mapping component names (and `"end-to-end"`) to the output of :func:`summarize`,
+                 where `count` is the total number of frames traced rather than the size of the sample window
+        """
+        report: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for name, timeline in self._timelines.items():
+                if not timeline.frames:
+                    continue
+                report[name] = summarize(timeline.samples)
+                report[name]["count"] = timeline.frames
+        return report
+
+    def log_report(self, level: int = logging.INFO, report: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        """
+        Log the latency report of the pipeline
+
+        :param level: the logging level
+        :param report: a report previously obtained from :meth:`get_report`, by default a fresh report is generated
+        """
+        report = self.get_report() if report is None else report
+        for name, stats in report.items():
+            logger.log(
+                level,
+                f"{name}: {stats['count']} frames, p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms "
+                f"p99={stats['p99']:.3f}ms",
+            )
@@ -0,0 +1,196 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# the cache directory used when none is given, which may be overridden with the `MONAISTREAM_CACHE_DIR` variable
+DEFAULT_CACHE_DIR = os.environ.get("MONAISTREAM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "monaistream-cache"))
+
+# entries being created are staged in hidden directories, which are collected when abandoned for this long
+_STALE_STAGING_AGE = 3600.0
+
+# the names of the entries and staging directories created by the cache, anything else in its directory is kept
+_ENTRY_NAME = re.compile(r"[0-9a-f]{64}")
+_STAGING_NAME = re.compile(r"\.[0-9a-f]{64}-")
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 digest of the content of a file
+
+    :param path: the path of the file
+    :param chunk_size: the number of bytes read at once
+    :return: the hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache(object):
+    """
+    A persistent, content-addressed cache of build artifacts such as rendered configuration files or converted
+    models. Each entry is a directory named after a key derived from everything that determines its content, so
+    identical inputs share one entry across instances, pipelines and processes. Entries are staged and then renamed
+    into place, so that concurrent writers never expose partial artifacts, and the least recently used entries are
+    garbage collected. Only the entries named after a key of :meth:`make_key` are collected, so the cache may live in
+    a directory shared with other files.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_entries: int = 256, max_age: Optional[float] = None):
+        """
+        :param directory: the directory of the cache, created if it does not exist
+        :param max_entries: the maximum number of entries kept by :meth:`collect`
+        :param max_age: the time in seconds after which entries which were not used are removed by :meth:`collect`,
+                        or `None` to keep them
+        """
+        self._directory = directory
+        self._max_entries = max_entries
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Union[str, bytes]) -> str:
+        """
+        Derive the key of an entry from the parts determining its content
+
+        :param parts: strings or bytes, e.g. the digest of an input file and the options it is processed with
+        :return: a hexadecimal key
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode() if isinstance(part, str) else part
+            # the length prefix keeps ("ab", "c") and ("a", "bc") apart
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get_directory(self) -> str:
+        """
+        Get the directory of the cache
+
+        :return: the path of the directory
+        """
+        return self._directory
+
+    def get_path(self, key: str) -> str:
+        """
+        Get the path of the directory of an entry, whether it exists or not
+
+        :param key: the key of the entry
+        :return: the path of the directory
+        """
+        return os.path.join(self._directory, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Find an entry, marking it as recently used
+
+        :param key: the key of the entry
+        :return: the path of the directory of the entry, or `None` if it is not cached
+        """
+        path = self.get_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            path = None
+
+        with self._lock:
+            if path:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return path
+
+    @contextmanager
+    def create(self, key: str) -> Iterator[str]:
+        """
+        Create an entry. The artifacts are written to a staging directory which becomes the entry once the context
+        exits without error, and is discarded otherwise. If another writer created the same entry first, its
+        artifacts are kept.
+
+        :param key: the key of the entry
+        :return: a context manager yielding the staging directory
+        """
+        staging = tempfile.mkdtemp(prefix=f".{key}-", dir=self._directory)
+        try:
+            yield staging
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        try:
+            os.rename(staging, self.get_path(key))
+        except OSError:
+            # an entry with the same key, and so the same content, was created concurrently
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def collect(self) -> int:
+        """
+        Remove the least recently used entries beyond `max_entries`, the entries unused for longer than `max_age`,
+        and abandoned staging directories. Files and directories which are not named like the entries of the cache
+        are left untouched.
+
+        :return: the number of entries removed
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if not os.path.isdir(path):
+                continue
+            if _STAGING_NAME.match(name):
+                if now - mtime > _STALE_STAGING_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif _ENTRY_NAME.fullmatch(name):
+                entries.append((mtime, path))
+
+        entries.sort(reverse=True)
+        removed = 0
+        for idx, (mtime, path) in enumerate(entries):
+            if idx >= self._max_entries or (self._max_age is not None and now - mtime > self._max_age):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+
+        if removed:
+            logger.info(f"Removed {removed} entries from the artifact cache {self._directory}")
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the cache statistics
+
+        :return: a dictionary with the number of `hits` and `misses` of :meth:`lookup`
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses}
@@ -0,0 +1,198 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import ctypes
+import ctypes.util
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+from gi.repository import Gst, GstVideo
+
+from monaistream.errors import StreamProbeRuntimeError
+from monaistream.util.cache import numpy_view
+
+# number of interleaved channels of the packed 8-bit video formats which can be mapped to arrays
+VIDEO_FORMAT_CHANNELS = {
+    "RGBA": 4,
+    "BGRA": 4,
+    "ARGB": 4,
+    "ABGR": 4,
+    "RGBx": 4,
+    "BGRx": 4,
+    "xRGB": 4,
+    "xBGR": 4,
+    "RGB": 3,
+    "BGR": 3,
+    "GRAY8": 1,
+}
+
+
+class _GstMapInfo(ctypes.Structure):
+    _fields_ = [
+        ("memory", ctypes.c_void_p),
+        ("flags", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("size", ctypes.c_size_t),
+        ("maxsize", ctypes.c_size_t),
+        ("user_data", ctypes.c_void_p * 4),
+        ("_gst_reserved", ctypes.c_void_p * 4),
+    ]
+
+
+_libgst_path = ctypes.util.find_library("gstreamer-1.0")
+if not _libgst_path:
+    # `CDLL(None)` would load the symbols of the interpreter instead and fail on the first lookup
+    raise ImportError("Unable to find the GStreamer library (libgstreamer-1.0), which is required to map buffers")
+_libgst = ctypes.CDLL(_libgst_path)
+_libgst.gst_buffer_map.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo), ctypes.c_int]
+_libgst.gst_buffer_map.restype = ctypes.c_int
+_libgst.gst_buffer_unmap.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo)]
+_libgst.gst_buffer_unmap.restype = None
+_libgst.gst_buffer_peek_memory.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+_libgst.gst_buffer_peek_memory.restype = ctypes.c_void_p
+_libgst.gst_memory_map.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo), ctypes.c_int]
+_libgst.gst_memory_map.restype = ctypes.c_int
+_libgst.gst_memory_unmap.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo)]
+_libgst.gst_memory_unmap.restype = None
+_libgst.gst_mini_object_is_writable.argtypes = [ctypes.c_void_p]
+_libgst.gst_mini_object_is_writable.restype = ctypes.c_int
+
+# the streaming thread and the Python wrapper of a buffer passed to a pad probe each hold one reference: PyGObject
+# references the mini objects it wraps, which is also why `Gst.Buffer.is_writable` is never true in a probe
+_EXCLUSIVE_REFCOUNT = 2
+
+
+class VideoLayout(NamedTuple):
+    """
+    The memory layout of the first plane of a packed video frame
+    """
+
+    # the offset of the first pixel in bytes
+    offset: int
+    # the shape of the frame as `(height, width, channels)`
+    shape: Tuple[int, int, int]
+    # the strides of the frame in bytes
+    strides: Tuple[int, int, int]
+
+
+def get_video_layout(caps: Gst.Caps, buffer: Optional[Gst.Buffer] = None) -> VideoLayout:
+    """
+    Compute the memory layout of packed video frames from their caps, using the video metadata of a buffer for the
+    stride and offset when upstream elements attach it (e.g. for padded frames)
+
+    :param caps: the negotiated caps
+    :param buffer: a buffer with these caps
+    :return: the layout of the frames
+    :raises StreamProbeRuntimeError: if the caps do not describe a supported packed video format
+    """
+    structure = caps.get_structure(0)
+    video_format = structure.get_string("format")
+    channels = VIDEO_FORMAT_CHANNELS.get(video_format)
+    if not channels:
+        raise StreamProbeRuntimeError(
+            f"Unsupported video format {video_format}, expected one of {list(VIDEO_FORMAT_CHANNELS)}"
+        )
+
+    width = structure.get_int("width").value
+    height = structure.get_int("height").value
+
+    meta = GstVideo.buffer_get_video_meta(buffer) if buffer else None
+    if meta:
+        offset, stride = meta.offset[0], meta.stride[0]
+    else:
+        # the default stride of packed formats is rounded up to a multiple of 4 bytes
+        offset, stride = 0, (width * channels + 3) & ~3
+
+    return VideoLayout(offset=offset, shape=(height, width, channels), strides=(stride, channels, 1))
+
+
+def is_buffer_exclusive(buffer: Gst.Buffer) -> bool:
+    """
+    Determine whether a buffer passed to a pad probe is referenced by nothing but the streaming thread, in which
+    case its memory may be modified in place. The reference count is read through the introspected `GstMiniObject`
+    of the installed GStreamer, and is expected to include one reference held by the Python wrapper of the buffer.
+
+    :param buffer: the buffer
+    :return: `True` if the buffer is not shared with other elements (e.g. the other branches of a `tee`)
+    """
+    return buffer.mini_object.refcount <= _EXCLUSIVE_REFCOUNT
+
+
+def is_buffer_writable(buffer: Gst.Buffer) -> bool:
+    """
+    Determine whether the memory of a buffer may be modified in place: the buffer must be exclusive (see
+    :func:`is_buffer_exclusive`) and made of a single memory block which is neither read-only nor shared with other
+    buffers (e.g. copies of the buffer, or buffers of a pool or of an element duplicating buffers)
+
+    :param buffer: the buffer
+    :return: `True` if the memory of the buffer may be written
+    """
+    if not is_buffer_exclusive(buffer) or buffer.n_memory() != 1:
+        return False
+
+    # checked before wrapping the memory in Python, which references it
+    if not _libgst.gst_mini_object_is_writable(_libgst.gst_buffer_peek_memory(hash(buffer), 0)):
+        return False
+    return not buffer.peek_memory(0).mini_object.flags & int(Gst.MemoryFlags.READONLY)
+
+
+@contextmanager
+def map_buffer(buffer: Gst.Buffer, writable: bool = False) -> Iterator[Tuple[int, int]]:
+    """
+    Map the memory of a buffer without copying it. Buffers in pad probes are also referenced by their Python
+    wrapper so GStreamer never considers them writable; writable mappings instead map the memory block of the
+    buffer for writing, which GStreamer grants when the memory is neither read-only nor shared, provided nothing but
+    the streaming thread and the wrapper reference the buffer (see :func:`is_buffer_writable`). Callers holding a
+    buffer which is not writable modify a copy of it instead, e.g. from `Gst.Buffer.copy_deep`.
+
+    :param buffer: the buffer to map
+    :param writable: whether the memory will be modified
+    :return: a context manager yielding the address and size of the mapped memory
+    :raises StreamProbeRuntimeError: if the buffer cannot be mapped, or is not writable and `writable` is requested
+    """
+    map_info = _GstMapInfo()
+    if writable:
+        if not is_buffer_writable(buffer):
+            raise StreamProbeRuntimeError("Unable to modify a buffer whose memory is shared or read-only in place")
+
+        memory = _libgst.gst_buffer_peek_memory(hash(buffer), 0)
+        flags = int(Gst.MapFlags.READ) | int(Gst.MapFlags.WRITE)
+        if not _libgst.gst_memory_map(memory, ctypes.byref(map_info), flags):
+            raise StreamProbeRuntimeError("Unable to map buffer for writing")
+
+        try:
+            yield map_info.data, map_info.size
+        finally:
+            _libgst.gst_memory_unmap(memory, ctypes.byref(map_info))
+        return
+
+    if not _libgst.gst_buffer_map(hash(buffer), ctypes.byref(map_info), int(Gst.MapFlags.READ)):
+        raise StreamProbeRuntimeError("Unable to map buffer")
+
+    try:
+        yield map_info.data, map_info.size
+    finally:
+        _libgst.gst_buffer_unmap(hash(buffer), ctypes.byref(map_info))
+
+
+def video_frame_array(address: int, size: int, layout: VideoLayout) -> np.ndarray:
+    """
+    Wrap the mapped memory of a packed video frame into a `(height, width, channels)` array without copying it
+
+    :param address: the address of the mapped memory
+    :param size: the size of the mapped memory in bytes
+    :param layout: the layout of the frame
+    :return: a `uint8` array sharing the memory of the frame
+    """
+    return numpy_view(address + layout.offset, size - layout.offset, layout.shape, np.uint8, layout.strides)
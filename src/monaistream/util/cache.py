@@ -0,0 +1,99 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import ctypes
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+
+class ViewCache(object):
+    """
+    A bounded least-recently-used cache of array views wrapping memory the cache does not own, such as the
+    surfaces of a GStreamer buffer pool. Pools recycle a small set of surfaces, so keying views by the address,
+    shape, strides and data type of the memory lets every recycled surface reuse the wrappers built the first time
+    it was seen instead of allocating new ones for every frame.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        """
+        :param max_entries: the maximum number of views kept, the least recently used views are evicted first
+        """
+        self._max_entries = max_entries
+        self._views: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Get the view cached for a key, creating it with `factory` if there is none
+
+        :param key: the key of the view, typically `(address, shape, strides, dtype)`
+        :param factory: creates the view when it is not cached
+        :return: the cached or newly created view
+        """
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                self._hits += 1
+                return view
+            self._misses += 1
+
+        view = factory()
+
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > self._max_entries:
+                self._views.popitem(last=False)
+                self._evictions += 1
+
+        return view
+
+    def clear(self) -> None:
+        """
+        Drop all cached views, e.g. when the buffer pool backing them is released
+        """
+        with self._lock:
+            self._views.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the cache statistics
+
+        :return: a dictionary with the number of `hits`, `misses` and `evictions`, and the current `size`
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "evictions": self._evictions, "size": len(self._views)}
+
+
+def numpy_view(
+    address: int, size: int, shape: Sequence[int], dtype: Any, strides: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """
+    Wrap system memory at a given address into a NumPy array without copying it. This is the system memory
+    counterpart of wrapping device memory into `cupy.cuda.UnownedMemory`.
+
+    :param address: the address of the first byte of the memory
+    :param size: the size of the memory in bytes
+    :param shape: the shape of the array
+    :param dtype: the data type of the array
+    :param strides: the strides of the array in bytes, by default the array is C-contiguous
+    :return: an array sharing the memory, which must outlive it
+    """
+    memory = (ctypes.c_byte * size).from_address(address)
+    return np.ndarray(shape=tuple(shape), dtype=dtype, buffer=memory, strides=strides)
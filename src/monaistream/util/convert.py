@@ -11,13 +11,167 @@
 # limitations under the License.
 ################################################################################
 
+import importlib
+import importlib.util
+import json
 import os
 import pathlib
+import shutil
 import subprocess
-import sys
-from typing import List
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 
-import torch.onnx
+from monaistream.util.artifacts import DEFAULT_CACHE_DIR, ArtifactCache, hash_file
+
+# the directory caching converted models when no cache is given
+DEFAULT_CONVERSION_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "conversions")
+
+# the Python packages of the conversion toolchain, which are probed but never installed at run time
+TOOLCHAIN_MODULES = ("torch", "onnx", "onnx_graphsurgeon", "polygraphy", "onnxruntime", "tensorrt")
+
+# the tools required by each conversion backend
+BACKEND_REQUIREMENTS = {
+    "onnx": ("torch",),
+    "engine": ("torch", "onnx", "onnx_graphsurgeon", "polygraphy", "polygraphy-cli", "trtexec"),
+    "onnxruntime": ("onnxruntime",),
+}
+
+
+class ShapeProfile(NamedTuple):
+    """
+    An optimization profile of a TensorRT engine: the minimum, optimal and maximum shapes of each input, in the
+    order of the input names
+    """
+
+    min: List[List[int]]
+    opt: List[List[int]]
+    max: List[List[int]]
+
+
+def _find_executable(name: str, *candidates: Optional[str]) -> Optional[str]:
+    for candidate in (*candidates, shutil.which(name)):
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def probe_toolchain() -> Dict[str, Optional[str]]:
+    """
+    Locate the conversion toolchain without importing, installing or downloading anything. `trtexec` is looked up
+    in the `TRTEXEC` environment variable, the TensorRT installation directory and the `PATH`.
+
+    :return: a dictionary mapping the name of each tool to its location, or to `None` if it is unavailable
+    """
+    toolchain: Dict[str, Optional[str]] = {}
+    for module_name in TOOLCHAIN_MODULES:
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except (ImportError, ValueError):
+            spec = None
+        toolchain[module_name] = spec.origin if spec else None
+
+    toolchain["polygraphy-cli"] = _find_executable("polygraphy")
+    toolchain["trtexec"] = _find_executable("trtexec", os.environ.get("TRTEXEC"), "/usr/src/tensorrt/bin/trtexec")
+    return toolchain
+
+
+# probed once when the module is imported
+TOOLCHAIN = probe_toolchain()
+
+
+def get_available_backends(toolchain: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, List[str]]:
+    """
+    Find which conversion backends can run: `onnx` for ONNX export, `engine` for TensorRT engine builds and
+    `onnxruntime` for validating ONNX models on the CPU
+
+    :param toolchain: the toolchain found by :func:`probe_toolchain`, by default the one probed at import time
+    :return: a dictionary mapping each backend to the list of its missing tools, which is empty if it is available
+    """
+    toolchain = TOOLCHAIN if toolchain is None else toolchain
+    return {
+        backend: [tool for tool in requirements if not toolchain.get(tool)]
+        for backend, requirements in BACKEND_REQUIREMENTS.items()
+    }
+
+
+def _check_backend(backend: str) -> None:
+    missing = get_available_backends()[backend]
+    if missing:
+        raise RuntimeError(
+            f"Unable to convert models with the {backend} backend, missing {', '.join(missing)}. Install the "
+            "conversion toolchain with `pip install monaistream[convert]` and check it with `monaistream preflight`"
+        )
+
+
+def make_profiles(
+    input_sizes: List[List[int]],
+    batch_ranges: Optional[Sequence[Sequence[int]]] = None,
+    min_sizes: Optional[List[List[int]]] = None,
+    max_sizes: Optional[List[List[int]]] = None,
+) -> List[ShapeProfile]:
+    """
+    Make the optimization profiles of an engine serving a range of batch sizes, e.g. 1 to N sources aggregated by
+    :class:`monaistream.sources.NVAggregatedSourcesBin`, and optionally a range of spatial sizes
+
+    :param input_sizes: the optimal shapes of the inputs, whose batch dimension is replaced by each profile's
+    :param batch_ranges: the minimum, optimal and maximum batch sizes of each profile, by default the batch size of
+                         `input_sizes`
+    :param min_sizes: the minimum shapes of the inputs, whose batch dimension is ignored, by default `input_sizes`
+    :param max_sizes: the maximum shapes of the inputs, whose batch dimension is ignored, by default `input_sizes`
+    :return: one profile per batch range
+    :raises ValueError: if a minimum shape exceeds an optimal or maximum shape
+    """
+    min_sizes = min_sizes or input_sizes
+    max_sizes = max_sizes or input_sizes
+    batch_ranges = batch_ranges or [[input_sizes[0][0]] * 3]
+    if not len(min_sizes) == len(max_sizes) == len(input_sizes):
+        raise ValueError("The number of minimum and maximum input sizes must match the number of input sizes")
+
+    profiles = []
+    for batch_range in batch_ranges:
+        if len(batch_range) != 3:
+            raise ValueError(f"A batch range needs a minimum, an optimal and a maximum size: {batch_range}")
+        shapes = [
+            [[batch, *size[1:]] for size in sizes]
+            for batch, sizes in zip(batch_range, (min_sizes, input_sizes, max_sizes))
+        ]
+        for min_shape, opt_shape, max_shape in zip(*shapes):
+            if len(min_shape) != len(opt_shape) or len(max_shape) != len(opt_shape):
+                raise ValueError(f"Shapes {min_shape}, {opt_shape} and {max_shape} have different ranks")
+            if any(not lo <= opt <= hi for lo, opt, hi in zip(min_shape, opt_shape, max_shape)):
+                raise ValueError(f"Shapes {min_shape}, {opt_shape} and {max_shape} are not ordered")
+        profiles.append(ShapeProfile(*shapes))
+    return profiles
+
+
+def get_dynamic_axes(
+    input_names: List[str],
+    output_names: List[str],
+    input_sizes: List[List[int]],
+    dynamic_batch: bool = False,
+    dynamic_spatial: bool = False,
+) -> Dict[str, Dict[int, str]]:
+    """
+    Get the dynamic axes of an ONNX export. The batch axis is shared by all inputs and outputs, while the spatial
+    axes (after the batch and channel axes) of each input are independent.
+
+    :param input_names: the names of the inputs of the model
+    :param output_names: the names of the outputs of the model
+    :param input_sizes: the shapes of the inputs of the model, in the order of `input_names`
+    :param dynamic_batch: whether the batch axis is dynamic
+    :param dynamic_spatial: whether the spatial axes of the inputs are dynamic
+    :return: a dictionary mapping input and output names to their dynamic axes, as `torch.onnx.export` expects
+    """
+    dynamic_axes: Dict[str, Dict[int, str]] = {}
+    for name, size in zip(input_names, input_sizes):
+        axes = {0: "batch"} if dynamic_batch else {}
+        if dynamic_spatial:
+            axes.update({axis: f"{name}_dim{axis}" for axis in range(2, len(size))})
+        if axes:
+            dynamic_axes[name] = axes
+    if dynamic_batch:
+        dynamic_axes.update({name: {0: "batch"} for name in output_names})
+    return dynamic_axes
 
 
 def to_onnx(
@@ -27,7 +181,10 @@ def to_onnx(
     output_names: List[str],
     input_sizes: List[List[int]],
     do_constant_folding: bool = False,
+    dynamic_axes: Optional[Dict[str, Dict[int, str]]] = None,
 ) -> None:
+    _check_backend("onnx")
+    import torch.onnx
 
     model_inputs = []
     for input_size in input_sizes:
@@ -38,33 +195,78 @@ def to_onnx(
 
     torch.onnx.export(
         torch_model,
-        model_inputs,
+        tuple(model_inputs),
         output_model_path,
         verbose=True,
         input_names=input_names,
         output_names=output_names,
         do_constant_folding=do_constant_folding,
+        dynamic_axes=dynamic_axes or None,
     )
 
 
+def validate_onnx(
+    model_path: str,
+    input_names: List[str],
+    shapes: List[List[List[int]]],
+    dynamic_batch: bool = False,
+) -> List[Dict[str, List[int]]]:
+    """
+    Run an ONNX model on the CPU with `onnxruntime` for random inputs of each of the given shapes, e.g. the minimum,
+    optimal and maximum shapes of every optimization profile, so that shape errors surface before building engines
+
+    :param model_path: the path of the ONNX model
+    :param input_names: the names of the inputs of the model
+    :param shapes: the shapes of the inputs of each run, in the order of `input_names`
+    :param dynamic_batch: whether to check that the batch size of every output matches the batch size of the inputs
+    :return: the shapes of the outputs of each run, by output name
+    :raises RuntimeError: if the model fails to run or an output has the wrong batch size
+    """
+    _check_backend("onnxruntime")
+    import numpy as np
+    import onnxruntime
+
+    session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    output_names = [output.name for output in session.get_outputs()]
+
+    output_shapes = []
+    for input_shapes in shapes:
+        feed = {name: np.random.rand(*shape).astype(np.float32) for name, shape in zip(input_names, input_shapes)}
+        try:
+            outputs = session.run(output_names, feed)
+        except Exception as e:
+            raise RuntimeError(f"Unable to run {model_path} with input shapes {input_shapes}: {e}") from e
+
+        run_shapes = {name: list(output.shape) for name, output in zip(output_names, outputs)}
+        for name, shape in run_shapes.items():
+            if dynamic_batch and shape[0] != input_shapes[0][0]:
+                raise RuntimeError(
+                    f"Output {name} of {model_path} has a batch size of {shape[0]}, expected {input_shapes[0][0]}"
+                )
+        output_shapes.append(run_shapes)
+    return output_shapes
+
+
 def to_trt(
     input_model_path: str,
     output_model_path: str,
     explicit_batch: bool = True,
     verbose: bool = False,
     workspace: int = 1000,
-) -> None:
+    input_names: Optional[List[str]] = None,
+    profiles: Optional[List[ShapeProfile]] = None,
+) -> Dict[str, float]:
+    if profiles and (
+        input_names is None or any(len(shapes) != len(input_names) for profile in profiles for shapes in profile)
+    ):
+        raise ValueError("The shapes of every optimization profile must match `input_names`")
 
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "nvidia-pyindex"])
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "onnx"])
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "onnx-graphsurgeon"])
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "polygraphy"])
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "onnxruntime"])
+    _check_backend("engine")
 
     sfx = pathlib.Path(input_model_path).suffix
     folded_model_path = input_model_path.replace(sfx, f"_folded{sfx}")
     fold_command = [
-        "polygraphy",
+        TOOLCHAIN["polygraphy-cli"],
         "surgeon",
         "sanitize",
         f"{input_model_path}",
@@ -72,7 +274,7 @@ def to_trt(
         f"--output={folded_model_path}",
     ]
     convert_command = [
-        "/usr/src/tensorrt/bin/trtexec",
+        TOOLCHAIN["trtexec"],
         f"--onnx={folded_model_path}",
         f"--saveEngine={output_model_path}",
     ]
@@ -88,7 +290,251 @@ def to_trt(
 
     convert_command.append(f"--workspace={workspace}")
 
+    # trtexec builds one optimization profile per repetition of the shape flags
+    for profile in profiles or []:
+        for flag, shapes in (("--minShapes", profile.min), ("--optShapes", profile.opt), ("--maxShapes", profile.max)):
+            specs = [f"{name}:{'x'.join(str(dim) for dim in shape)}" for name, shape in zip(input_names, shapes)]
+            convert_command.append(f"{flag}={','.join(specs)}")
+
+    timings = {}
     print(" ".join(fold_command))
-    subprocess.run(fold_command)
-    subprocess.run(convert_command)
-    os.remove(folded_model_path)
+    start = time.perf_counter()
+    subprocess.run(fold_command, check=True)
+    timings["fold"] = time.perf_counter() - start
+    try:
+        print(" ".join(convert_command))
+        start = time.perf_counter()
+        subprocess.run(convert_command, check=True)
+        timings["build"] = time.perf_counter() - start
+    finally:
+        os.remove(folded_model_path)
+
+    return timings
+
+
+def get_toolchain_versions() -> Dict[str, str]:
+    """
+    Get the versions of the Python packages used to convert models, which determine the converted artifacts
+
+    :return: a dictionary mapping package names to their versions, or to `unavailable` when not installed
+    """
+    versions = {}
+    for module_name in ("torch", "onnx", "onnx_graphsurgeon", "polygraphy", "tensorrt"):
+        if not TOOLCHAIN[module_name]:
+            versions[module_name] = "unavailable"
+            continue
+        try:
+            versions[module_name] = str(getattr(importlib.import_module(module_name), "__version__", "unknown"))
+        except ImportError:
+            versions[module_name] = "unavailable"
+    return versions
+
+
+def convert(
+    input_model_path: str,
+    output_model_path: str,
+    input_names: List[str],
+    output_names: List[str],
+    input_sizes: List[List[int]],
+    workspace: int = 1000,
+    dynamic_batch: bool = False,
+    dynamic_spatial: bool = False,
+    profiles: Optional[List[ShapeProfile]] = None,
+    validate: bool = False,
+) -> Dict[str, float]:
+    """
+    Convert a TorchScript model to ONNX, or to a TensorRT engine through ONNX, depending on the extension of
+    `output_model_path` (`.onnx` or `.engine`)
+
+    :param input_model_path: the path of the TorchScript model
+    :param output_model_path: the path of the converted model
+    :param input_names: the names of the inputs of the model
+    :param output_names: the names of the outputs of the model
+    :param input_sizes: the shapes of the inputs of the model, in the order of `input_names`
+    :param workspace: the workspace size of TensorRT in MB
+    :param dynamic_batch: whether to export the batch axis as dynamic, so one model serves any batch size
+    :param dynamic_spatial: whether to export the spatial axes of the inputs as dynamic
+    :param profiles: the optimization profiles of the engine, see :func:`make_profiles`, by default a single
+                     profile of `input_sizes` when any axis is dynamic
+    :param validate: whether to run the ONNX model on the CPU for the shapes of every profile before returning it
+                     or building the engine, see :func:`validate_onnx`
+    :return: the wall time in seconds of each stage of the conversion: `export`, `validate` if requested, and
+             `fold` and `build` for engines
+    """
+    dynamic_axes = get_dynamic_axes(input_names, output_names, input_sizes, dynamic_batch, dynamic_spatial)
+    # static models have no optimization profiles
+    if not dynamic_axes:
+        profiles = None
+    elif not profiles:
+        profiles = make_profiles(input_sizes)
+
+    is_engine = not output_model_path.endswith(".onnx")
+    onnx_model_path = output_model_path
+    if is_engine:
+        onnx_model_path = output_model_path.replace(pathlib.Path(output_model_path).suffix, "") + ".onnx"
+
+    start = time.perf_counter()
+    to_onnx(
+        input_model_path=input_model_path,
+        output_model_path=onnx_model_path,
+        input_names=input_names,
+        output_names=output_names,
+        input_sizes=input_sizes,
+        do_constant_folding=is_engine,
+        dynamic_axes=dynamic_axes,
+    )
+    timings = {"export": time.perf_counter() - start}
+
+    try:
+        if validate:
+            start = time.perf_counter()
+            shapes = [input_sizes]
+            for profile in profiles or []:
+                for profile_shapes in profile:
+                    if profile_shapes not in shapes:
+                        shapes.append(profile_shapes)
+            validate_onnx(onnx_model_path, input_names, shapes, dynamic_batch)
+            timings["validate"] = time.perf_counter() - start
+
+        if is_engine:
+            timings.update(
+                to_trt(
+                    input_model_path=onnx_model_path,
+                    output_model_path=output_model_path,
+                    workspace=workspace,
+                    input_names=input_names,
+                    profiles=profiles,
+                )
+            )
+    finally:
+        if is_engine:
+            os.remove(onnx_model_path)
+    return timings
+
+
+def get_conversion_key(
+    input_model_path: str,
+    output_format: str,
+    input_names: List[str],
+    output_names: List[str],
+    input_sizes: List[List[int]],
+    workspace: int = 1000,
+    toolchain_versions: Optional[Dict[str, str]] = None,
+    dynamic_batch: bool = False,
+    dynamic_spatial: bool = False,
+    profiles: Optional[List[ShapeProfile]] = None,
+    validate: bool = False,
+) -> str:
+    """
+    Derive the key of a converted model in the conversion cache from everything which determines its content
+
+    :param input_model_path: the path of the TorchScript model
+    :param output_format: the extension of the converted model, `.onnx` or `.engine`
+    :param input_names: the names of the inputs of the model
+    :param output_names: the names of the outputs of the model
+    :param input_sizes: the shapes of the inputs of the model, in the order of `input_names`
+    :param workspace: the workspace size of TensorRT in MB
+    :param toolchain_versions: the versions of the conversion toolchain, see :func:`get_toolchain_versions`
+    :param dynamic_batch: whether the batch axis is exported as dynamic
+    :param dynamic_spatial: whether the spatial axes of the inputs are exported as dynamic
+    :param profiles: the optimization profiles of the engine
+    :param validate: whether the ONNX model is validated for the shapes of every profile, validated models are
+                     cached apart from the others
+    :return: the key of the converted model
+    """
+    is_engine = output_format == ".engine"
+    options = {
+        "format": output_format,
+        "inputs": [[name, list(size)] for name, size in zip(input_names, input_sizes)],
+        "outputs": list(output_names),
+        "dynamic_axes": get_dynamic_axes(input_names, output_names, input_sizes, dynamic_batch, dynamic_spatial),
+        # constant folding is only done when building engines, whose workspace and profiles shape the engine
+        "do_constant_folding": is_engine,
+        "workspace": workspace if is_engine else None,
+        # the profiles also determine the shapes the model is validated for
+        "profiles": [profile._asdict() for profile in profiles or []] if is_engine or validate else None,
+        "validate": validate,
+        "toolchain": toolchain_versions or get_toolchain_versions(),
+    }
+    return ArtifactCache.make_key(hash_file(input_model_path), json.dumps(options, sort_keys=True))
+
+
+def convert_cached(
+    input_model_path: str,
+    output_model_path: str,
+    input_names: List[str],
+    output_names: List[str],
+    input_sizes: List[List[int]],
+    workspace: int = 1000,
+    cache: Optional[ArtifactCache] = None,
+    dynamic_batch: bool = False,
+    dynamic_spatial: bool = False,
+    profiles: Optional[List[ShapeProfile]] = None,
+    validate: bool = False,
+) -> Tuple[bool, Dict[str, float]]:
+    """
+    Convert a model like :func:`convert`, reusing the converted model from a persistent cache when the same model
+    was converted with the same shapes, options and toolchain before. Whether the model is validated is part of the
+    key of the cache, so a model converted without validation is never returned when validation is requested.
+
+    :param input_model_path: the path of the TorchScript model
+    :param output_model_path: the path of the converted model
+    :param input_names: the names of the inputs of the model
+    :param output_names: the names of the outputs of the model
+    :param input_sizes: the shapes of the inputs of the model, in the order of `input_names`
+    :param workspace: the workspace size of TensorRT in MB
+    :param cache: the cache of converted models, by default in `DEFAULT_CONVERSION_CACHE_DIR`
+    :param dynamic_batch: whether to export the batch axis as dynamic
+    :param dynamic_spatial: whether to export the spatial axes of the inputs as dynamic
+    :param profiles: the optimization profiles of the engine, see :func:`make_profiles`
+    :param validate: whether to run the ONNX model on the CPU for the shapes of every profile when converting it
+    :return: a tuple of `True` if the converted model was found in the cache, `False` if it was converted, and
+             the wall time of each stage of the conversion as returned by :func:`convert`, empty on cache hits
+    """
+    output_format = pathlib.Path(output_model_path).suffix
+    if not get_dynamic_axes(input_names, output_names, input_sizes, dynamic_batch, dynamic_spatial):
+        profiles = None
+    elif not profiles:
+        profiles = make_profiles(input_sizes)
+    key = get_conversion_key(
+        input_model_path,
+        output_format,
+        input_names,
+        output_names,
+        input_sizes,
+        workspace,
+        dynamic_batch=dynamic_batch,
+        dynamic_spatial=dynamic_spatial,
+        profiles=profiles,
+        validate=validate,
+    )
+    artifact_name = f"model{output_format}"
+
+    if cache is None:
+        cache = ArtifactCache(DEFAULT_CONVERSION_CACHE_DIR, max_entries=32)
+
+    entry = cache.lookup(key)
+    hit = entry is not None
+    timings: Dict[str, float] = {}
+    if not hit:
+        with cache.create(key) as staging:
+            timings = convert(
+                input_model_path=input_model_path,
+                output_model_path=os.path.join(staging, artifact_name),
+                input_names=input_names,
+                output_names=output_names,
+                input_sizes=input_sizes,
+                workspace=workspace,
+                dynamic_batch=dynamic_batch,
+                dynamic_spatial=dynamic_spatial,
+                profiles=profiles,
+                validate=validate,
+            )
+            # the conversion tools may fail without raising, which must not leave an empty entry behind
+            if not os.path.isfile(os.path.join(staging, artifact_name)):
+                raise RuntimeError(f"Unable to convert {input_model_path} to {output_format}")
+        cache.collect()
+        entry = cache.get_path(key)
+
+    shutil.copyfile(os.path.join(entry, artifact_name), output_model_path)
+    return hit, timings
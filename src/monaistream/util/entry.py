@@ -1,12 +1,19 @@
 import argparse
 import logging
-import os
-import pathlib
 from typing import Any, List
 
-from monaistream.util.convert import to_onnx, to_trt
+from monaistream.util.artifacts import ArtifactCache
+from monaistream.util.convert import (
+    BACKEND_REQUIREMENTS,
+    DEFAULT_CONVERSION_CACHE_DIR,
+    TOOLCHAIN,
+    convert,
+    convert_cached,
+    get_available_backends,
+    make_profiles,
+)
 
-CMD_ACTIONS = ["convert"]
+CMD_ACTIONS = ["convert", "preflight"]
 
 
 class Entry:
@@ -48,8 +55,65 @@ class Entry:
                 ),
             )
             conv_parser.add_argument("-w", "--workspace", type=int, default=1000)
+            conv_parser.add_argument(
+                "--dynamic_batch", action="store_true", help="Export the batch axis as dynamic, implied by profiles"
+            )
+            conv_parser.add_argument(
+                "--dynamic_spatial", action="store_true", help="Export the spatial axes of the inputs as dynamic"
+            )
+            conv_parser.add_argument(
+                "-P",
+                "--batch_profile",
+                type=int,
+                nargs=3,
+                action="append",
+                metavar=("MIN", "OPT", "MAX"),
+                help="The batch sizes of an optimization profile of the engine, which may be repeated",
+            )
+            conv_parser.add_argument(
+                "--min_input_size",
+                type=int,
+                nargs="+",
+                action="append",
+                help="The minimum shapes of the inputs with `--dynamic_spatial`, whose batch dimension is ignored",
+            )
+            conv_parser.add_argument(
+                "--max_input_size",
+                type=int,
+                nargs="+",
+                action="append",
+                help="The maximum shapes of the inputs with `--dynamic_spatial`, whose batch dimension is ignored",
+            )
+            conv_parser.add_argument(
+                "--validate",
+                action="store_true",
+                help="Run the exported model on the CPU with onnxruntime for the shapes of every profile",
+            )
+            conv_parser.add_argument(
+                "--cache_dir",
+                default=DEFAULT_CONVERSION_CACHE_DIR,
+                help="The directory caching converted models, keyed by model content, shapes, options and toolchain; "
+                "only the entries of the cache are ever removed from it",
+            )
+            conv_parser.add_argument(
+                "--no_cache", action="store_true", help="Convert the model without looking up or filling the cache"
+            )
             conv_parser.set_defaults(action="convert")
 
+        if CMD_ACTIONS[1] in self.actions:
+            preflight_parser = subparsers.add_parser(
+                "preflight", help="Report the model conversion backends available, without network access"
+            )
+            preflight_parser.add_argument(
+                "-r",
+                "--require",
+                nargs="+",
+                default=[],
+                choices=list(BACKEND_REQUIREMENTS),
+                help="The backends which must be available for the command to succeed",
+            )
+            preflight_parser.set_defaults(action="preflight")
+
         return parser
 
     def action_convert(self, args):
@@ -65,33 +129,49 @@ class Entry:
             print(f"Output model must be ONNX (.onnx) or TRT (.engine): {args.output_model}")
             exit(1)
 
-        if args.input_model.endswith(".onnx"):
-            to_onnx(
-                input_model_path=args.input_model,
-                output_model_path=args.output_model,
-                input_names=args.model_inputs,
-                output_names=args.model_outputs,
-                input_sizes=args.input_size,
-                do_constant_folding=False,
-            )
+        if (args.min_input_size or args.max_input_size) and not args.dynamic_spatial:
+            print("The minimum and maximum input sizes require `--dynamic_spatial`")
+            exit(1)
+
+        try:
+            profiles = make_profiles(args.input_size, args.batch_profile, args.min_input_size, args.max_input_size)
+        except ValueError as e:
+            print(e)
+            exit(1)
+
+        convert_args = dict(
+            input_model_path=args.input_model,
+            output_model_path=args.output_model,
+            input_names=args.model_inputs,
+            output_names=args.model_outputs,
+            input_sizes=args.input_size,
+            workspace=args.workspace,
+            dynamic_batch=args.dynamic_batch or bool(args.batch_profile),
+            dynamic_spatial=args.dynamic_spatial,
+            profiles=profiles,
+            validate=args.validate,
+        )
+        if args.no_cache:
+            timings = convert(**convert_args)
         else:
-            tmp_onnx_file = args.output_model.replace(pathlib.Path(args.output_model).suffix, "") + ".onnx"
-            to_onnx(
-                input_model_path=args.input_model,
-                output_model_path=tmp_onnx_file,
-                input_names=args.model_inputs,
-                output_names=args.model_outputs,
-                input_sizes=args.input_size,
-                do_constant_folding=True,
-            )
-            try:
-                to_trt(
-                    input_model_path=tmp_onnx_file,
-                    output_model_path=args.output_model,
-                    workspace=args.workspace,
-                )
-            finally:
-                os.remove(tmp_onnx_file)
+            cache = ArtifactCache(args.cache_dir, max_entries=32)
+            hit, timings = convert_cached(cache=cache, **convert_args)
+            print(f"Conversion cache {'hit' if hit else 'miss'} in {cache.get_directory()}: {args.output_model}")
+
+        for stage, elapsed in timings.items():
+            print(f"{stage:<8} {elapsed:8.2f} s")
+
+    def action_preflight(self, args):
+        for tool, location in TOOLCHAIN.items():
+            print(f"{tool:<20} {location or 'not found'}")
+        print()
+
+        backends = get_available_backends()
+        for backend, missing in backends.items():
+            print(f"{backend:<20} {'missing ' + ', '.join(missing) if missing else 'available'}")
+
+        if any(backends[backend] for backend in args.require):
+            exit(1)
 
     def run(self):
         parser = self.create_parser()
@@ -103,6 +183,8 @@ class Entry:
 
         if args.action == CMD_ACTIONS[0]:
             self.action_convert(args)
+        elif args.action == CMD_ACTIONS[1]:
+            self.action_preflight(args)
         else:
             parser.print_help()
             exit(-1)
@@ -0,0 +1,316 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import sys
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+# the ring starts with a header followed by `num_slots` slots, each made of a slot header and the frame data
+RING_MAGIC = 0x4D535452
+RING_VERSION = 1
+_ALIGNMENT = 64
+
+_RING_HEADER = np.dtype(
+    [
+        ("magic", "<u4"),
+        ("version", "<u4"),
+        ("num_slots", "<u4"),
+        ("closed", "<u4"),
+        ("slot_size", "<u8"),
+        # the number of frames completely written to the ring
+        ("write_seq", "<u8"),
+    ]
+)
+
+_SLOT_HEADER = np.dtype(
+    [
+        # a sequence lock: odd while the slot is being written, `2 * (frame + 1)` once frame `frame` is complete
+        ("lock", "<u8"),
+        ("frame", "<u8"),
+        ("pts", "<u8"),
+        ("duration", "<u8"),
+        ("height", "<u4"),
+        ("width", "<u4"),
+        ("channels", "<u4"),
+        ("reserved", "<u4"),
+        ("size", "<u8"),
+    ]
+)
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _attach(name: str) -> SharedMemory:
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    memory = SharedMemory(name=name)
+    # attaching registers the memory with the resource tracker of the reader, which would otherwise unlink it from
+    # under the writer when the reader exits (https://bugs.python.org/issue39959)
+    resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class _RingLayout(object):
+    # structured views of the header, slot headers and slot data of a ring
+    def __init__(self, memory: SharedMemory, num_slots: int, slot_size: int) -> None:
+        slot_stride = _align(_SLOT_HEADER.itemsize) + _align(slot_size)
+        self.header = np.ndarray((), dtype=_RING_HEADER, buffer=memory.buf)
+        self.slots = np.ndarray(
+            (num_slots,), dtype=_SLOT_HEADER, buffer=memory.buf, offset=_ALIGNMENT, strides=(slot_stride,)
+        )
+        self.data = np.ndarray(
+            (num_slots, slot_size),
+            dtype=np.uint8,
+            buffer=memory.buf,
+            offset=_ALIGNMENT + _align(_SLOT_HEADER.itemsize),
+            strides=(slot_stride, 1),
+        )
+
+    @staticmethod
+    def get_size(num_slots: int, slot_size: int) -> int:
+        return _ALIGNMENT + num_slots * (_align(_SLOT_HEADER.itemsize) + _align(slot_size))
+
+
+class SharedMemoryFrame(NamedTuple):
+    """
+    A frame read from a shared memory ring
+    """
+
+    # the index of the frame in the stream
+    frame: int
+    # the presentation timestamp and duration of the frame in nanoseconds
+    pts: int
+    duration: int
+    # the `(height, width, channels)` `uint8` frame
+    array: np.ndarray
+
+
+class SharedMemoryRingWriter(object):
+    """
+    Publishes frames into a named shared memory ring holding a fixed number of slots, which any number of
+    :class:`SharedMemoryRingReader` in other processes read without serialization. The writer never waits for
+    readers: once the ring is full the oldest slot is overwritten, and readers detect it through the sequence lock
+    of each slot.
+    """
+
+    def __init__(self, name: str, num_slots: int, slot_size: int) -> None:
+        """
+        :param name: the name of the shared memory, which readers use to attach to the ring
+        :param num_slots: the number of frames held by the ring
+        :param slot_size: the maximum size of a frame in bytes
+        """
+        self._memory = SharedMemory(name=name, create=True, size=_RingLayout.get_size(num_slots, slot_size))
+        self._layout = _RingLayout(self._memory, num_slots, slot_size)
+        self._num_slots = num_slots
+        self._slot_size = slot_size
+
+        header = self._layout.header
+        header["magic"], header["version"] = RING_MAGIC, RING_VERSION
+        header["num_slots"], header["slot_size"] = num_slots, slot_size
+        header["closed"], header["write_seq"] = 0, 0
+
+    @property
+    def name(self) -> str:
+        """
+        The name of the shared memory
+        """
+        return self._memory.name
+
+    def write(self, frame: np.ndarray, pts: int = 0, duration: int = 0) -> int:
+        """
+        Copy a frame into the next slot of the ring
+
+        :param frame: a `(height, width, channels)` `uint8` array, which may be strided (e.g. padded rows)
+        :param pts: the presentation timestamp of the frame in nanoseconds
+        :param duration: the duration of the frame in nanoseconds
+        :return: the index of the frame in the stream
+        :raises ValueError: if the frame is larger than the slots of the ring
+        """
+        if frame.nbytes > self._slot_size:
+            raise ValueError(f"Frame of {frame.nbytes} bytes exceeds the {self._slot_size} bytes slots of {self.name}")
+
+        header = self._layout.header
+        index = int(header["write_seq"])
+        slot = self._layout.slots[index % self._num_slots]
+
+        slot["lock"] = 2 * index + 1
+        slot["frame"], slot["pts"], slot["duration"] = index, pts, duration
+        slot["height"], slot["width"], slot["channels"] = frame.shape
+        slot["size"] = frame.nbytes
+        np.copyto(self._layout.data[index % self._num_slots, : frame.nbytes].reshape(frame.shape), frame)
+        slot["lock"] = 2 * index + 2
+
+        header["write_seq"] = index + 1
+        return index
+
+    def mark_closed(self) -> None:
+        """
+        Signal the end of the stream to the readers, which stop once they have read the remaining frames
+        """
+        self._layout.header["closed"] = 1
+
+    def close(self, unlink: bool = True) -> None:
+        """
+        Release the ring. Readers already attached keep their mapping of the memory.
+
+        :param unlink: whether to remove the name of the shared memory, so no other reader can attach
+        """
+        self._layout = None
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+
+
+class SharedMemoryRingReader(object):
+    """
+    Reads the frames published by a :class:`SharedMemoryRingWriter`, possibly in another process. A reader that
+    falls more than the number of slots behind the writer loses the overwritten frames, which are counted and
+    skipped.
+    """
+
+    def __init__(
+        self, name: str, timeout: float = 10.0, from_start: bool = False, poll_interval: float = 0.001
+    ) -> None:
+        """
+        :param name: the name of the shared memory of the ring
+        :param timeout: the maximum time in seconds to wait for the writer to create the ring
+        :param from_start: whether to start with the oldest frame still held by the ring instead of the next frame
+        :param poll_interval: the time in seconds between checks for new frames
+        :raises FileNotFoundError: if the ring was not created within `timeout`
+        :raises ValueError: if the shared memory does not hold a ring
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._memory = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(poll_interval)
+
+        header = np.ndarray((), dtype=_RING_HEADER, buffer=self._memory.buf)
+        if header["magic"] != RING_MAGIC or header["version"] != RING_VERSION:
+            del header
+            self._memory.close()
+            raise ValueError(f"Shared memory {name} does not hold a version {RING_VERSION} frame ring")
+
+        self._num_slots = int(header["num_slots"])
+        self._layout = _RingLayout(self._memory, self._num_slots, int(header["slot_size"]))
+        del header
+
+        write_seq = int(self._layout.header["write_seq"])
+        self._next = max(write_seq - self._num_slots, 0) if from_start else write_seq
+        self._poll_interval = poll_interval
+        self._frames = 0
+        self._overwrites = 0
+
+    @property
+    def lag(self) -> int:
+        """
+        The number of frames written to the ring but not read yet
+        """
+        return int(self._layout.header["write_seq"]) - self._next
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get statistics of the frames read
+
+        :return: a dictionary with the number of `frames` read, the number of `overwrites` (frames lost because the
+                 writer reused their slot before they were read), and the current `lag`
+        """
+        return {"frames": self._frames, "overwrites": self._overwrites, "lag": self.lag}
+
+    def read(self, timeout: Optional[float] = None, copy: bool = True) -> Optional[SharedMemoryFrame]:
+        """
+        Read the next frame, waiting for the writer if there is none
+
+        :param timeout: the maximum time in seconds to wait, or `None` to wait until a frame or the end of the
+                        stream arrives
+        :param copy: whether to copy the frame out of the ring; otherwise the array is a view of the slot which is
+                     only valid until the writer reuses it, see :meth:`is_valid`
+        :return: the frame, or `None` once the writer closed the stream and every frame was read
+        :raises TimeoutError: if no frame was written within `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        header = self._layout.header
+
+        while True:
+            write_seq = int(header["write_seq"])
+            if self._next < write_seq:
+                if write_seq - self._next > self._num_slots:
+                    # the slots of the oldest unread frames were reused
+                    self._overwrites += write_seq - self._num_slots - self._next
+                    self._next = write_seq - self._num_slots
+
+                frame = self._read_slot(self._next, copy)
+                self._next += 1
+                if frame is None:
+                    self._overwrites += 1
+                    continue
+
+                self._frames += 1
+                return frame
+
+            if header["closed"]:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"No frame written to {self._memory.name} within {timeout}s")
+            time.sleep(self._poll_interval)
+
+    def is_valid(self, frame: SharedMemoryFrame) -> bool:
+        """
+        Determine whether the view of a frame read with `copy=False` still holds that frame
+
+        :param frame: the frame
+        :return: `False` once the writer started reusing the slot of the frame
+        """
+        return int(self._layout.slots[frame.frame % self._num_slots]["lock"]) == 2 * frame.frame + 2
+
+    def __iter__(self) -> Iterator[SharedMemoryFrame]:
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def close(self) -> None:
+        """
+        Detach from the ring. Views of frames read with `copy=False` must be released first.
+        """
+        self._layout = None
+        self._memory.close()
+
+    def _read_slot(self, index: int, copy: bool) -> Optional[SharedMemoryFrame]:
+        slot = self._layout.slots[index % self._num_slots]
+        lock = int(slot["lock"])
+        if lock != 2 * index + 2:
+            return None
+
+        shape = (int(slot["height"]), int(slot["width"]), int(slot["channels"]))
+        pts, duration = int(slot["pts"]), int(slot["duration"])
+        array = self._layout.data[index % self._num_slots, : int(slot["size"])].reshape(shape)
+        if copy:
+            array = array.copy()
+
+        # the frame is discarded if the writer started to overwrite the slot while it was being read
+        if int(slot["lock"]) != lock:
+            return None
+        return SharedMemoryFrame(frame=index, pts=pts, duration=duration, array=array)
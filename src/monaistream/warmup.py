@@ -0,0 +1,199 @@
+################################################################################
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+################################################################################
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from gi.repository import Gst
+
+from monaistream.interface import StreamComponent
+
+logger = logging.getLogger(__name__)
+
+
+# synthetic frames are marked with a reference timestamp meta of these caps, which elements copy along with the other
+# metadata of the buffers they transform, so the frames are recognized even when an element re-timestamps them
+_WARMUP_REFERENCE = "timestamp/x-monaistream-warmup"
+
+
+class PipelineWarmup(object):
+    """
+    Warms up the components of a pipeline before the first real frame goes through them. When the first buffer
+    leaves a source, synthetic copies of it are pushed downstream and the real buffer is held until the sinks
+    have discarded all the synthetic frames, so that lazy initialization (e.g. CUDA contexts, kernel compilation
+    or allocator growth) does not delay the first real frames. Synthetic frames carry no timestamps, which keeps
+    them out of latency tracing and latency budgets.
+
+    Synthetic frames are pushed one at a time, each once the previous one reached the sinks, so that they never
+    overflow leaky queues. A frame which makes no progress for `frame_timeout` (e.g. one dropped by a queue or
+    merged away by a muxer) is counted as lost and ends the warm-up of its source.
+    """
+
+    def __init__(self, frames: int, timeout: float = 60.0, frame_timeout: float = 5.0) -> None:
+        """
+        :param frames: the number of synthetic frames pushed by each source
+        :param timeout: the maximum time in seconds the first real frame is held while the pipeline warms up, which
+                        is also the time the first synthetic frame may take to reach the sinks
+        :param frame_timeout: the time in seconds after which a synthetic frame, other than the first, which did not
+                              reach the sinks is counted as lost
+        """
+        self._frames = frames
+        self._timeout = timeout
+        self._frame_timeout = frame_timeout
+        self._reference = Gst.Caps.from_string(_WARMUP_REFERENCE)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._num_sources = 0
+        self._num_sinks = 0
+        self._finished_sources = 0
+        self._expected = 0
+        self._arrived = 0
+        self._lost = 0
+        self._done = False
+        self._started_at: Optional[float] = None
+        self._warmup_ms: Optional[float] = None
+        self._released_at: Optional[float] = None
+        self._first_frame_ms: Optional[float] = None
+
+    def attach_source(self, component: StreamComponent) -> None:
+        """
+        Attach the probe which pushes the synthetic frames to the source pad of a source component
+
+        :param component: the source component
+        """
+        srcpad = component.get_gst_element()[-1].get_static_pad("src")
+        if not srcpad:
+            logger.warning(f"Unable to warm up the pipeline from {component.get_name()}: no source pad")
+            return
+
+        self._num_sources += 1
+        srcpad.add_probe(Gst.PadProbeType.BUFFER, self._probe_source, component.get_name())
+
+    def attach_sink(self, component: StreamComponent) -> None:
+        """
+        Attach the probe which discards the synthetic frames to the sink pad of a sink component
+
+        :param component: the sink component
+        """
+        sinkpad = component.get_gst_element()[0].get_static_pad("sink")
+        if not sinkpad:
+            logger.warning(f"Unable to discard warm-up frames in front of {component.get_name()}: no sink pad")
+            return
+
+        with self._lock:
+            self._num_sinks += 1
+        sinkpad.add_probe(Gst.PadProbeType.BUFFER, self._probe_sink, component.get_name())
+
+    def get_report(self) -> Dict[str, float]:
+        """
+        Get the duration of the warm-up and the latency of the first real frame
+
+        :return: a dictionary with the number of warm-up `frames` pushed by each source, the number of warm-up
+                 frames `lost` on their way to a sink, `warmup_ms` the time between the first real frame leaving the
+                 source and it being released after warm-up, and `first_frame_ms` the time the first real frame then
+                 took to reach a sink; values which are not known yet are omitted
+        """
+        report: Dict[str, float] = {"frames": self._frames}
+        with self._lock:
+            report["lost"] = self._lost
+            if self._warmup_ms is not None:
+                report["warmup_ms"] = self._warmup_ms
+            if self._first_frame_ms is not None:
+                report["first_frame_ms"] = self._first_frame_ms
+        return report
+
+    def _wait_for_arrivals(self, timeout: float) -> bool:
+        # called with the lock held, waits while the synthetic frames make progress towards the sinks
+        while self._arrived < self._expected:
+            arrived = self._arrived
+            if not self._cond.wait_for(lambda: self._arrived > arrived, timeout):
+                self._lost += self._expected - self._arrived
+                self._expected = self._arrived
+                return False
+        return True
+
+    def _probe_source(self, pad: Gst.Pad, info: Gst.PadProbeInfo, name: str):
+        buffer = info.get_buffer()
+        peer = pad.get_peer()
+        if not buffer or not peer:
+            return Gst.PadProbeReturn.OK
+
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.perf_counter()
+            num_sinks = self._num_sinks
+
+        logger.info(f"Warming up the pipeline with {self._frames} frames from {name}")
+        # without sinks there is nothing to wait for
+        for idx in range(self._frames if num_sinks else 0):
+            # a copy of the first frame matches the negotiated caps and carries the same metadata (e.g. batch meta)
+            synthetic = buffer.copy_deep()
+            if not synthetic:
+                logger.warning(f"Unable to copy frames from {name}, skipping warm-up")
+                break
+
+            synthetic.pts = synthetic.dts = Gst.CLOCK_TIME_NONE
+            synthetic.add_reference_timestamp_meta(self._reference, 0, Gst.CLOCK_TIME_NONE)
+            with self._lock:
+                self._expected += num_sinks
+
+            flow = peer.chain(synthetic)
+            with self._lock:
+                if flow != Gst.FlowReturn.OK:
+                    logger.warning(f"Warm-up of the pipeline from {name} interrupted: {flow.value_nick}")
+                    self._lost += self._expected - self._arrived
+                    self._expected = self._arrived
+                    break
+
+                # the first frame goes through the lazy initialization, which may take long
+                if not self._wait_for_arrivals(self._timeout if idx == 0 else self._frame_timeout):
+                    logger.warning(f"Warm-up frames from {name} did not reach the sinks, ending its warm-up")
+                    break
+
+        # hold the real frame until every source has warmed up the pipeline
+        with self._lock:
+            self._finished_sources += 1
+            self._cond.notify_all()
+            remaining = self._timeout - (time.perf_counter() - self._started_at)
+            if not self._cond.wait_for(lambda: self._finished_sources >= self._num_sources, max(remaining, 0.0)):
+                logger.warning(f"Pipeline warm-up did not complete within {self._timeout}s, releasing {name}")
+
+            self._done = True
+            self._released_at = time.perf_counter()
+            if self._warmup_ms is None:
+                self._warmup_ms = (self._released_at - self._started_at) * 1e3
+
+        return Gst.PadProbeReturn.REMOVE
+
+    def _probe_sink(self, pad: Gst.Pad, info: Gst.PadProbeInfo, name: str):
+        buffer = info.get_buffer()
+        if not buffer:
+            return Gst.PadProbeReturn.OK
+
+        with self._lock:
+            if buffer.get_reference_timestamp_meta(self._reference):
+                self._arrived += 1
+                self._cond.notify_all()
+                return Gst.PadProbeReturn.DROP
+
+            # the first real frame ends the warm-up phase for this sink
+            if self._first_frame_ms is None and self._released_at is not None:
+                self._first_frame_ms = (time.perf_counter() - self._released_at) * 1e3
+
+            # other sources may still be warming up the pipeline until the warm-up is done
+            if not self._done:
+                return Gst.PadProbeReturn.OK
+
+        return Gst.PadProbeReturn.REMOVE
@@ -0,0 +1,74 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+import unittest
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.sinks import AppSink
+from monaistream.sources import AppSource, TestVideoSource
+
+
+class TestAppSink(unittest.TestCase):
+    def test_appsinkblock(self):
+        frames = [np.full((4, 8, 3), i, dtype=np.uint8) for i in range(10)]
+        sink = AppSink(max_size=2, policy="block", format="RGB")
+        pipeline = StreamCompose([AppSource(frames, format="RGB", framerate=10), sink])
+
+        pipeline.start()
+        try:
+            received = []
+            for frame in sink:
+                # a slow consumer stalls the pipeline instead of losing frames
+                time.sleep(0.01)
+                with frame.view() as array:
+                    received.append(int(array[0, 0, 0]))
+            pipeline.wait()
+        finally:
+            sink.close()
+            pipeline.stop()
+
+        self.assertEqual(received, list(range(10)))
+        self.assertEqual(sink.get_stats(), {"received": 10, "dropped": 0, "queued": 0})
+
+    def test_appsinkdropoldest(self):
+        sink = AppSink(max_size=3, format="RGBA")
+        pipeline = StreamCompose([TestVideoSource(num_buffers=20), sink])
+        # the consumer only starts reading once the whole stream has been received
+        pipeline()
+
+        received = [frame.to_numpy() for frame in sink]
+        stats = sink.get_stats()
+        self.assertEqual(len(received), 3)
+        self.assertEqual(received[0].shape[2], 4)
+        self.assertEqual(stats["received"], 20)
+        self.assertEqual(stats["dropped"], 17)
+
+    def test_appsinkasync(self):
+        sink = AppSink(max_size=4, policy="block")
+        pipeline = StreamCompose([TestVideoSource(num_buffers=10), sink])
+
+        async def consume():
+            return [frame.pts async for frame in sink]
+
+        pipeline.start()
+        try:
+            timestamps = asyncio.run(consume())
+            pipeline.wait()
+        finally:
+            sink.close()
+            pipeline.stop()
+
+        self.assertEqual(len(timestamps), 10)
+        self.assertEqual(timestamps, sorted(timestamps))
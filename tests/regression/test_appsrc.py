@@ -0,0 +1,75 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from typing import Dict
+
+import numpy as np
+from gi.repository import Gst
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import AppSource
+
+
+class TestAppSource(unittest.TestCase):
+    def _record_frames(self, source: AppSource):
+        frames = []
+        timestamps = []
+
+        def record(inputs: Dict[str, np.ndarray]):
+            frames.append(inputs["ORIGINAL_IMAGE"].copy())
+            return inputs
+
+        def record_timestamps(pad, info, user_data):
+            timestamps.append(info.get_buffer().pts)
+            return Gst.PadProbeReturn.OK
+
+        transform = TransformChainComponentNumpy(transform_chain=record, output_label="ORIGINAL_IMAGE", format="RGB")
+        pipeline = StreamCompose([source, transform, FakeSink()])
+        source.get_gst_element()[0].get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, record_timestamps, None)
+        pipeline()
+        return frames, timestamps
+
+    def test_appsourceiterable(self):
+        # an odd width exercises the padding of the rows of RGB frames
+        expected = [np.full((6, 5, 3), i, dtype=np.uint8) for i in range(12)]
+        pulled = []
+
+        def generate():
+            for frame in expected:
+                pulled.append(frame)
+                yield frame
+
+        source = AppSource(generate(), format="RGB", framerate=10, max_buffers=2)
+        frames, timestamps = self._record_frames(source)
+
+        self.assertEqual(source.get_num_frames(), 12)
+        self.assertEqual(len(pulled), 12)
+        self.assertEqual(len(frames), 12)
+        for frame, expected_frame in zip(frames, expected):
+            np.testing.assert_array_equal(frame, expected_frame)
+        self.assertEqual(timestamps, [i * Gst.SECOND // 10 for i in range(12)])
+
+    def test_appsourcerawfile(self):
+        expected = np.random.randint(0, 255, (8, 4, 8, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "frames.raw")
+            expected.tofile(path)
+
+            source = AppSource(path, shape=(4, 8), format="RGB")
+            frames, _ = self._record_frames(source)
+
+        self.assertEqual(len(frames), 8)
+        np.testing.assert_array_equal(np.stack(frames), expected)
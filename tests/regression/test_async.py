@@ -0,0 +1,62 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import TransformChainComponentAsync, TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+
+class TestTransformChainAsync(unittest.TestCase):
+    def test_asynctransformorder(self):
+        counter = {"next": 0}
+        stamps = []
+
+        def stamp(inputs: Dict[str, np.ndarray]):
+            inputs["ORIGINAL_IMAGE"][0, 0, 0] = counter["next"]
+            counter["next"] += 1
+            return inputs
+
+        def jittered_sort(inputs: Dict[str, np.ndarray]):
+            frame = inputs["ORIGINAL_IMAGE"]
+            # even frames take longer so that workers complete frames out of order
+            time.sleep(0.02 if frame[0, 0, 0] % 2 == 0 else 0.0)
+            np.sort(frame[1:].astype(np.float32), axis=None)
+            return {"ORIGINAL_IMAGE": frame}
+
+        def record_stamp(inputs: Dict[str, np.ndarray]):
+            stamps.append(int(inputs["ORIGINAL_IMAGE"][0, 0, 0]))
+            return inputs
+
+        transform = TransformChainComponentAsync(
+            transform_chain=jittered_sort, output_label="ORIGINAL_IMAGE", num_workers=4, max_in_flight=6
+        )
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=50),
+                TransformChainComponentNumpy(transform_chain=stamp, output_label="ORIGINAL_IMAGE"),
+                transform,
+                TransformChainComponentNumpy(transform_chain=record_stamp, output_label="ORIGINAL_IMAGE"),
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        stats = transform.get_probe_stats()
+        self.assertEqual(stamps, list(range(50)))
+        self.assertEqual(stats["frames"], 50)
+        self.assertLessEqual(stats["peak_in_flight"], 6)
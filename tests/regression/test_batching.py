@@ -0,0 +1,131 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from monaistream.batching import DynamicBatcher
+from monaistream.compose import StreamCompose
+from monaistream.filters import LocalInferServer, TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import AppSource
+
+
+def channel_sum(batch: np.ndarray) -> Dict[str, np.ndarray]:
+    return {"OUTPUT__0": batch.reshape(len(batch), -1).sum(axis=1)}
+
+
+class TestDynamicBatcher(unittest.TestCase):
+    def test_fullbatches(self):
+        batcher = DynamicBatcher(channel_sum, max_batch_size=4, max_queue_delay_ms=1000.0)
+        # a full batch is dispatched without waiting for the delay
+        start = time.perf_counter()
+        futures = [batcher.submit(np.full((2, 2), i, dtype=np.float32)) for i in range(8)]
+        results = [future.result(timeout=5.0)["OUTPUT__0"] for future in futures]
+        elapsed = time.perf_counter() - start
+        batcher.close()
+
+        self.assertEqual(results, [4 * i for i in range(8)])
+        self.assertLess(elapsed, 1.0)
+        stats = batcher.get_stats()
+        self.assertEqual(stats["batches"], 2)
+        self.assertEqual(stats["batch_size_4"], 2)
+
+    def test_queuedelay(self):
+        batcher = DynamicBatcher(channel_sum, max_batch_size=8, max_queue_delay_ms=50.0)
+        start = time.perf_counter()
+        result = batcher.submit(np.ones((2, 2), dtype=np.float32)).result(timeout=5.0)
+        elapsed = time.perf_counter() - start
+        batcher.close()
+
+        self.assertEqual(result["OUTPUT__0"], 4)
+        self.assertGreaterEqual(elapsed, 0.045)
+        self.assertEqual(batcher.get_stats()["batch_size_1"], 1)
+
+    def test_concurrentsubmitters(self):
+        batcher = DynamicBatcher(channel_sum, max_batch_size=8, max_queue_delay_ms=5.0)
+        results = {}
+
+        def submit_all(source: int):
+            futures = [batcher.submit(np.full((2, 2), source * 100 + i, dtype=np.float32)) for i in range(50)]
+            results[source] = [int(future.result(timeout=5.0)["OUTPUT__0"]) for future in futures]
+
+        threads = [threading.Thread(target=submit_all, args=(source,)) for source in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        for source in range(3):
+            self.assertEqual(results[source], [4 * (source * 100 + i) for i in range(50)])
+        stats = batcher.get_stats()
+        self.assertEqual(stats["frames"], 150)
+        self.assertLessEqual(stats["batches"], 150)
+
+    def test_mixedshapes(self):
+        batcher = DynamicBatcher(channel_sum, max_batch_size=4, max_queue_delay_ms=20.0)
+        small = batcher.submit(np.ones((2, 2), dtype=np.float32))
+        large = batcher.submit(np.ones((3, 3), dtype=np.float32))
+        self.assertEqual(small.result(timeout=5.0)["OUTPUT__0"], 4)
+        self.assertEqual(large.result(timeout=5.0)["OUTPUT__0"], 9)
+        batcher.close()
+        self.assertEqual(batcher.get_stats()["batches"], 2)
+
+    def test_modelerror(self):
+        def failing(batch: np.ndarray) -> Dict[str, np.ndarray]:
+            raise ValueError("model failure")
+
+        batcher = DynamicBatcher(failing, max_batch_size=2, max_queue_delay_ms=1.0)
+        futures = [batcher.submit(np.ones((2, 2), dtype=np.float32)) for _ in range(2)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5.0)
+        batcher.close()
+
+    def test_sharedacrosssources(self):
+        batcher = DynamicBatcher(channel_sum, max_batch_size=6, max_queue_delay_ms=5.0)
+        received = {source: [] for source in range(3)}
+
+        def record(source: int):
+            def _record(inputs: Dict[str, np.ndarray]):
+                received[source].append(int(inputs["OUTPUT__0"]))
+                return inputs
+
+            return _record
+
+        pipelines = []
+        for source in range(3):
+            frames = [np.full((4, 4, 3), source * 20 + i, dtype=np.uint8) for i in range(20)]
+            pipelines.append(
+                StreamCompose(
+                    [
+                        AppSource(frames, format="RGB"),
+                        LocalInferServer(batcher=batcher, tensor_order="NHWC", scale_factor=1.0),
+                        TransformChainComponentNumpy(transform_chain=record(source), output_label="ORIGINAL_IMAGE"),
+                        FakeSink(),
+                    ]
+                )
+            )
+
+        for pipeline in pipelines:
+            pipeline.start()
+        for pipeline in pipelines:
+            pipeline.wait()
+        batcher.close()
+
+        for source in range(3):
+            self.assertEqual(received[source], [48 * (source * 20 + i) for i in range(20)])
+        self.assertEqual(batcher.get_stats()["frames"], 60)
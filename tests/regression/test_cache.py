@@ -0,0 +1,124 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from monaistream.filters.infer import NVInferServer
+from monaistream.util.artifacts import ArtifactCache
+from monaistream.util.cache import ViewCache, numpy_view
+
+
+class TestViewCache(unittest.TestCase):
+    def test_recycledsurfaces(self):
+        # a system memory analogue of a buffer pool recycling three RGBA surfaces
+        pool = [np.zeros((64, 64, 4), dtype=np.uint8) for _ in range(3)]
+        cache = ViewCache()
+
+        for frame in range(300):
+            surface = pool[frame % len(pool)]
+            address = surface.__array_interface__["data"][0]
+            key = (address, surface.shape, surface.strides, str(surface.dtype))
+            view = cache.get(
+                key, lambda: numpy_view(address, surface.nbytes, surface.shape, surface.dtype, surface.strides)
+            )
+            view[...] = frame % 256
+
+            np.testing.assert_array_equal(surface, frame % 256)
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["misses"], len(pool))
+        self.assertEqual(stats["hits"], 300 - len(pool))
+        self.assertEqual(stats["size"], len(pool))
+
+    def test_eviction(self):
+        cache = ViewCache(max_entries=2)
+        for key in range(5):
+            cache.get(key, lambda: np.empty(1))
+
+        stats = cache.get_stats()
+        self.assertEqual(stats["evictions"], 3)
+        self.assertEqual(stats["size"], 2)
+
+        # the most recently used entries are kept
+        cache.get(4, lambda: self.fail("view should be cached"))
+
+
+class TestArtifactCache(unittest.TestCase):
+    def test_reuseandcollect(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ArtifactCache(tmpdir, max_entries=2)
+            keys = [ArtifactCache.make_key(f"artifact-{i}") for i in range(4)]
+            for i, key in enumerate(keys):
+                self.assertIsNone(cache.lookup(key))
+                with cache.create(key) as staging:
+                    with open(os.path.join(staging, "artifact.txt"), "w") as f:
+                        f.write(str(i))
+                # entries are ordered by their modification time
+                time.sleep(0.01)
+
+            path = cache.lookup(keys[0])
+            with open(os.path.join(path, "artifact.txt")) as f:
+                self.assertEqual(f.read(), "0")
+
+            # the least recently used entries are collected, a lookup counts as a use
+            self.assertEqual(cache.collect(), 2)
+            self.assertEqual(sorted(os.listdir(tmpdir)), sorted([keys[0], keys[3]]))
+            self.assertEqual(cache.get_stats(), {"hits": 1, "misses": 4})
+
+    def test_foreignentries(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # the cache shares its directory with files it did not create, even older ones
+            foreign = ["models", ".X11-unix", "0123456789abcdef", "notes.txt"]
+            for name in foreign[:-1]:
+                os.mkdir(os.path.join(tmpdir, name))
+            with open(os.path.join(tmpdir, foreign[-1]), "w") as f:
+                f.write("notes")
+            for name in foreign:
+                os.utime(os.path.join(tmpdir, name), (0, 0))
+
+            cache = ArtifactCache(tmpdir, max_entries=1, max_age=3600.0)
+            key = ArtifactCache.make_key("artifact")
+            with cache.create(key):
+                pass
+
+            self.assertEqual(cache.collect(), 0)
+            self.assertEqual(sorted(os.listdir(tmpdir)), sorted(foreign + [key]))
+
+    def test_failedcreation(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ArtifactCache(tmpdir)
+            with self.assertRaises(ValueError):
+                with cache.create("key"):
+                    raise ValueError("conversion failed")
+
+            self.assertIsNone(cache.lookup("key"))
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_inferserverconfigs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            before = NVInferServer.get_config_cache_stats()
+            paths = {NVInferServer.write_config(NVInferServer.generate_default_config(), tmpdir) for _ in range(64)}
+
+            config = NVInferServer.generate_default_config()
+            config.infer_config.backend.trt_is.model_name = "identity"
+            other = NVInferServer.write_config(config, tmpdir)
+
+            stats = NVInferServer.get_config_cache_stats()
+            self.assertEqual(len(paths), 1)
+            self.assertNotIn(other, paths)
+            self.assertLessEqual(stats["renders"] - before["renders"], 2)
+            self.assertEqual(stats["file_writes"] - before["file_writes"], 2)
+            self.assertEqual(len(os.listdir(tmpdir)), 2)
@@ -0,0 +1,153 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import filecmp
+import os
+import tempfile
+import unittest
+
+import torch
+
+from monaistream.util.artifacts import ArtifactCache
+from monaistream.util.convert import (
+    convert_cached,
+    get_available_backends,
+    get_conversion_key,
+    make_profiles,
+    probe_toolchain,
+    to_trt,
+    validate_onnx,
+)
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmpdir.name, "model.ts")
+        model = torch.nn.Sequential(torch.nn.Conv2d(3, 2, 3, padding=1), torch.nn.ReLU())
+        torch.jit.save(torch.jit.script(model.eval()), self.model_path)
+        self.cache = ArtifactCache(os.path.join(self.tmpdir.name, "cache"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def convert(self, output_name, input_size):
+        hit, timings = convert_cached(
+            input_model_path=self.model_path,
+            output_model_path=os.path.join(self.tmpdir.name, output_name),
+            input_names=["INPUT__0"],
+            output_names=["OUTPUT__0"],
+            input_sizes=[input_size],
+            cache=self.cache,
+        )
+        self.assertEqual(list(timings), [] if hit else ["export"])
+        return hit
+
+    def test_onnxhitmiss(self):
+        self.assertFalse(self.convert("first.onnx", [1, 3, 16, 16]))
+        self.assertTrue(self.convert("second.onnx", [1, 3, 16, 16]))
+        self.assertTrue(
+            filecmp.cmp(
+                os.path.join(self.tmpdir.name, "first.onnx"), os.path.join(self.tmpdir.name, "second.onnx"), False
+            )
+        )
+
+        # other shapes are converted again
+        self.assertFalse(self.convert("third.onnx", [1, 3, 32, 32]))
+        self.assertEqual(self.cache.get_stats(), {"hits": 1, "misses": 2})
+
+    def test_shareddirectory(self):
+        # a cache pointed at an existing models folder only collects its own entries
+        self.cache = ArtifactCache(self.tmpdir.name, max_entries=1)
+        os.mkdir(os.path.join(self.tmpdir.name, "models"))
+        os.utime(os.path.join(self.tmpdir.name, "models"), (0, 0))
+
+        self.assertFalse(self.convert("first.onnx", [1, 3, 16, 16]))
+        self.assertFalse(self.convert("second.onnx", [1, 3, 32, 32]))
+        self.assertTrue(os.path.isdir(os.path.join(self.tmpdir.name, "models")))
+        self.assertTrue(os.path.isfile(self.model_path))
+
+    def test_keys(self):
+        args = (self.model_path, ".onnx", ["INPUT__0"], ["OUTPUT__0"], [[1, 3, 16, 16]])
+        toolchain = {"torch": "1.0"}
+        key = get_conversion_key(*args, toolchain_versions=toolchain)
+
+        # the workspace only matters to engines
+        self.assertEqual(key, get_conversion_key(*args, workspace=10, toolchain_versions=toolchain))
+        self.assertNotEqual(key, get_conversion_key(*args, toolchain_versions={"torch": "2.0"}))
+        self.assertNotEqual(
+            get_conversion_key(self.model_path, ".engine", *args[2:], toolchain_versions=toolchain),
+            get_conversion_key(self.model_path, ".engine", *args[2:], workspace=10, toolchain_versions=toolchain),
+        )
+
+        dynamic_key = get_conversion_key(*args, toolchain_versions=toolchain, dynamic_batch=True)
+        self.assertNotEqual(key, dynamic_key)
+
+        # models converted without validation are not reused when validation is requested
+        self.assertNotEqual(key, get_conversion_key(*args, toolchain_versions=toolchain, validate=True))
+
+        with open(self.model_path, "ab") as f:
+            f.write(b"\0")
+        self.assertNotEqual(key, get_conversion_key(*args, toolchain_versions=toolchain))
+
+    def test_dynamicbatch(self):
+        output_path = os.path.join(self.tmpdir.name, "dynamic.onnx")
+        hit, timings = convert_cached(
+            input_model_path=self.model_path,
+            output_model_path=output_path,
+            input_names=["INPUT__0"],
+            output_names=["OUTPUT__0"],
+            input_sizes=[[2, 3, 16, 16]],
+            cache=self.cache,
+            dynamic_batch=True,
+            dynamic_spatial=True,
+            profiles=make_profiles([[2, 3, 16, 16]], [[1, 2, 4]], [[0, 3, 8, 8]], [[0, 3, 32, 32]]),
+            validate=True,
+        )
+        self.assertFalse(hit)
+        self.assertEqual(list(timings), ["export", "validate"])
+
+        # one model serves batch and spatial sizes it was not exported with
+        output_shapes = validate_onnx(output_path, ["INPUT__0"], [[[3, 3, 24, 24]], [[7, 3, 8, 8]]], True)
+        self.assertEqual(output_shapes, [{"OUTPUT__0": [3, 2, 24, 24]}, {"OUTPUT__0": [7, 2, 8, 8]}])
+
+
+class TestShapeProfiles(unittest.TestCase):
+    def test_profiles(self):
+        profiles = make_profiles([[4, 3, 64, 64]], [[1, 4, 8], [8, 16, 32]], max_sizes=[[0, 3, 128, 128]])
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0].min, [[1, 3, 64, 64]])
+        self.assertEqual(profiles[1].opt, [[16, 3, 64, 64]])
+        self.assertEqual(profiles[1].max, [[32, 3, 128, 128]])
+
+        # a static profile of the input sizes by default
+        self.assertEqual(make_profiles([[4, 3, 64, 64]])[0].max, [[4, 3, 64, 64]])
+
+        with self.assertRaises(ValueError):
+            make_profiles([[4, 3, 64, 64]], [[8, 4, 16]])
+        with self.assertRaises(ValueError):
+            make_profiles([[4, 3, 64, 64]], min_sizes=[[0, 3, 128, 128]])
+
+        # the shapes of the profiles are given to trtexec by input name
+        with self.assertRaises(ValueError):
+            to_trt("model.onnx", "model.engine", profiles=profiles)
+        with self.assertRaises(ValueError):
+            to_trt("model.onnx", "model.engine", input_names=["INPUT__0", "INPUT__1"], profiles=profiles)
+
+
+class TestToolchainProbe(unittest.TestCase):
+    def test_backends(self):
+        toolchain = probe_toolchain()
+        self.assertTrue(toolchain["torch"])
+        self.assertEqual(get_available_backends(toolchain)["onnx"], [])
+
+        toolchain["trtexec"] = None
+        self.assertIn("trtexec", get_available_backends(toolchain)["engine"])
@@ -10,6 +10,7 @@
 # limitations under the License.
 
 import os
+import tracemalloc
 import unittest
 from typing import Dict
 
@@ -19,7 +20,9 @@ import torch
 from monaistream.compose import StreamCompose
 from monaistream.filters import FilterProperties, NVVideoConvert, TransformChainComponent, TransformChainComponentCupy
 from monaistream.filters.infer import NVInferServer
+from monaistream.sinks import FakeSink
 from monaistream.sinks.nveglglessink import NVEglGlesSink
+from monaistream.sources import TestVideoSource
 from monaistream.sources.sourcebin import NVAggregatedSourcesBin
 from monaistream.sources.uri import URISource
 
@@ -107,3 +110,56 @@ class TestWithData(unittest.TestCase):
             ]
         )
         pipeline()
+
+    def test_layerbindingsoak(self):
+        # a short run by default; set `MONAISTREAM_SOAK_FRAMES=1000000` for the actual soak test
+        num_frames = int(os.getenv("MONAISTREAM_SOAK_FRAMES", 2_000))
+        warmup_frames = min(10_000, num_frames // 10)
+        memory = {}
+
+        def assert_stable_labels(inputs: Dict[str, torch.Tensor]):
+            self.assertEqual(set(inputs.keys()), {"ORIGINAL_IMAGE", "OUTPUT0"})
+            memory["frames"] = memory.get("frames", 0) + 1
+            if memory["frames"] == warmup_frames:
+                memory["start"] = tracemalloc.get_traced_memory()[0]
+            memory["end"] = tracemalloc.get_traced_memory()[0]
+            return inputs
+
+        infer_server_config = NVInferServer.generate_default_config()
+        infer_server_config.infer_config.backend.trt_is.model_repo.root = os.path.join(
+            os.path.dirname(__file__), "..", "models"
+        )
+        infer_server_config.infer_config.backend.trt_is.model_name = "identity"
+        infer_server_config.infer_config.backend.trt_is.version = "1"
+        infer_server_config.infer_config.backend.trt_is.model_repo.log_level = 0
+
+        transform = TransformChainComponent(output_label="ORIGINAL_IMAGE", transform_chain=assert_stable_labels)
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=num_frames),
+                NVVideoConvert(
+                    FilterProperties(
+                        format="RGBA",
+                        width=256,
+                        height=256,
+                    )
+                ),
+                NVInferServer(
+                    config=infer_server_config,
+                ),
+                transform,
+                FakeSink(),
+            ]
+        )
+
+        tracemalloc.start()
+        try:
+            pipeline()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(memory["frames"], num_frames)
+        # memory traced after warm-up stays flat instead of growing with the number of frames
+        self.assertLess(memory["end"] - memory["start"], 1024 * 1024)
+        # recycled surfaces and layer buffers reuse their views
+        self.assertLess(transform.get_probe_stats()["view_misses"], num_frames // 100)
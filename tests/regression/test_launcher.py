@@ -0,0 +1,57 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from typing import Dict, Optional
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import TransformChainComponentProcess
+from monaistream.launcher import ShardedLauncher
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+
+def keep_frames(inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return inputs
+
+
+def create_shard_pipeline(num_buffers: Optional[int]) -> StreamCompose:
+    # runs in the workers of `ShardedLauncher`, where a missing source makes the worker fail
+    if num_buffers is None:
+        raise RuntimeError("No source to stream from")
+
+    return StreamCompose(
+        [
+            TestVideoSource(num_buffers=num_buffers),
+            TransformChainComponentProcess(transform_chain=keep_frames, output_label="ORIGINAL_IMAGE", num_workers=1),
+            FakeSink(),
+        ]
+    )
+
+
+class TestShardedLauncher(unittest.TestCase):
+    def test_launcher(self):
+        # the workers start processes of their own, and the last one fails until it is given up on
+        launcher = ShardedLauncher(create_shard_pipeline, [10, 20, None], num_workers=3, max_restarts=1)
+        report = launcher.run()
+
+        self.assertEqual(sorted(report["workers"]), [0, 1])
+        self.assertEqual(report["workers"][1]["frames"], 20)
+        self.assertEqual(report["workers"][1]["failures"], {})
+        self.assertEqual(report["restarts"], {0: 0, 1: 0, 2: 1})
+        self.assertEqual(report["failed"], [2])
+
+        # the statistics of the workers are merged
+        self.assertEqual(report["frames"], 30)
+        self.assertEqual(report["latency"]["count"], 30)
+        self.assertGreater(report["fps"], 0)
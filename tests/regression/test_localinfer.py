@@ -0,0 +1,137 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import LocalInferServer, TeeComponent, TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import AppSource
+
+
+class TestLocalInferServer(unittest.TestCase):
+    def _save_channel_mean_model(self, path: str) -> None:
+        import torch
+
+        class ChannelMean(torch.nn.Module):
+            def forward(self, x):
+                return x.mean(dim=(2, 3))
+
+        torch.jit.script(ChannelMean()).save(path)
+
+    def test_localinference(self):
+        frames = [np.full((8, 8, 3), 10 * i, dtype=np.uint8) for i in range(10)]
+        received = []
+
+        def record_outputs(inputs: Dict[str, np.ndarray]):
+            received.append(inputs["OUTPUT__0"])
+            return inputs
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "channel_mean.pt")
+            self._save_channel_mean_model(model_path)
+
+            inference = LocalInferServer(model_path)
+            pipeline = StreamCompose(
+                [
+                    AppSource(frames, format="RGB"),
+                    inference,
+                    TransformChainComponentNumpy(transform_chain=record_outputs, output_label="ORIGINAL_IMAGE"),
+                    FakeSink(),
+                ]
+            )
+            # batches larger than the number of sources, the last batch is only partially filled
+            inference.set_batch_size(4)
+            pipeline()
+
+        self.assertEqual(len(received), 10)
+        for i, output in enumerate(received):
+            self.assertEqual(output.shape, (3,))
+            np.testing.assert_allclose(output, 10 * i / 255, rtol=1e-3)
+
+        stats = inference.get_stats()
+        self.assertEqual(stats["frames"], 10)
+        self.assertEqual(stats["batches"], 3)
+
+    def test_localinferencedelay(self):
+        def slow_frames():
+            # a live source producing frames slower than a batch fills up
+            for i in range(5):
+                yield np.full((8, 8, 3), 10 * i, dtype=np.uint8)
+                time.sleep(0.3)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "channel_mean.pt")
+            self._save_channel_mean_model(model_path)
+
+            inference = LocalInferServer(model_path, max_queue_delay_ms=50.0)
+            pipeline = StreamCompose(
+                [
+                    AppSource(slow_frames(), format="RGB"),
+                    inference,
+                    FakeSink(),
+                ],
+                trace=True,
+            )
+            inference.set_batch_size(4)
+            pipeline()
+
+        # every frame is inferred alone once it waited for the delay, instead of waiting for the next frames
+        stats = inference.get_stats()
+        self.assertEqual(stats["frames"], 5)
+        self.assertEqual(stats["batches"], 5)
+        self.assertGreaterEqual(stats["timeouts"], 4)
+        self.assertLess(pipeline.get_latency_report()[inference.get_name()]["p99"], 250)
+
+    def test_localinferencetee(self):
+        frames = [np.full((8, 8, 3), 10 * i, dtype=np.uint8) for i in range(5)]
+        received = {"infer": [], "record": []}
+
+        def record_labels(branch):
+            def _record(inputs: Dict[str, np.ndarray]):
+                received[branch].append(sorted(inputs))
+                return inputs
+
+            return _record
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "channel_mean.pt")
+            self._save_channel_mean_model(model_path)
+
+            # the transforms of the branch without inference must not be wired to the sibling branch's server
+            pipeline = StreamCompose(
+                [
+                    AppSource(frames, format="RGB"),
+                    TeeComponent(
+                        {
+                            "infer": [
+                                LocalInferServer(model_path),
+                                TransformChainComponentNumpy(record_labels("infer"), output_label="ORIGINAL_IMAGE"),
+                                FakeSink(),
+                            ],
+                            "record": [
+                                TransformChainComponentNumpy(record_labels("record"), output_label="ORIGINAL_IMAGE"),
+                                FakeSink(),
+                            ],
+                        }
+                    ),
+                ]
+            )
+            pipeline()
+
+        self.assertEqual(received["infer"], [["ORIGINAL_IMAGE", "OUTPUT__0"]] * 5)
+        self.assertEqual(received["record"], [["ORIGINAL_IMAGE"]] * 5)
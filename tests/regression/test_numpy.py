@@ -0,0 +1,127 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from typing import Dict
+
+import numpy as np
+from gi.repository import Gst
+
+from monaistream.compose import StreamCompose
+from monaistream.errors import StreamProbeRuntimeError
+from monaistream.filters import TeeComponent, TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import AppSource, TestVideoSource
+from monaistream.util.buffer import is_buffer_exclusive, is_buffer_writable, map_buffer
+
+
+class TestWithNumpy(unittest.TestCase):
+    def test_numpytransformchain(self):
+        shapes = []
+
+        def record_shape(inputs: Dict[str, np.ndarray]):
+            shapes.append(inputs["ORIGINAL_IMAGE"].shape)
+            return inputs
+
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                TransformChainComponentNumpy(transform_chain=record_shape, output_label="ORIGINAL_IMAGE"),
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        self.assertEqual(len(shapes), 10)
+        self.assertTrue(all(shape[-1] == 4 for shape in shapes))
+
+    def test_numpywriteback(self):
+        seen = []
+
+        def invert(inputs: Dict[str, np.ndarray]):
+            return {"ORIGINAL_IMAGE": 255 - inputs["ORIGINAL_IMAGE"]}
+
+        def record_values(inputs: Dict[str, np.ndarray]):
+            seen.append(np.unique(inputs["ORIGINAL_IMAGE"][..., :3]).tolist())
+            return inputs
+
+        transform = TransformChainComponentNumpy(transform_chain=invert, output_label="ORIGINAL_IMAGE")
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10, pattern="black"),
+                transform,
+                TransformChainComponentNumpy(transform_chain=record_values, output_label="ORIGINAL_IMAGE"),
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        # black frames are written back inverted in place
+        self.assertEqual(seen, [[255]] * 10)
+        self.assertEqual(transform.get_probe_stats()["frames"], 10)
+
+    def test_numpysharedmemory(self):
+        seen = {"invert": [], "raw": []}
+
+        def invert(inputs: Dict[str, np.ndarray]):
+            return {"ORIGINAL_IMAGE": 255 - inputs["ORIGINAL_IMAGE"]}
+
+        def record_values(branch):
+            def _record(inputs: Dict[str, np.ndarray]):
+                seen[branch].append(int(inputs["ORIGINAL_IMAGE"][..., :3].max()))
+                return inputs
+
+            return _record
+
+        # the frames reach both branches of the tee unconverted, so their memory is shared by the branches
+        transform = TransformChainComponentNumpy(transform_chain=invert, output_label="ORIGINAL_IMAGE")
+        frames = [np.zeros((4, 6, 4), dtype=np.uint8) for _ in range(5)]
+        pipeline = StreamCompose(
+            [
+                AppSource(frames, format="RGBA"),
+                TeeComponent(
+                    {
+                        "invert": [
+                            transform,
+                            TransformChainComponentNumpy(record_values("invert"), output_label="ORIGINAL_IMAGE"),
+                            FakeSink(),
+                        ],
+                        "raw": [
+                            TransformChainComponentNumpy(record_values("raw"), output_label="ORIGINAL_IMAGE"),
+                            FakeSink(),
+                        ],
+                    }
+                ),
+            ]
+        )
+        pipeline()
+
+        # the inverted frames are copies, which leaves the frames of the other branch untouched
+        self.assertEqual(seen["invert"], [255] * 5)
+        self.assertEqual(seen["raw"], [0] * 5)
+        self.assertEqual(transform.get_probe_stats()["copies"], 5)
+
+    def test_bufferwritable(self):
+        # the reference counting assumed by `is_buffer_exclusive` holds for the installed GStreamer
+        buffer = Gst.Buffer.new_allocate(None, 16, None)
+        self.assertTrue(is_buffer_exclusive(buffer))
+        self.assertTrue(is_buffer_writable(buffer))
+        with map_buffer(buffer, writable=True) as (_, size):
+            self.assertEqual(size, 16)
+
+        # a copy shares the memory of the buffer
+        copy = buffer.copy()
+        self.assertFalse(is_buffer_writable(buffer))
+        with self.assertRaises(StreamProbeRuntimeError):
+            with map_buffer(buffer, writable=True):
+                pass
+        del copy
+        self.assertTrue(is_buffer_writable(buffer))
@@ -0,0 +1,99 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.filters import TransformChainComponentNumpy, TransformChainComponentProcess
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+
+def invert_rows(inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # pure-Python work holding the GIL, run in the worker processes of `TransformChainComponentProcess`
+    frame = inputs["ORIGINAL_IMAGE"]
+    for row in range(1, frame.shape[0]):
+        frame[row] = 255 - frame[row]
+    return {"ORIGINAL_IMAGE": frame}
+
+
+def keep_rows(inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return inputs
+
+
+class TestTransformChainProcess(unittest.TestCase):
+    def test_processtransformchain(self):
+        counter = {"next": 0}
+        stamps = []
+        inverted = []
+
+        def stamp(inputs: Dict[str, np.ndarray]):
+            frame = inputs["ORIGINAL_IMAGE"]
+            frame[0, 0, 0] = counter["next"]
+            frame[1:] = 10
+            counter["next"] += 1
+            return inputs
+
+        def record(inputs: Dict[str, np.ndarray]):
+            frame = inputs["ORIGINAL_IMAGE"]
+            stamps.append(int(frame[0, 0, 0]))
+            inverted.append(bool((frame[1:] == 245).all()))
+            return inputs
+
+        transform = TransformChainComponentProcess(
+            transform_chain=invert_rows, output_label="ORIGINAL_IMAGE", num_workers=2, max_in_flight=4
+        )
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=20),
+                TransformChainComponentNumpy(transform_chain=stamp, output_label="ORIGINAL_IMAGE"),
+                transform,
+                TransformChainComponentNumpy(transform_chain=record, output_label="ORIGINAL_IMAGE"),
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        stats = transform.get_probe_stats()
+        self.assertEqual(stamps, list(range(20)))
+        self.assertTrue(all(inverted))
+        self.assertEqual(stats["frames"], 20)
+        self.assertLessEqual(stats["peak_in_flight"], 4)
+
+        # the workers outlive the end of the stream, and receive a replaced transform chain with their next frame
+        counter["next"] = 0
+        stamps.clear()
+        inverted.clear()
+        transform.set_transform_chain(keep_rows)
+        pipeline()
+
+        self.assertEqual(stamps, list(range(20)))
+        self.assertFalse(any(inverted))
+
+    def test_processclosewhilestreaming(self):
+        transform = TransformChainComponentProcess(
+            transform_chain=keep_rows, output_label="ORIGINAL_IMAGE", num_workers=2, max_in_flight=4
+        )
+        pipeline = StreamCompose([TestVideoSource(num_buffers=30, is_live=True), transform, FakeSink()])
+        pipeline.start()
+        time.sleep(0.5)
+
+        # the frames being processed complete before the workers stop, and later frames start them again
+        transform.close()
+        pipeline.wait()
+
+        stats = transform.get_probe_stats()
+        self.assertEqual(stats["frames"], 30)
+        self.assertEqual(stats["dropped"], 0)
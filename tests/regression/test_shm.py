@@ -0,0 +1,87 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from uuid import uuid4
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.sinks import SharedMemorySink
+from monaistream.sources import AppSource
+from monaistream.util.shm import SharedMemoryRingReader, SharedMemoryRingWriter
+
+
+class TestSharedMemoryRing(unittest.TestCase):
+    def setUp(self):
+        self.writer = SharedMemoryRingWriter(f"test-{uuid4().hex}", num_slots=4, slot_size=4 * 6 * 3)
+        self.reader = SharedMemoryRingReader(self.writer.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_readinorder(self):
+        for i in range(3):
+            self.writer.write(np.full((4, 6, 3), i, dtype=np.uint8), pts=i * 10, duration=10)
+        self.assertEqual(self.reader.lag, 3)
+
+        self.writer.mark_closed()
+        frames = list(self.reader)
+        self.assertEqual([frame.frame for frame in frames], [0, 1, 2])
+        self.assertEqual([frame.pts for frame in frames], [0, 10, 20])
+        for i, frame in enumerate(frames):
+            np.testing.assert_array_equal(frame.array, i)
+        self.assertEqual(self.reader.get_stats(), {"frames": 3, "overwrites": 0, "lag": 0})
+
+    def test_overwrites(self):
+        # padded rows are packed into the slots
+        padded = np.zeros((4, 8, 3), dtype=np.uint8)[:, :6]
+        for i in range(10):
+            padded[...] = i
+            self.writer.write(padded)
+        self.assertEqual(self.reader.lag, 10)
+
+        frames = [self.reader.read(timeout=1.0) for _ in range(4)]
+        self.assertEqual([int(frame.array[0, 0, 0]) for frame in frames], [6, 7, 8, 9])
+        self.assertEqual(self.reader.get_stats(), {"frames": 4, "overwrites": 6, "lag": 0})
+
+        with self.assertRaises(TimeoutError):
+            self.reader.read(timeout=0.01)
+
+    def test_viewinvalidation(self):
+        self.writer.write(np.ones((4, 6, 3), dtype=np.uint8))
+        frame = self.reader.read(timeout=1.0, copy=False)
+        self.assertTrue(self.reader.is_valid(frame))
+
+        for _ in range(4):
+            self.writer.write(np.zeros((4, 6, 3), dtype=np.uint8))
+        self.assertFalse(self.reader.is_valid(frame))
+        del frame
+
+
+class TestSharedMemorySink(unittest.TestCase):
+    def test_sharedmemorysink(self):
+        frames = [np.full((4, 6, 3), i, dtype=np.uint8) for i in range(5)]
+        sink = SharedMemorySink(num_slots=8, format="RGB")
+        pipeline = StreamCompose([AppSource(frames, format="RGB"), sink])
+        pipeline()
+
+        reader = SharedMemoryRingReader(sink.get_ring_name(), from_start=True)
+        try:
+            received = [int(frame.array[0, 0, 0]) for frame in reader]
+            self.assertEqual(received, list(range(5)))
+            self.assertEqual(reader.get_stats()["overwrites"], 0)
+        finally:
+            reader.close()
+            sink.close()
+
+        self.assertEqual(sink.get_stats(), {"frames": 5, "dropped": 0})
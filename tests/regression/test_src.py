@@ -9,13 +9,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import os
+import tempfile
+import time
 import unittest
 
+from gi.repository import Gst
 from monai.transforms import Compose, Identityd
 
 from monaistream.compose import StreamCompose
-from monaistream.filters import FilterProperties, NVVideoConvert, TransformChainComponent
+from monaistream.filters import (
+    FilterProperties,
+    NVVideoConvert,
+    QueueComponent,
+    QueuePolicy,
+    TeeComponent,
+    TransformChainComponent,
+)
+from monaistream.host import PipelineHost
 from monaistream.sinks import FakeSink
+from monaistream.snapshot import GraphSnapshotter, SnapshotConfig
 from monaistream.sources import TestVideoSource
 
 
@@ -60,3 +74,309 @@ class TestWithFake(unittest.TestCase):
             ]
         )
         pipeline()
+
+    def test_latencytracing(self):
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                TransformChainComponent(
+                    transform_chain=Compose(
+                        Identityd(keys="ORIGINAL_IMAGE"),
+                    ),
+                    output_label="ORIGINAL_IMAGE",
+                ),
+                FakeSink(),
+            ],
+            trace=True,
+        )
+        pipeline()
+
+        report = pipeline.get_latency_report()
+        self.assertIn("end-to-end", report)
+        for stats in report.values():
+            self.assertGreater(stats["count"], 0)
+            self.assertLessEqual(stats["p50"], stats["p95"])
+            self.assertLessEqual(stats["p95"], stats["p99"])
+
+    def test_snapshots(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pipeline = StreamCompose(
+                [
+                    TestVideoSource(num_buffers=10),
+                    FakeSink(),
+                ],
+                snapshots=SnapshotConfig(directory=tmp_dir, events=["playing", "eos"]),
+            )
+            pipeline()
+
+            snapshots = sorted(os.listdir(tmp_dir))
+            self.assertEqual(len(snapshots), 2)
+            self.assertTrue(snapshots[0].endswith("-001-playing.dot"))
+            self.assertTrue(snapshots[1].endswith("-002-eos.dot"))
+
+    def test_snapshotdedup(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = SnapshotConfig(directory=tmp_dir, events=["playing", "on-demand"], min_interval=0.0)
+            snapshotter = GraphSnapshotter(Gst.Pipeline.new("snapshots"), config)
+
+            # the first transition to PLAYING is captured only once
+            self.assertTrue(snapshotter.request("playing"))
+            self.assertFalse(snapshotter.request("playing"))
+            self.assertFalse(snapshotter.request("eos"))
+
+            # the graph of the stopped pipeline never changes, so repeated requests produce a single file
+            for _ in range(3):
+                self.assertTrue(snapshotter.request("on-demand"))
+                time.sleep(0.1)
+            snapshotter.close()
+
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["snapshots-001-playing.dot", "snapshots-002-on-demand.dot"])
+
+    def test_startstop(self):
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=-1, is_live=True),
+                FakeSink(),
+            ]
+        )
+        pipeline.start()
+        self.assertFalse(pipeline.wait(timeout=0.5))
+        pipeline.stop(timeout=5)
+        self.assertTrue(pipeline.wait())
+
+    def test_asyncrun(self):
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                FakeSink(),
+            ]
+        )
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(pipeline.run())
+        finally:
+            loop.close()
+
+    def test_pipelinehost(self):
+        with PipelineHost() as host:
+            names = [
+                host.add(
+                    StreamCompose(
+                        [
+                            TestVideoSource(num_buffers=10 * (idx + 1)),
+                            FakeSink(),
+                        ]
+                    )
+                )
+                for idx in range(3)
+            ]
+            outcomes = host.wait()
+
+            self.assertEqual(sorted(outcomes.keys()), sorted(names))
+            self.assertTrue(all(outcome is None for outcome in outcomes.values()))
+
+            host.remove(names[0])
+            self.assertEqual(len(host.get_pipelines()), 2)
+
+    def test_teebranches(self):
+        tee = TeeComponent(
+            {
+                "record": [FakeSink()],
+                "infer": [
+                    TransformChainComponent(
+                        transform_chain=Compose(
+                            Identityd(keys="ORIGINAL_IMAGE"),
+                        ),
+                        output_label="ORIGINAL_IMAGE",
+                    ),
+                    FakeSink(),
+                ],
+            }
+        )
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                tee,
+            ],
+            trace=True,
+        )
+        pipeline()
+
+        report = pipeline.get_latency_report()
+        self.assertGreater(report["end-to-end"]["count"], 0)
+        # every branch of the tee is timed, not only the last one
+        self.assertNotIn(tee.get_name(), report)
+        self.assertEqual(report[f"{tee.get_name()}/record"]["count"], 10)
+        self.assertEqual(report[f"{tee.get_name()}/infer"]["count"], 10)
+
+    def test_autoqueue(self):
+        arrived = {"frames": 0}
+
+        def slow_identity(inputs):
+            time.sleep(0.2)
+            return inputs
+
+        def counting_identity(inputs):
+            arrived["frames"] += 1
+            return inputs
+
+        transform = TransformChainComponent(transform_chain=slow_identity, output_label="ORIGINAL_IMAGE")
+        counter = TransformChainComponent(transform_chain=counting_identity, output_label="ORIGINAL_IMAGE")
+        sink = FakeSink()
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=30, is_live=True),
+                transform,
+                counter,
+                sink,
+            ],
+            auto_queue=True,
+            queue_policies={transform.get_name(): QueuePolicy(max_size_buffers=4, leaky="upstream")},
+        )
+
+        levels = pipeline.get_queue_levels()
+        self.assertIn(f"{transform.get_name()}-input-queue", levels)
+        self.assertIn(f"{sink.get_name()}-input-queue", levels)
+
+        pipeline()
+
+        # the live source outpaces the transform, so the leaky queue in front of it drops frames
+        self.assertGreater(pipeline.get_queue_levels()[f"{transform.get_name()}-input-queue"]["overruns"], 0)
+        self.assertGreater(arrived["frames"], 0)
+        self.assertLess(arrived["frames"], 30)
+
+    def test_queuecomponent(self):
+        queue = QueueComponent(QueuePolicy.live())
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                queue,
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        self.assertEqual(queue.get_stats()["buffers"], 0)
+
+    def test_latencybudget(self):
+        def slow_identity(inputs):
+            time.sleep(0.1)
+            return inputs
+
+        transform = TransformChainComponent(transform_chain=slow_identity, output_label="ORIGINAL_IMAGE")
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=20, is_live=True),
+                transform,
+                FakeSink(),
+            ],
+            latency_budget=20,
+            qos_policy="skip",
+        )
+        pipeline()
+
+        stats = pipeline.get_qos_stats()[transform.get_name()]
+        self.assertGreater(stats["skipped"], 0)
+        self.assertEqual(stats["dropped"], 0)
+
+    def test_replacetransformchain(self):
+        calls = {"old": 0, "new": 0}
+
+        def counting_identity(key):
+            def _identity(inputs):
+                calls[key] += 1
+                return inputs
+
+            return _identity
+
+        transform = TransformChainComponent(transform_chain=counting_identity("old"), output_label="ORIGINAL_IMAGE")
+        pipeline = StreamCompose([TestVideoSource(num_buffers=100, is_live=True), transform, FakeSink()])
+        pipeline.start()
+        time.sleep(1)
+
+        report = pipeline.replace_transform_chain(transform, counting_identity("new"))
+        pipeline.wait()
+
+        self.assertEqual(report["frames_affected"], 0)
+        self.assertGreater(calls["old"], 0)
+        self.assertGreater(calls["new"], 0)
+
+    def test_replacecomponent(self):
+        old = TransformChainComponent(
+            transform_chain=Compose(Identityd(keys="ORIGINAL_IMAGE")), output_label="ORIGINAL_IMAGE"
+        )
+        new = TransformChainComponent(
+            transform_chain=Compose(Identityd(keys="ORIGINAL_IMAGE")), output_label="ORIGINAL_IMAGE"
+        )
+        sink = FakeSink()
+        pipeline = StreamCompose([TestVideoSource(num_buffers=100, is_live=True), old, sink], trace=True)
+        pipeline.start()
+        time.sleep(1)
+
+        report = pipeline.replace_component(old, new)
+        pipeline.wait()
+
+        self.assertGreaterEqual(report["frames_affected"], 1)
+        self.assertGreater(pipeline.get_latency_report()[new.get_name()]["count"], 0)
+
+    def test_warmup(self):
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                TransformChainComponent(
+                    transform_chain=Compose(
+                        Identityd(keys="ORIGINAL_IMAGE"),
+                    ),
+                    output_label="ORIGINAL_IMAGE",
+                ),
+                FakeSink(),
+            ],
+            warmup_frames=5,
+        )
+        pipeline()
+
+        report = pipeline.get_warmup_report()
+        self.assertEqual(report["frames"], 5)
+        self.assertIn("warmup_ms", report)
+        self.assertIn("first_frame_ms", report)
+
+    def test_warmupautoqueue(self):
+        # the leaky queue inserted in front of the transform must not drop the warm-up frames
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10, is_live=True),
+                TransformChainComponent(
+                    transform_chain=Compose(
+                        Identityd(keys="ORIGINAL_IMAGE"),
+                    ),
+                    output_label="ORIGINAL_IMAGE",
+                ),
+                FakeSink(),
+            ],
+            auto_queue=True,
+            warmup_frames=20,
+        )
+        pipeline()
+
+        report = pipeline.get_warmup_report()
+        self.assertEqual(report["lost"], 0)
+        self.assertLess(report["warmup_ms"], 10_000)
+
+    def test_batchedtransformchain(self):
+        batch_shapes = []
+
+        def batched_identity(inputs):
+            batch_shapes.append(tuple(inputs["ORIGINAL_IMAGE"].shape))
+            return inputs
+
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=10),
+                TransformChainComponent(transform_chain=batched_identity, output_label="ORIGINAL_IMAGE", batched=True),
+                FakeSink(),
+            ]
+        )
+        pipeline()
+
+        self.assertEqual(len(batch_shapes), 10)
+        self.assertTrue(all(len(shape) == 4 and shape[0] == 1 for shape in batch_shapes))
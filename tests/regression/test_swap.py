@@ -0,0 +1,63 @@
+# Copyright 2022 MONAI Consortium
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#     http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+from typing import Dict
+
+import numpy as np
+
+from monaistream.compose import StreamCompose
+from monaistream.errors import StreamComponentSwapError
+from monaistream.filters import TransformChainComponentNumpy
+from monaistream.sinks import FakeSink
+from monaistream.sources import TestVideoSource
+
+
+class TestReplaceComponent(unittest.TestCase):
+    def test_replacecomponenttimeout(self):
+        calls = {"old": 0}
+        throttle = {"on": False}
+
+        def count_old(inputs: Dict[str, np.ndarray]):
+            calls["old"] += 1
+            return inputs
+
+        def slow_identity(inputs: Dict[str, np.ndarray]):
+            if throttle["on"]:
+                time.sleep(0.2)
+            return inputs
+
+        old = TransformChainComponentNumpy(transform_chain=count_old, output_label="ORIGINAL_IMAGE")
+        new = TransformChainComponentNumpy(transform_chain=lambda inputs: inputs, output_label="ORIGINAL_IMAGE")
+        pipeline = StreamCompose(
+            [
+                TestVideoSource(num_buffers=150, is_live=True),
+                old,
+                TransformChainComponentNumpy(transform_chain=slow_identity, output_label="ORIGINAL_IMAGE"),
+                FakeSink(),
+            ]
+        )
+        pipeline.start()
+        time.sleep(0.5)
+
+        # frames pile up in the queue of the old component, which cannot drain before the timeout
+        throttle["on"] = True
+        time.sleep(0.5)
+        with self.assertRaises(StreamComponentSwapError):
+            pipeline.replace_component(old, new, timeout=0.3)
+        throttle["on"] = False
+
+        # the new component was removed and the old one keeps processing frames
+        self.assertTrue(all(elem.get_parent() is None for elem in new.get_gst_element()))
+        calls_after_swap = calls["old"]
+        pipeline.wait()
+        self.assertGreater(calls["old"], calls_after_swap)